@@ -0,0 +1,6 @@
+"""Headless Python engine of the herding model in herds.nlogo."""
+from .batch import BatchModel
+from .model import Model
+from .params import Globals, Params
+
+__all__ = ["BatchModel", "Globals", "Model", "Params"]
@@ -0,0 +1,135 @@
+"""Adaptive replication: run repetitions of a cell only until its statistics are precise.
+
+Instead of the fixed `repetitions` of an experiment, every parameter cell gets
+at least `min_repetitions` runs and then one more at a time until the 95%
+intervals of the success rate (Wilson) and of the mean time to finish are
+narrow enough, or `max_repetitions` is reached. Cells where the robot never
+succeeds stop at the minimum (all runs end at the time limit), cells where it
+always succeeds once the time to finish is precise, and the transition region
+gets the runs.
+
+Repetition r of a cell still runs with seed base_seed + r and gets the run
+number of the fixed sweep (Experiment.run_number), so up to the repetitions
+of the experiment the runs of an adaptive sweep are a subset of the fixed
+sweep and share its ledger, trajectories and checkpoints.
+
+    python -m herdsim.sweep bot-speed --adaptive --max-repetitions 60
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+from .aggregate import Aggregator
+from .experiments import Job
+
+
+@dataclass(frozen=True)
+class Stopping:
+    min_repetitions: int = 10
+    max_repetitions: int = 30
+    success_width: float = 0.3  # full width of the interval of the success rate
+    ticks_width: float = 0.3  # full width of the interval of the mean ticks, relative to the mean
+    z: float = 1.96
+
+    def converged(self, stats):
+        """Whether a cell (CellStats) needs no more runs."""
+        if stats is None or stats.runs < self.min_repetitions:
+            return False
+        if stats.runs >= self.max_repetitions:
+            return True
+        low, high = stats.success_interval(self.z)
+        if high - low > self.success_width:
+            return False
+        low, high = stats.ticks_interval(self.z)
+        return high - low <= self.ticks_width * abs(stats.ticks.mean)
+
+
+def cell_job(experiment, index, cell, repetition, base_seed):
+    # numbered like the fixed sweep, whatever max_repetitions is
+    return Job(experiment.name, experiment.run_number(index, repetition), cell, repetition, base_seed + repetition)
+
+
+def run_adaptive(experiment, ledger, stopping=Stopping(), processes=None, base_seed=0, params=None,
+                 progress=None, on_record=None, **options):
+    """Run an experiment with adaptive replication, resuming from the ledger.
+
+    Returns (records, aggregator) of all runs of the experiment.
+    """
+    from .sweep import job_key, run_job
+
+    done = ledger.load()
+    cells = experiment.cells()
+    aggregator = Aggregator()
+    records = {}
+    taken = [set() for _ in cells]  # repetitions of a cell that are done or running
+    running = [0] * len(cells)
+    for index, cell in enumerate(cells):
+        for rep in range(stopping.max_repetitions):
+            record = done.get(job_key(dict(cell), base_seed + rep))
+            if record is not None:
+                records[job_key(dict(cell), base_seed + rep)] = record
+                aggregator.add(record)
+                taken[index].add(rep)
+
+    def next_job(index):
+        # the lowest repetition of a cell that is neither done nor running
+        if len(taken[index]) >= stopping.max_repetitions:
+            return None
+        if len(taken[index]) >= stopping.min_repetitions:
+            # past the minimum a run waits for the statistics of the previous one
+            if running[index] or stopping.converged(aggregator.cell(dict(cells[index]))):
+                return None
+        rep = min(set(range(stopping.max_repetitions)) - taken[index])
+        taken[index].add(rep)
+        return cell_job(experiment, index, cells[index], rep, base_seed)
+
+    finished = 0
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        futures = {}
+
+        def fill():
+            workers = processes or os.cpu_count()
+            submitted = True
+            while submitted and len(futures) < 2 * workers:
+                submitted = False
+                for index in range(len(cells)):
+                    job = next_job(index)
+                    if job is None:
+                        continue
+                    futures[pool.submit(run_job, experiment, job, params, **options)] = index
+                    running[index] += 1
+                    submitted = True
+                    if len(futures) >= 2 * workers:
+                        break
+
+        fill()
+        while futures:
+            complete, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in complete:
+                index = futures.pop(future)
+                running[index] -= 1
+                record = future.result()
+                ledger.append(record)
+                records[job_key(record["values"], record["seed"])] = record
+                aggregator.add(record)
+                finished += 1
+                if on_record:
+                    on_record(record)
+                if progress:
+                    progress(finished, None)
+            fill()
+    return sorted(records.values(), key=lambda r: r["run"]), aggregator
+
+
+def summary(experiment, aggregator, stopping):
+    """Runs and simulated ticks of the adaptive sweep against the fixed repetitions."""
+    cells = len(experiment.cells())
+    ticks = sum(stats.ticks.mean * stats.ticks.count for stats in aggregator.cells.values())
+    converged = sum(stopping.converged(stats) and stats.runs < stopping.max_repetitions
+                    for stats in aggregator.cells.values())
+    return (
+        f"{aggregator.runs} runs ({cells} cells x {experiment.repetitions} fixed repetitions would be "
+        f"{cells * experiment.repetitions}), {ticks:.0f} ticks simulated, "
+        f"{converged}/{cells} cells converged before {stopping.max_repetitions} repetitions"
+    )
+
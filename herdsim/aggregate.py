@@ -0,0 +1,235 @@
+"""Streaming aggregation of sweep results while the runs are still executing.
+
+Run records (as appended to the ledger by herdsim.sweep) are folded into one
+accumulator per parameter cell: the number of runs and successes, and the
+running mean and variance (Welford) of the time to finish and of the distance
+traveled of the successful runs. Memory does not grow with the number of runs.
+A snapshot has the columns of herdsim.analysis.oat_stats, so it can be plotted
+like a finished experiment.
+
+    python -m herdsim.aggregate bot-speed.jsonl --snapshot bot-speed-live.json --follow
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+MAX_TICKS = 10000
+TICKS = "ticks"
+DISTANCE = "[distance-traveled] of robots"
+
+
+class Welford:
+    """Running count, mean and variance of a stream of numbers."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        # Chan et al., combining two partial aggregates
+        count = self.count + other.count
+        if count:
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.count = count
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1), NaN below two values, as pandas."""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class CellStats:
+    """Accumulators of one parameter cell."""
+
+    __slots__ = ("runs", "successes", "ticks", "distance")
+
+    def __init__(self):
+        self.runs = 0
+        self.successes = 0
+        self.ticks = Welford()
+        self.distance = Welford()  # of the successful runs only
+
+    def add(self, ticks, distance, max_ticks=MAX_TICKS):
+        self.runs += 1
+        self.ticks.add(ticks)
+        if ticks < max_ticks:
+            self.successes += 1
+            self.distance.add(distance)
+
+    @property
+    def success_rate(self):
+        return self.successes / self.runs if self.runs else math.nan
+
+    def success_interval(self, z=1.96):
+        """Wilson score interval of the success rate, (0, 1) without runs."""
+        if not self.runs:
+            return 0.0, 1.0
+        n, p = self.runs, self.success_rate
+        center = (p + z * z / (2 * n)) / (1 + z * z / n)
+        half = z / (1 + z * z / n) * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+        return center - half, center + half
+
+    def ticks_interval(self, z=1.96):
+        """Normal confidence interval of the mean time to finish, infinite below two runs."""
+        if self.ticks.count < 2:
+            return -math.inf, math.inf
+        half = z * self.ticks.std / math.sqrt(self.ticks.count)
+        return self.ticks.mean - half, self.ticks.mean + half
+
+    def row(self):
+        return {
+            "runs": self.runs,
+            "successes": self.successes,
+            "distance_mean": self.distance.mean if self.distance.count else math.nan,
+            "distance_std": self.distance.std,
+            "ticks_mean": self.ticks.mean if self.ticks.count else math.nan,
+            "ticks_std": self.ticks.std,
+            "success_rate": self.success_rate,
+        }
+
+
+def outcome(record):
+    """(ticks, distance traveled) at the end of a run record."""
+    stalled = record.get("stalled")
+    if stalled and not stalled.get("validated"):
+        # ended by its monitor (herdsim.monitor), a failure that would have run to the time limit
+        return stalled["horizon"], math.nan
+    last = record["rows"][-1]
+    return last.get(TICKS, last["[step]"]), last.get(DISTANCE, math.nan)
+
+
+class Aggregator:
+    """CellStats per parameter cell, fed with run records."""
+
+    def __init__(self, max_ticks=MAX_TICKS):
+        self.max_ticks = max_ticks
+        self.cells = {}  # json of the cell values -> CellStats
+        self.experiment = None
+
+    def add(self, record):
+        self.experiment = record["experiment"]
+        key = json.dumps(record["values"], sort_keys=True)
+        stats = self.cells.get(key)
+        if stats is None:
+            stats = self.cells[key] = CellStats()
+        stats.add(*outcome(record), max_ticks=self.max_ticks)
+        return stats
+
+    def cell(self, values):
+        return self.cells.get(json.dumps(values, sort_keys=True))
+
+    @property
+    def runs(self):
+        return sum(stats.runs for stats in self.cells.values())
+
+    def rows(self):
+        return [{**json.loads(key), **stats.row()} for key, stats in sorted(self.cells.items())]
+
+    def write_snapshot(self, path):
+        """Write the current statistics as json, replacing the previous snapshot atomically."""
+        snapshot = {
+            "experiment": self.experiment,
+            "runs": self.runs,
+            "time": time.time(),
+            "cells": self.rows(),
+        }
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            # NaN is written as null, which every json reader understands
+            json.dump(_nulls(snapshot), f, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+def _nulls(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _nulls(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_nulls(v) for v in value]
+    return value
+
+
+def read_snapshot(path):
+    """A snapshot as a DataFrame with the columns of herdsim.analysis.oat_stats."""
+    import pandas as pd
+
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    stats = ("distance_mean", "distance_std", "ticks_mean", "ticks_std")
+    return pd.DataFrame(snapshot["cells"]).astype({c: float for c in stats})
+
+
+def follow(ledger, aggregator, on_record=None, poll=1.0, stop=None):
+    """Fold the records of a ledger into `aggregator`, then wait for new ones until `stop()`.
+
+    Without `stop` the ledger is read once. Only complete lines are read, a
+    record that is still being written is picked up on the next poll.
+    """
+    offset = 0
+    while True:
+        if os.path.exists(ledger):
+            with open(ledger, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    aggregator.add(record)
+                    if on_record:
+                        on_record(record)
+        if stop is None or stop():
+            return aggregator
+        time.sleep(poll)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("ledger", help="ledger of a (running) sweep")
+    parser.add_argument("--snapshot", help="json file with the live statistics, default <ledger>-live.json")
+    parser.add_argument("--follow", action="store_true", help="keep waiting for new runs, stop with ctrl-c")
+    parser.add_argument("--every", type=float, default=5.0, help="seconds between snapshots when following")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS, help="runs shorter than this are successes")
+    args = parser.parse_args(argv)
+    path = args.snapshot or os.path.splitext(args.ledger)[0] + "-live.json"
+    aggregator = Aggregator(args.max_ticks)
+    written = [time.monotonic()]
+
+    def on_record(record):
+        if time.monotonic() - written[0] >= args.every:
+            aggregator.write_snapshot(path)
+            written[0] = time.monotonic()
+
+    try:
+        follow(args.ledger, aggregator, on_record, stop=(lambda: False) if args.follow else None)
+    except KeyboardInterrupt:
+        pass
+    aggregator.write_snapshot(path)
+    print(f"{aggregator.runs} runs in {len(aggregator.cells)} cells, snapshot {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
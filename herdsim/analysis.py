@@ -0,0 +1,174 @@
+"""One-at-a-time sensitivity analysis of the BehaviorSpace sweeps in SA_results.
+
+Every sweep varies one parameter (and usually global-vision) and is shown as
+the panel figure of the paper: success rate, distance traveled of the
+successful runs and time to finish, one column per experiment. A new sweep is
+one entry in SWEEPS.
+
+    python -m herdsim.analysis population
+    python -m herdsim.analysis bot-speed --dataset SA_results/dataset --save
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+DISTANCE = "distance-traveled of robots"
+MAX_TICKS = 10000  # runs that end before the time limit brought all animals home
+
+# (label, line format) of the groups, other groups are labelled "<column> = <value>"
+GROUP_STYLES = {
+    ("global-vision", True): ("Global Vision", "o:"),
+    ("global-vision", False): ("Local Vision", "o-"),
+}
+
+
+@dataclass(frozen=True)
+class Sweep:
+    parameter: str
+    experiments: tuple  # one column of panels per experiment, read from <experiment>-table.xlsx
+    xsteps: tuple  # distance of the x ticks, per experiment
+    groups: tuple = ("global-vision",)
+
+
+SWEEPS = {
+    "population": Sweep("population", ("population-global-local",), (5,)),
+    "furthest-allowed": Sweep("furthest-allowed", ("furthest-allowed-global-local",), (5,)),
+    "min-distance-to-herd": Sweep("min-distance-to-herd", ("min-distance-to-herd-global-local",), (1,)),
+    "bot-speed": Sweep(
+        "bot-speed-ratio", ("bot-speed-global-local", "bot-speed-finer-global-local"), (1, 0.1)
+    ),
+    "global-local": Sweep("furthest-allowed", ("OAT-global-local",), (5,), groups=()),
+}
+
+
+def read_results(experiment, results="SA_results", dataset=None, columns=None):
+    """Runs of an experiment, from a herdsim.store dataset or the BehaviorSpace table export."""
+    if dataset is not None:
+        from .store import load
+
+        return load(dataset, experiment, columns)
+    df = pd.read_excel(os.path.join(results, f"{experiment}-table.xlsx"), header=6)
+    return df if columns is None else df[list(columns)]
+
+
+def oat_stats(df, parameter, groups=(), max_ticks=MAX_TICKS):
+    """Success rate, distance traveled and time to finish per group and parameter value.
+
+    The distance is averaged over the successful runs only, the time to finish
+    over all runs, as in the figures of the paper. One groupby does it all.
+    Runs ended by a stall monitor (`stalled` column of sweep ledgers) are
+    failures that would have run to `max_ticks`.
+    """
+    keys = [*groups, parameter]
+    ticks = df["ticks"]
+    if "stalled" in df:
+        ticks = ticks.where(~df["stalled"].astype(bool), max_ticks)
+    success = ticks < max_ticks
+    frame = df[keys].assign(success=success, distance=df[DISTANCE].where(success), ticks=ticks)
+    stats = frame.groupby(keys, sort=True).agg(
+        runs=("ticks", "size"),
+        successes=("success", "sum"),
+        distance_mean=("distance", "mean"),
+        distance_std=("distance", "std"),
+        ticks_mean=("ticks", "mean"),
+        ticks_std=("ticks", "std"),
+    )
+    stats["success_rate"] = stats["successes"] / stats["runs"]
+    return stats.reset_index()
+
+
+def _group_styles(stats, groups):
+    if not groups:
+        return [((), "", "o")]
+    styles = []
+    for key, _ in stats.groupby(list(groups), sort=False):
+        key = key if isinstance(key, tuple) else (key,)
+        labels = [GROUP_STYLES.get((g, v), (f"{g} = {v}", "o-")) for g, v in zip(groups, key)]
+        label = ", ".join(label for label, _ in labels)
+        styles.append((key, label, labels[-1][1]))
+    # the groups of GROUP_STYLES in its order, so global vision is drawn first
+    order = list(GROUP_STYLES)
+    return sorted(styles, key=lambda s: [order.index(gv) if gv in order else len(order) for gv in zip(groups, s[0])])
+
+
+def plot_sweep(sweep, tables):
+    """The 3-row panel figure of a sweep, `tables` are the oat_stats of its experiments."""
+    import matplotlib.pyplot as plt
+
+    style = "seaborn-whitegrid" if "seaborn-whitegrid" in plt.style.available else "seaborn-v0_8-whitegrid"
+    plt.style.use(style)
+    columns = len(tables)
+    fig, axs = plt.subplots(3, columns, sharex="col", sharey="row" if columns > 1 else False, squeeze=False)
+    plt.subplots_adjust(hspace=0.3)
+    labels = []
+    for c, (stats, step) in enumerate(zip(tables, sweep.xsteps)):
+        for key, label, fmt in _group_styles(stats, sweep.groups):
+            part = stats
+            for g, v in zip(sweep.groups, key):
+                part = part[part[g] == v]
+            x = part[sweep.parameter]
+            axs[0, c].plot(x, part["success_rate"], fmt, label=label or None)
+            axs[1, c].errorbar(x, part["distance_mean"], yerr=part["distance_std"], fmt=fmt, capsize=6)
+            axs[2, c].errorbar(x, part["ticks_mean"], yerr=part["ticks_std"], fmt=fmt, capsize=6)
+            if c == 0 and label:
+                labels.append(label)
+        x = stats[sweep.parameter]
+        axs[0, c].set_xticks(np.arange(x.min(), x.max() + step, step))
+        axs[2, c].set_xlabel(sweep.parameter, fontsize=12)
+    for row, name in enumerate(["Success Rate", "Distance Traveled", "Time to Finish"]):
+        axs[row, 0].set_ylabel(name, fontsize=12)
+        for c in range(columns):
+            mark = "abc"[row] if columns == 1 else f"{'abcdefgh'[c]}{row + 1}"
+            axs[row, c].text(-0.12, 1, mark, transform=axs[row, c].transAxes, size=20, weight="bold")
+    if labels:
+        fig.legend(labels, loc="upper right", fontsize=12)
+    return fig
+
+
+def analyse(name, results="SA_results", dataset=None):
+    """(sweep, [oat_stats per experiment]) of a sweep in SWEEPS."""
+    sweep = SWEEPS[name]
+    columns = [*sweep.groups, sweep.parameter, "ticks", DISTANCE]
+    tables = [
+        oat_stats(read_results(e, results, dataset, columns), sweep.parameter, sweep.groups)
+        for e in sweep.experiments
+    ]
+    return sweep, tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sweep", choices=sorted(SWEEPS))
+    parser.add_argument("--results", default="SA_results", help="folder of the BehaviorSpace table exports")
+    parser.add_argument("--dataset", help="read a herdsim.store dataset instead of the exports")
+    parser.add_argument("--snapshot", help="plot the live snapshot of a running sweep (herdsim.aggregate) instead")
+    parser.add_argument("--save", action="store_true", help="save the figure as <results>/<sweep>.png instead of showing it")
+    parser.add_argument("--stats", action="store_true", help="print the statistics instead of plotting")
+    args = parser.parse_args(argv)
+    if args.snapshot:
+        from .aggregate import read_snapshot
+
+        sweep, tables = SWEEPS[args.sweep], [read_snapshot(args.snapshot)]
+    else:
+        sweep, tables = analyse(args.sweep, args.results, args.dataset)
+    if args.stats:
+        for experiment, stats in zip(sweep.experiments, tables):
+            print(experiment)
+            print(stats.to_string(index=False))
+        return 0
+    fig = plot_sweep(sweep, tables)
+    if args.save:
+        fig.savefig(os.path.join(args.results, f"{args.sweep}.png"), dpi=150)
+    else:
+        import matplotlib.pyplot as plt
+
+        plt.show()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
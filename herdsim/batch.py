@@ -0,0 +1,277 @@
+import numpy as np
+
+from .forces import edge_forces, update_heading
+from .kernels import kernel
+from .model import (
+    ROBOT, flock_index, flockmate_links, forward, heading_noise, herd_steps, place_herd, relink, robot_course,
+    robotmates, towardsxy,
+)
+from .neighbors import VerletList, random_other
+from .params import Globals, Params
+from .streams import Streams
+from .visibility import list_visibles_batch
+
+# R replicates of one parameter set advancing together. Animal state has shape
+# (R, N) and robot state shape (R,); the links of all replicates are one edge
+# list over the flat ids r * N + who. Every replicate draws from its own random
+# stream in the same order as Model, so replicate r runs exactly like
+# Model(params, seed=seeds[r]). Finished replicates are dropped from the arrays.
+
+
+class Replicate:
+    """One row of a BatchModel, with the attributes of a Model (for reporters)."""
+
+    _SHARED = ("params", "g", "ticks")
+
+    def __init__(self, batch, row):
+        self._batch = batch
+        self._row = row
+
+    def __getattr__(self, name):
+        value = getattr(self._batch, name)
+        return value if name in self._SHARED else value[self._row]
+
+    @property
+    def seed(self):
+        return self._batch.seeds[self._row]
+
+    @property
+    def count_herdanimals(self):
+        return int(self.alive.sum())
+
+
+class BatchModel:
+    def __init__(
+        self, params=None, seeds=(0,), neighbors="grid", visibility="sweep", kernels="numpy", profiler=None,
+        streams=False,
+    ):
+        """Run `setup` for every seed, like Model(params, seed) per seed."""
+        self.params = params if params is not None else Params()
+        self.neighbors = neighbors
+        self.visibility = visibility
+        self.kernels = kernels
+        self.fused = kernel(kernels) if kernels != "numpy" else None
+        self.profiler = profiler
+        self.streams = streams
+        self.setup(list(seeds))
+
+    def setup(self, seeds):
+        p = self.params
+        self.g = g = Globals.from_params(p)
+        self.ticks = 0
+        self.verlet = VerletList() if self.neighbors == "verlet" else None
+        self.seeds = [73 if s is None and p.seed_option[0] == "2" else s for s in seeds]
+        r, n = len(seeds), p.population
+        if self.streams:
+            self.rngs = [Streams(s if s is not None else np.random.SeedSequence().entropy, n) for s in self.seeds]
+        else:
+            self.rngs = [np.random.default_rng(s) for s in self.seeds]
+        self.replicates = np.arange(r)  # position of every row in `seeds` as given
+        self.xcor = np.empty((r, n))
+        self.ycor = np.empty((r, n))
+        self.heading = np.empty((r, n))
+        for i in range(r):
+            self.xcor[i], self.ycor[i], self.heading[i] = place_herd(self.random(i, "setup"), p, n)
+        self.speed = np.zeros((r, n))
+        self.dLCM = np.zeros((r, n))
+        self.dTarget = np.zeros((r, n))
+        self.alive = np.ones((r, n), dtype=bool)
+        self.flock_src = np.zeros(0, dtype=np.intp)
+        self.flock_dst = np.zeros(0, dtype=np.intp)
+        self.link_src = np.zeros(0, dtype=np.intp)
+        self.link_dst = np.zeros(0, dtype=np.intp)
+        self.bot_x = np.full(r, -p.max_pxcor / 2)
+        self.bot_y = np.full(r, p.max_pycor / 2)
+        self.bot_heading = np.zeros(r)
+        self.botspeed = np.zeros(r)
+        self.distance_traveled = np.zeros(r)
+        self.LCMx = np.zeros(r)
+        self.LCMy = np.zeros(r)
+        self.visibles = np.zeros((r, n), dtype=bool)
+        self.furthest_visible = np.full(r, ROBOT, dtype=np.intp)
+        self.farmer_x = g.target_x
+        self.farmer_y = g.target_y
+
+    def random(self, row, purpose):
+        """The generator of replicate `row` for the draws of `purpose` this tick, see herdsim.streams."""
+        rng = self.rngs[row]
+        return rng.draws(purpose, self.ticks) if self.streams else rng
+
+    @property
+    def size(self):
+        """Number of replicates still running."""
+        return self.xcor.shape[0]
+
+    def replicate(self, row):
+        return Replicate(self, row)
+
+    def done(self, max_ticks=10000):
+        # exitCondition of the experiments, per replicate
+        return ~self.alive.any(axis=1) | (self.ticks >= max_ticks)
+
+    def run(self, max_ticks=10000):
+        """Run all replicates to the exit condition, report the metrics per seed like Model.run."""
+        results = [None] * len(self.seeds)
+        while self.size:
+            done = self.done(max_ticks)
+            for row in np.flatnonzero(done):
+                results[self.replicates[row]] = {"ticks": self.ticks, "distance-traveled": self.distance_traveled[row]}
+            self.retire(done)
+            if self.size:
+                self.go()
+        return results
+
+    def retire(self, rows):
+        """Drop the replicates marked in `rows` (a mask over the running replicates)."""
+        rows = np.asarray(rows, dtype=bool)
+        if not rows.any():
+            return
+        keep = ~rows
+        n = self.params.population
+        new_row = np.cumsum(keep) - 1
+        for name in (
+            "xcor", "ycor", "heading", "speed", "dLCM", "dTarget", "alive", "visibles",
+            "bot_x", "bot_y", "bot_heading", "botspeed", "distance_traveled", "LCMx", "LCMy",
+            "furthest_visible", "replicates",
+        ):
+            setattr(self, name, getattr(self, name)[keep])
+        self.seeds = [s for s, k in zip(self.seeds, keep) if k]
+        self.rngs = [rng for rng, k in zip(self.rngs, keep) if k]
+        # renumber the stale flockmates of the remaining replicates
+        row = self.flock_src // n
+        kept = keep[row]
+        self.flock_src = new_row[row[kept]] * n + self.flock_src[kept] % n
+        self.flock_dst = new_row[row[kept]] * n + self.flock_dst[kept] % n
+        self.link_src = self.link_dst = np.zeros(0, dtype=np.intp)
+        if self.verlet is not None:
+            # the ids of the remaining replicates changed
+            self.verlet.reset()
+
+    def go(self):
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.go(self)
+        else:
+            for _, step in self.phases():
+                step()
+        self.ticks += 1
+
+    def phases(self):
+        """The procedures of one tick of `go` in order, (name, method)."""
+        phases = [
+            ("list-visibles", self.list_visibles),
+            ("linking", self.linking),
+            ("dTarget", self.distance_to_target),
+            # update-real-heading is part of the link forces
+            ("link-attribute-calculations", self.link_attribute_calculations),
+            ("movement", self.movement),
+        ]
+        if self.params.auto_shepherd:
+            phases += [("botmove", self.botmove), ("die-on-target", self.die_on_target)]
+        return phases
+
+    def distance_to_target(self):
+        self.dTarget = np.hypot(self.xcor - self.g.target_x, self.ycor - self.g.target_y)
+
+    # robot procedures
+
+    def list_visibles(self):
+        visibles, lcm_x, lcm_y, dLCM, furthest = list_visibles_batch(
+            self.bot_x, self.bot_y, self.xcor, self.ycor, self.alive,
+            self.g.entity_width, self.params.global_vision, self.visibility,
+        )
+        self.visibles = visibles
+        self.furthest_visible = furthest
+        seen = furthest >= 0
+        self.LCMx = np.where(seen, lcm_x, self.LCMx)
+        self.LCMy = np.where(seen, lcm_y, self.LCMy)
+        self.dLCM = np.where(visibles, dLCM, self.dLCM)
+
+    def botmove(self):
+        p, g = self.params, self.g
+        seen = self.visibles & self.alive
+        moving = seen.any(axis=1)
+        if not moving.any():
+            return
+        botspeed, to_x, to_y = robot_course(
+            p, g, self.xcor, self.ycor, seen, self.dLCM, self.dTarget, self.furthest_visible,
+            self.LCMx, self.LCMy, self.bot_x, self.bot_y,
+        )
+        self.botspeed = np.where(moving, botspeed, self.botspeed)
+        turn = moving & ((to_x != self.bot_x) | (to_y != self.bot_y))
+        self.bot_heading = np.where(turn, towardsxy(self.bot_x, self.bot_y, to_x, to_y), self.bot_heading)
+        step = np.where(moving, g.max_speed_bot * self.botspeed, 0.0)
+        self.fd_robot(step, moving)
+        self.distance_traveled = np.where(moving, self.distance_traveled + step, self.distance_traveled)
+
+    def fd_robot(self, step, moving):
+        x, y = forward(self.params, self.bot_x, self.bot_y, self.bot_heading, step)
+        self.bot_x = np.where(moving, x, self.bot_x)
+        self.bot_y = np.where(moving, y, self.bot_y)
+
+    def die_on_target(self):
+        near = np.hypot(self.xcor - self.farmer_x, self.ycor - self.farmer_y) <= self.params.farmer_vision
+        self.alive &= ~near
+
+    # herdanimal procedures
+
+    def linking(self):
+        p = self.params
+        r, n = self.xcor.shape
+        x, y = self.xcor.reshape(-1), self.ycor.reshape(-1)
+        alive = self.alive.reshape(-1)
+        mates = robotmates(p, self.xcor, self.ycor, self.alive, self.bot_x, self.bot_y).reshape(-1)
+        index = None
+        members = np.flatnonzero(alive)
+        if p.model_neighbor[0] in "123":
+            index = flock_index(self.neighbors, self.verlet, p, self.g, x, y, members, groups=members // n)
+            rows = np.flatnonzero(alive & ~mates)
+        else:
+            rows = np.zeros(0, dtype=np.intp)
+
+        def long_range(table):
+            # one random herdanimal per row, from the stream of every replicate
+            lr_one = np.empty(rows.size, dtype=np.intp)
+            bounds = np.searchsorted(rows // n, np.arange(r + 1))
+            member_bounds = np.searchsorted(members // n, np.arange(r + 1))
+            for i in range(r):
+                q = slice(bounds[i], bounds[i + 1])
+                group = members[member_bounds[i]:member_bounds[i + 1]]
+                lr_one[q] = random_other(group, rows[q], table[q], self.random(i, "one-of"))
+            return lr_one
+
+        src, dst = flockmate_links(p, self.g, index, x, y, rows, long_range)
+        self.flock_src, self.flock_dst, self.link_src, self.link_dst = relink(
+            self.flock_src, self.flock_dst, rows, src, dst, np.flatnonzero(mates)
+        )
+
+    def link_attribute_calculations(self):
+        if self.fused is not None:
+            # computed together with update-heading in movement
+            return
+        self.force_x, self.force_y = edge_forces(
+            self.link_src, self.link_dst, self.xcor.reshape(-1), self.ycor.reshape(-1), self.heading.reshape(-1),
+            self.bot_x, self.bot_y, self.params.population, self.params, self.g,
+        )
+
+    def movement(self):
+        p, g = self.params, self.g
+        shape = self.xcor.shape
+        alive = self.alive
+        if self.fused is not None:
+            heading, speed = self.fused(
+                self.link_src, self.link_dst, self.xcor.reshape(-1), self.ycor.reshape(-1),
+                self.heading.reshape(-1), self.speed.reshape(-1), self.bot_x, self.bot_y, shape[1], p, g,
+            )
+        else:
+            heading, speed = update_heading(
+                self.link_src, self.force_x, self.force_y, self.heading.reshape(-1), self.speed.reshape(-1), g
+            )
+        heading, speed = heading.reshape(shape), speed.reshape(shape)
+        noise = np.empty(shape)
+        for i in range(shape[0]):
+            noise[i] = heading_noise(self.random(i, "randomness"), p, shape[1])
+        self.heading = np.where(alive, (heading + noise) % 360, self.heading)
+        self.speed = np.where(alive, speed, self.speed)
+        self.xcor, self.ycor = herd_steps(
+            p, g, self.xcor, self.ycor, self.heading, self.speed, alive, self.flock_src, self.flock_dst
+        )
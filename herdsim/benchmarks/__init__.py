@@ -0,0 +1 @@
+"""Benchmarks of the herdsim engine, run them with `python -m herdsim.benchmarks.<name>`."""
@@ -0,0 +1,55 @@
+"""Common random numbers: paired differences between two parameter values, with and without streams.
+
+Every seed runs at both values, once with the sequential generator and once
+with the counter-based streams of herdsim.streams. The spread of the paired
+differences tells how many repetitions a comparison needs in either mode.
+
+    python -m herdsim.benchmarks.crn --parameter global-vision --values false true --seeds 30
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from ..batch import BatchModel
+from ..params import Params
+
+
+def paired(parameter, values, seeds, params=None, **options):
+    """Ticks of every seed at two values of a parameter, {streams: (ticks at values[0], ticks at values[1])}."""
+    base = params or Params()
+    result = {}
+    for streams in (False, True):
+        ticks = []
+        for value in values:
+            runs = BatchModel(base.with_netlogo({parameter: value}), seeds=seeds, streams=streams, **options).run()
+            ticks.append(np.array([run["ticks"] for run in runs], dtype=float))
+        result[streams] = tuple(ticks)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parameter", default="global-vision", help="NetLogo name of the compared parameter")
+    parser.add_argument("--values", nargs=2, default=["false", "true"], help="the two values compared")
+    parser.add_argument("--seeds", type=int, default=30, help="paired runs per mode")
+    parser.add_argument("--population", type=int, default=Params().population)
+    args = parser.parse_args(argv)
+    result = paired(args.parameter, args.values, list(range(args.seeds)), Params(population=args.population))
+    print(f"{args.parameter} {args.values[0]} vs {args.values[1]}, {args.seeds} seeds, ticks to bring the herd home")
+    sd = {}
+    for streams, (first, second) in result.items():
+        diff = second - first
+        sd[streams] = diff.std(ddof=1)
+        corr = np.corrcoef(first, second)[0, 1] if first.std() and second.std() else np.nan
+        print(
+            f"{'streams' if streams else 'generator':>10}: mean difference {diff.mean():+.1f} "
+            f"+- {sd[streams] / np.sqrt(diff.size):.1f}, sd of differences {sd[streams]:.1f}, correlation {corr:.2f}"
+        )
+    if sd[False] > 0:
+        print(f"repetitions for the same precision with streams: {(sd[True] / sd[False]) ** 2:.2f} x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Force accumulation and update-heading, NumPy against the fused numba kernel.
+
+    python -m herdsim.benchmarks.kernels --populations 50 500 5000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from ..kernels import KERNELS
+from ..model import Model
+from ..params import Params
+
+
+def links_of(population, model_neighbor, ticks):
+    # the links of a model after a few ticks, a realistic edge list
+    model = Model(Params(population=population, model_neighbor=model_neighbor), seed=0)
+    for _ in range(ticks):
+        model.go()
+    model.list_visibles()
+    model.linking()
+    return model
+
+
+def timeit(f, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--populations", type=int, nargs="+", default=[50, 500, 5000, 20000])
+    parser.add_argument("--model-neighbor", default=Params().model_neighbor)
+    parser.add_argument("--ticks", type=int, default=5, help="ticks to run before taking the links")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    kinds = [kind for kind, f in KERNELS.items() if f is not None]
+    print(f"{'population':>10}{'links':>9}" + "".join(f"{kind + ' ms':>12}" for kind in kinds) + f"{'max diff':>11}")
+    for n in args.populations:
+        m = links_of(n, args.model_neighbor, args.ticks)
+        inputs = (
+            m.link_src, m.link_dst, m.xcor, m.ycor, m.heading, m.speed,
+            np.array([m.bot_x]), np.array([m.bot_y]), n, m.params, m.g,
+        )
+        results = [KERNELS[kind](*inputs) for kind in kinds]  # the first call compiles
+        times = [timeit(lambda f=KERNELS[kind]: f(*inputs), args.repeat) for kind in kinds]
+        diff = max(np.abs(r[0] - results[0][0]).max() for r in results)
+        print(f"{n:>10}{m.link_src.size:>9}" + "".join(f"{t * 1e3:>12.3f}" for t in times) + f"{diff:>11.2g}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
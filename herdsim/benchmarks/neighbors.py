@@ -0,0 +1,74 @@
+"""Scaling of the neighbor search with population, per index and neighbor model.
+
+    python -m herdsim.benchmarks.neighbors --populations 100 1000 10000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from ..neighbors import build_index
+from ..params import Params
+
+
+def positions(n, spread, rng, p):
+    # a herd around the middle of the world, spread is the standard deviation
+    x = np.clip(rng.normal(0, spread, n), p.min_pxcor + 2, p.max_pxcor - 2)
+    y = np.clip(rng.normal(0, spread, n), p.min_pycor + 2, p.max_pycor - 2)
+    return x, y
+
+
+def search(kind, model, x, y, vision, rng):
+    # one tick of neighbor search: build the index and query every animal
+    ids = np.arange(x.size)
+    index = build_index(kind, x, y, ids, vision, nearest=model != "metric")
+    if model == "metric":
+        index.within(x, y, ids, vision)
+    else:
+        table = index.nearest(x, y, ids, 5, vision)
+        if model == "long-range":
+            index.random_other(ids, table, rng)
+
+
+def timeit(f, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--populations", type=int, nargs="+", default=[10, 100, 300, 1000, 3000, 10000])
+    parser.add_argument("--models", nargs="+", default=["metric", "topological", "long-range"])
+    parser.add_argument("--indexes", nargs="+", default=["brute", "grid", "kdtree"])
+    parser.add_argument("--vision", type=float, default=Params().vision)
+    parser.add_argument("--spread", type=float, default=10.0, help="standard deviation of the herd positions")
+    parser.add_argument("--brute-max", type=int, default=3000, help="largest population for the brute force index")
+    parser.add_argument("--metric-max", type=int, default=3000, help="largest population for the metric model")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+    p = Params()
+    print(f"{'model':<12}{'population':>11}" + "".join(f"{kind + ' ms':>12}" for kind in args.indexes))
+    for model in args.models:
+        for n in args.populations:
+            if model == "metric" and n > args.metric_max:
+                continue
+            x, y = positions(n, args.spread, rng, p)
+            row = f"{model:<12}{n:>11}"
+            for kind in args.indexes:
+                if kind == "brute" and n > args.brute_max:
+                    row += f"{'-':>12}"
+                    continue
+                seconds = timeit(lambda: search(kind, model, x, y, args.vision, rng), args.repeat)
+                row += f"{seconds * 1000:>12.2f}"
+            print(row, flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
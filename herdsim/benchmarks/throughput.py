@@ -0,0 +1,207 @@
+"""Ticks per second of the whole model, over population, neighbor model, vision and batch size.
+
+`run` times every case of the matrix and writes the results with the
+machine, library versions and git commit to json; `compare` matches the
+cases of two such files and flags the ones that got slower:
+
+    git checkout main && python -m herdsim.benchmarks.throughput run --output base.json
+    git checkout topic && python -m herdsim.benchmarks.throughput run --output head.json
+    python -m herdsim.benchmarks.throughput compare base.json head.json --tolerance 0.1
+
+A case is set up once, warmed up for a few ticks and then timed over
+`--repeat` segments of up to `--ticks` ticks (shorter when a segment takes
+longer than `--budget` seconds); the fastest segment counts. Agent updates
+are the living herdanimals moved per second, summed over the replicates.
+Batch size 1 is the plain Model, larger sizes a BatchModel.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+from ..batch import BatchModel
+from ..model import Model
+from ..params import Params
+
+MODELS = ("1 Metric neighbor", "2 Topological neighbor", "3 Long-range neighbor")
+
+
+def _git(*args):
+    try:
+        out = subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def machine():
+    """Where and with what the benchmark ran."""
+    versions = {}
+    for name in ("numpy", "scipy", "numba"):
+        try:
+            versions[name] = importlib.import_module(name).__version__
+        except ImportError:
+            versions[name] = None
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "load": os.getloadavg()[0] if hasattr(os, "getloadavg") else None,
+        "python": platform.python_version(),
+        **versions,
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def case_key(case):
+    return case["population"], case["model_neighbor"], case["global_vision"], case["batch"]
+
+
+def measure(population, model_neighbor, global_vision, batch, ticks=100, warmup=10, repeat=3, budget=5.0,
+            **options):
+    """Time one case, a result dict with ticks/s and agent updates/s of the fastest segment."""
+    params = Params(population=population, model_neighbor=model_neighbor, global_vision=global_vision)
+    if batch == 1:
+        model = Model(params, seed=0, **options)
+    else:
+        model = BatchModel(params, seeds=range(batch), **options)
+    for _ in range(warmup):
+        model.go()
+    best = None
+    for _ in range(repeat):
+        done = updates = 0
+        start = time.perf_counter()
+        while done < ticks and model.alive.any():
+            updates += int(model.alive.sum())
+            model.go()
+            done += 1
+            if time.perf_counter() - start > budget:
+                break
+        seconds = time.perf_counter() - start
+        if done and (best is None or done / seconds > best["ticks_per_second"]):
+            best = {
+                "ticks": done,
+                "seconds": seconds,
+                "ticks_per_second": done / seconds,
+                "agent_updates_per_second": updates / seconds,
+            }
+    return {
+        "population": population,
+        "model_neighbor": model_neighbor,
+        "global_vision": global_vision,
+        "batch": batch,
+        **(best or {"ticks": 0, "seconds": 0.0, "ticks_per_second": None, "agent_updates_per_second": None}),
+    }
+
+
+def cases(populations, models, visions, batches, metric_max, max_agents):
+    for population in populations:
+        for model_neighbor in models:
+            if model_neighbor.startswith("1") and population > metric_max:
+                continue
+            for global_vision in visions:
+                for batch in batches:
+                    if population * batch <= max_agents:
+                        yield population, model_neighbor, global_vision, batch
+
+
+def compare(base, head, tolerance=0.1):
+    """(rows, regressions) of the cases in both result files; a row is (case, base t/s, head t/s, ratio)."""
+    old = {case_key(r): r["ticks_per_second"] for r in base["results"]}
+    rows, regressions = [], []
+    for result in head["results"]:
+        key = case_key(result)
+        if old.get(key) is None or result["ticks_per_second"] is None:
+            continue
+        ratio = result["ticks_per_second"] / old[key]
+        rows.append((key, old[key], result["ticks_per_second"], ratio))
+        if ratio < 1 - tolerance:
+            regressions.append(key)
+    return rows, regressions
+
+
+def _label(key):
+    population, model_neighbor, global_vision, batch = key
+    vision = "global" if global_vision else "local"
+    return f"{population:>10} {model_neighbor.split()[1].lower():<12}{vision:<8}{batch:>6}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    r = commands.add_parser("run", help="time the matrix of cases and write json")
+    r.add_argument("--output", help="result file, default throughput-<commit>.json")
+    r.add_argument("--populations", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    r.add_argument("--models", nargs="+", default=list(MODELS), help="model-neighbor values")
+    r.add_argument("--global-vision", nargs="+", default=["false", "true"], choices=["false", "true"])
+    r.add_argument("--batches", type=int, nargs="+", default=[1, 8], help="replicates advanced together")
+    r.add_argument("--metric-max", type=int, default=3000, help="largest population for the metric model")
+    r.add_argument("--max-agents", type=int, default=10000, help="largest population x batch")
+    r.add_argument("--ticks", type=int, default=100, help="ticks of a timed segment")
+    r.add_argument("--warmup", type=int, default=10)
+    r.add_argument("--repeat", type=int, default=3, help="timed segments, the fastest counts")
+    r.add_argument("--budget", type=float, default=5.0, help="seconds after which a segment stops early")
+    r.add_argument("--neighbors", default="grid", help="neighbor index of the models")
+    r.add_argument("--kernels", default="numpy", help="force kernels of the models")
+    c = commands.add_parser("compare", help="flag cases of HEAD slower than in BASE")
+    c.add_argument("base")
+    c.add_argument("head")
+    c.add_argument("--tolerance", type=float, default=0.1, help="relative slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.head, encoding="utf-8") as f:
+            head = json.load(f)
+        for name in ("host", "processor", "python", "numpy"):
+            if base["machine"].get(name) != head["machine"].get(name):
+                print(f"warning: {name} differs, {base['machine'].get(name)} vs {head['machine'].get(name)}")
+        rows, regressions = compare(base, head, args.tolerance)
+        print(f"{'population':>10} {'model':<12}{'vision':<8}{'batch':>6}{'base t/s':>11}{'head t/s':>11}{'change':>9}")
+        for key, old, new, ratio in rows:
+            flag = "  REGRESSION" if key in regressions else ""
+            print(f"{_label(key)}{old:>11.1f}{new:>11.1f}{ratio - 1:>+9.1%}{flag}")
+        print(f"{len(regressions)} of {len(rows)} cases slower by more than {args.tolerance:.0%}")
+        return 1 if regressions else 0
+
+    info = machine()
+    visions = [value == "true" for value in args.global_vision]
+    results = []
+    print(f"{'population':>10} {'model':<12}{'vision':<8}{'batch':>6}{'ticks/s':>11}{'updates/s':>12}")
+    for case in cases(args.populations, args.models, visions, args.batches, args.metric_max, args.max_agents):
+        result = measure(
+            *case, ticks=args.ticks, warmup=args.warmup, repeat=args.repeat, budget=args.budget,
+            neighbors=args.neighbors, kernels=args.kernels,
+        )
+        results.append(result)
+        if result["ticks_per_second"] is None:
+            print(f"{_label(case_key(result))}{'-':>11}{'-':>12}", flush=True)
+            continue
+        print(
+            f"{_label(case_key(result))}{result['ticks_per_second']:>11.1f}"
+            f"{result['agent_updates_per_second']:>12.0f}", flush=True,
+        )
+    options = {name: getattr(args, name) for name in ("ticks", "warmup", "repeat", "budget", "neighbors", "kernels")}
+    output = args.output or f"throughput-{(info['commit'] or 'unknown')[:8]}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"machine": info, "options": options, "results": results}, f, indent=1)
+    print(f"written {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Ticks per second of a headless run with and without a live viewer attached.
+
+    python -m herdsim.benchmarks.viewer --populations 50 500 2000
+
+Every population runs the same ticks (best of `--repeat`) in four ways: without a Publisher, with
+a server but no client, with a client reading every frame from the Unix
+socket (another process) and with a client that reads a frame per second.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from ..model import Model
+from ..params import Params
+from ..viewer import Publisher, Server, run
+
+CASES = ("no server", "no client", "client", "slow client")
+
+
+def timed(population, case, ticks, warmup, every, fps, path):
+    model = Model(Params(population=population), seed=0)
+    for _ in range(warmup):
+        model.go()
+    if case == "no server":
+        start = time.perf_counter()
+        for _ in range(ticks):
+            model.go()
+        return ticks / (time.perf_counter() - start), 0
+    publisher = Publisher(every)
+    with Server(publisher, path, fps=fps) as server:
+        client = None
+        if case != "no client":
+            delay = ["--delay", "1"] if case == "slow client" else []
+            client = subprocess.Popen(
+                [sys.executable, "-m", "herdsim.viewer", "watch", path, *delay], stdout=subprocess.DEVNULL,
+            )
+            while not publisher.clients:
+                time.sleep(0.01)
+        start = time.perf_counter()
+        run(model, publisher, ticks)
+        rate = ticks / (time.perf_counter() - start)
+    if client is not None:
+        client.kill()
+        client.wait()
+    return rate, server.sent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--populations", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--every", type=int, default=1, help="publish every n-th tick")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest counts")
+    args = parser.parse_args(argv)
+    path = os.path.join(tempfile.mkdtemp(), "herd.sock")
+    print(f"{'population':>10}" + "".join(f"{case + ' t/s':>17}" for case in CASES) + f"{'frames':>8}")
+    for n in args.populations:
+        rates, sent = [], 0
+        for case in CASES:
+            runs = [timed(n, case, args.ticks, args.warmup, args.every, args.fps, path) for _ in range(args.repeat)]
+            rate, frames = max(runs)
+            rates.append(rate)
+            sent = frames if case == "client" else sent
+        print(f"{n:>10}" + "".join(f"{rate:>17.1f}" for rate in rates) + f"{sent:>8}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
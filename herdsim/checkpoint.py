@@ -0,0 +1,164 @@
+"""Snapshots of the full simulation state: fork a run, or resume it after a crash.
+
+A snapshot holds every array of the herdanimals and the robot, the scalars,
+the tick and the state of the random generator(s), so a model restored from
+it continues exactly like the original (Model and BatchModel alike).
+`fork` branches a running model, optionally with other robot parameters:
+
+    warm = Model(params, seed=3)
+    for _ in range(500):
+        warm.go()
+    fast = fork(warm, bot_speed_ratio=8)
+
+Snapshots are saved as .npz files. herdsim.sweep checkpoints long runs with
+`--checkpoints DIR` and resumes them from the last checkpoint when the sweep
+is started again. A checkpoint names its owner (experiment, cell, seeds,
+parameters and model options); only a run with the same owner resumes it.
+"""
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, replace
+
+import numpy as np
+
+from .batch import BatchModel
+from .kernels import kernel
+from .model import Model
+from .neighbors import VerletList
+from .params import Globals, Params
+from .streams import Streams
+
+CLASSES = {"Model": Model, "BatchModel": BatchModel}
+# rebuilt every tick, or derived from the parameters and options
+TRANSIENT = ("index", "force_x", "force_y", "fused", "profiler", "g", "params", "verlet")
+# parameters that shape the arrays or the world, a fork cannot change them
+FIXED = ("population", "min_pxcor", "max_pxcor", "min_pycor", "max_pycor")
+
+
+def _rng_state(rng):
+    return rng.state if isinstance(rng, Streams) else rng.bit_generator.state
+
+
+def _rng(state):
+    if state["bit_generator"] == "Streams":
+        return Streams(state["seed"], state["population"])
+    rng = np.random.Generator(getattr(np.random, state["bit_generator"])())
+    rng.bit_generator.state = state
+    return rng
+
+
+def state(model):
+    """Snapshot of a model, a dict of copied arrays and json-friendly values."""
+    arrays, values = {}, {}
+    for name, value in vars(model).items():
+        if name in TRANSIENT:
+            continue
+        if isinstance(value, np.ndarray):
+            arrays[name] = value.copy()
+        elif isinstance(value, (np.random.Generator, Streams)):
+            values[name] = _rng_state(value)
+        elif isinstance(value, list) and value and isinstance(value[0], (np.random.Generator, Streams)):
+            values[name] = [_rng_state(rng) for rng in value]
+        else:
+            values[name] = value.item() if isinstance(value, np.generic) else value
+    return {"class": type(model).__name__, "params": asdict(model.params), "values": values, "arrays": arrays}
+
+
+def restore(snapshot, profiler=None, **changes):
+    """A model continuing from a snapshot, with parameters changed by `changes` (python names)."""
+    params = Params(**snapshot["params"])
+    fixed = [name for name in changes if name in FIXED and changes[name] != getattr(params, name)]
+    if fixed:
+        raise ValueError(f"a fork cannot change {', '.join(fixed)}")
+    params = replace(params, **changes)
+    cls = CLASSES[snapshot["class"]]
+    model = cls.__new__(cls)
+    for name, value in snapshot["values"].items():
+        if name == "rng":
+            value = _rng(value)
+        elif name == "rngs":
+            value = [_rng(s) for s in value]
+        setattr(model, name, value)
+    for name, array in snapshot["arrays"].items():
+        setattr(model, name, array.copy())
+    model.params = params
+    model.g = Globals.from_params(params)
+    model.fused = kernel(model.kernels) if model.kernels != "numpy" else None
+    model.profiler = profiler
+    # a new Verlet list is built on the next tick, with the same flockmates
+    model.verlet = VerletList() if model.neighbors == "verlet" else None
+    return model
+
+
+def fork(model, profiler=None, **changes):
+    """An independent copy of a running model, e.g. with other robot parameters."""
+    return restore(state(model), profiler, **changes)
+
+
+def save(model, path, extra=None, owner=None):
+    """Write the snapshot of a model (and json-friendly `extra`) to an .npz file, atomically."""
+    snapshot = state(model)
+    meta = {key: snapshot[key] for key in ("class", "params", "values")}
+    meta["owner"] = _canonical(owner)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, __meta__=np.array(json.dumps({**meta, "extra": extra})), **snapshot["arrays"])
+    os.replace(tmp, path)
+
+
+def _read(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data["__meta__"]))
+        arrays = {name: data[name] for name in data.files if name != "__meta__"}
+    return meta, arrays
+
+
+def load(path, profiler=None):
+    """(model, extra) of a snapshot file."""
+    meta, arrays = _read(path)
+    return restore({**meta, "arrays": arrays}, profiler), meta["extra"]
+
+
+def _canonical(owner):
+    return None if owner is None else json.dumps(owner, sort_keys=True, default=str)
+
+
+@dataclass(frozen=True)
+class Checkpoints:
+    """Where and how often herdsim.sweep checkpoints its runs.
+
+    The `owner` of a checkpoint is a json-friendly dict of what makes the run
+    (experiment, cell values, seeds, parameters, options). Run numbers are
+    shared by other experiments and parameters, so the owner goes into the
+    file name, and a checkpoint of another owner is never resumed.
+    """
+
+    path: str
+    every: int = 1000
+
+    def file(self, run, owner=None):
+        if owner is None:
+            return os.path.join(self.path, f"run-{run}.npz")
+        digest = hashlib.sha1(_canonical(owner).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.path, f"run-{run}-{digest}.npz")
+
+    def due(self, ticks):
+        return ticks % self.every == 0
+
+    def save(self, run, model, extra=None, owner=None):
+        os.makedirs(self.path, exist_ok=True)
+        save(model, self.file(run, owner), extra, owner)
+
+    def load(self, run, profiler=None, owner=None):
+        """(model, extra) of the last checkpoint of a run, None without one or with another owner."""
+        path = self.file(run, owner)
+        if not os.path.exists(path):
+            return None
+        meta, arrays = _read(path)
+        if meta.get("owner") != _canonical(owner):
+            return None
+        return restore({**meta, "arrays": arrays}, profiler), meta["extra"]
+
+    def discard(self, run, owner=None):
+        if os.path.exists(self.file(run, owner)):
+            os.remove(self.file(run, owner))
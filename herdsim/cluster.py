@@ -0,0 +1,420 @@
+"""Run a sweep on many machines: a coordinator leases jobs to workers over TCP.
+
+The coordinator owns the ledger. It splits the missing jobs of an experiment
+into small batches (runs of one parameter cell) and leases them to workers,
+which pull a batch, run it on their cores and send the records back. A lease
+that is not renewed by heartbeats within `--lease` seconds (a worker died or
+lost the network) goes back to the queue, and a record that arrives twice
+is only written once, so workers can come and go at any time:
+
+    python -m herdsim.cluster serve bot-speed --ledger bot-speed.jsonl --host 0.0.0.0 --port 5555
+    python -m herdsim.cluster work coordinator-host:5555 --processes 16 --batch
+
+Every worker needs the same herds.nlogo and herdsim. The run options
+(streams, stall monitor, profile) are given to the coordinator and travel
+with every lease, so all records of the ledger are run alike. Messages are
+json lines, one reply per request:
+
+    {"op": "lease", "worker": w, "jobs": n}  -> {"lease": id, "experiment": name, "ttl": seconds,
+                                                 "options": {...}, "jobs": [...]}
+                                                or {"wait": seconds}, or {"done": true}
+    {"op": "heartbeat", "leases": [id, ...]} -> {"lost": [id, ...]}
+    {"op": "result", "lease": id, "records": [...]} -> {"written": k, "duplicates": d}
+
+A worker drops the runs of a lost lease, which is leased again elsewhere.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .experiments import Job, read_experiments
+from .monitor import Monitor, RobotStuck
+from .sweep import Ledger, job_key, run_cell, run_job
+
+
+def _job_message(job):
+    return {"run": job.run_number, "values": [list(pair) for pair in job.values], "repetition": job.repetition,
+            "seed": job.seed}
+
+
+def _job(experiment, message):
+    values = tuple((name, value) for name, value in message["values"])
+    return Job(experiment, message["run"], values, message["repetition"], message["seed"])
+
+
+def run_options(options):
+    """The keyword arguments of run_job / run_cell for the json run options of a lease.
+
+    `stall` ({"validate": bool, "robot_stuck": bool}) becomes a Monitor, the
+    others (profile, streams, neighbors, ...) are passed as they are.
+    """
+    options = dict(options)
+    stall = options.pop("stall", None)
+    if stall is not None:
+        rules = Monitor.rules + ((RobotStuck(),) if stall.get("robot_stuck") else ())
+        options["monitor"] = Monitor(rules, validate=stall.get("validate", False))
+    return options
+
+
+class Coordinator:
+    """The queue of the missing jobs of an experiment, with leases; thread safe."""
+
+    def __init__(self, experiment, ledger, base_seed=0, lease=120.0, batch_size=10, on_record=None, options=None):
+        """`options` are the json run options of every lease, see run_options."""
+        self.experiment = experiment
+        self.ledger = ledger
+        self.options = options or {}
+        self.lease_seconds = lease
+        self.on_record = on_record
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.done = ledger.load()
+        self.wanted = {job_key(job.cell, job.seed) for job in experiment.jobs(base_seed)}
+        missing = [job for job in experiment.jobs(base_seed) if job_key(job.cell, job.seed) not in self.done]
+        # batches of one cell each, so a worker can run them together in a BatchModel
+        cells = {}
+        for job in missing:
+            cells.setdefault(job.values, []).append(job)
+        self.pending = deque(cell[i:i + batch_size] for cell in cells.values() for i in range(0, len(cell), batch_size))
+        self.leases = {}  # id -> (worker, jobs, deadline)
+        self.total = len(missing)
+        self.written = 0
+        self.reissued = 0
+        self.duplicates = 0
+        if not self.total:
+            self.finished.set()
+
+    def _expire(self, now):
+        for lease_id, (_, jobs, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[lease_id]
+                jobs = [job for job in jobs if job_key(job.cell, job.seed) not in self.done]
+                if jobs:
+                    self.pending.appendleft(jobs)
+                    self.reissued += 1
+
+    def lease(self, worker, n=1):
+        """Reply to a lease request for about `n` jobs (whole batches, at least one)."""
+        with self.lock:
+            now = time.monotonic()
+            self._expire(now)
+            if self.finished.is_set():
+                return {"done": True}
+            if not self.pending:
+                # everything is leased, ask again when a lease may have expired
+                return {"wait": self.wait_seconds}
+            jobs = []
+            while self.pending and (not jobs or len(jobs) + len(self.pending[0]) <= n):
+                jobs += self.pending.popleft()
+            lease_id = uuid.uuid4().hex
+            self.leases[lease_id] = (worker, jobs, now + self.lease_seconds)
+            return {
+                "lease": lease_id,
+                "experiment": self.experiment.name,
+                "ttl": self.lease_seconds,
+                "options": self.options,
+                "jobs": [_job_message(job) for job in jobs],
+            }
+
+    @property
+    def wait_seconds(self):
+        """How long a worker without a lease waits before it asks again."""
+        return min(5.0, self.lease_seconds / 4)
+
+    def heartbeat(self, leases):
+        """Renew leases; the ids that were reissued or finished meanwhile are lost."""
+        with self.lock:
+            deadline = time.monotonic() + self.lease_seconds
+            lost = []
+            for lease_id in leases:
+                if lease_id in self.leases:
+                    worker, jobs, _ = self.leases[lease_id]
+                    self.leases[lease_id] = (worker, jobs, deadline)
+                else:
+                    lost.append(lease_id)
+            return {"lost": lost}
+
+    def result(self, lease_id, records):
+        """Write the new records of a lease to the ledger, dropping runs that are already in it."""
+        with self.lock:
+            self.leases.pop(lease_id, None)
+            written = duplicates = 0
+            for record in records:
+                key = job_key(record["values"], record["seed"])
+                if key in self.done or key not in self.wanted:
+                    duplicates += 1
+                    continue
+                self.ledger.append(record)
+                self.done[key] = record
+                written += 1
+                if self.on_record:
+                    self.on_record(record)
+            self.written += written
+            self.duplicates += duplicates
+            if self.wanted.issubset(self.done):
+                self.finished.set()
+            return {"written": written, "duplicates": duplicates}
+
+    def handle(self, message):
+        if not isinstance(message, dict):
+            return {"error": f"a message is a json object, not {type(message).__name__}"}
+        op = message.get("op")
+        if op == "lease":
+            return self.lease(message.get("worker"), message.get("jobs", 1))
+        if op == "heartbeat":
+            return self.heartbeat(message.get("leases", []))
+        if op == "result":
+            return self.result(message["lease"], message["records"])
+        return {"error": f"unknown op {op!r}"}
+
+    def records(self):
+        """All records of the experiment, sorted by run number."""
+        with self.lock:
+            return sorted((r for k, r in self.done.items() if k in self.wanted), key=lambda r: r["run"])
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                reply = self.server.coordinator.handle(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {"error": str(e)}
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, coordinator, host="127.0.0.1", port=0):
+        self.coordinator = coordinator
+        super().__init__((host, port), _Handler)
+
+
+def serve(coordinator, host="127.0.0.1", port=0):
+    """Start a server for `coordinator` in a thread; its address is server.server_address."""
+    server = Server(coordinator, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Client:
+    """A connection to the coordinator, shared by the threads of a worker."""
+
+    def __init__(self, address, timeout=60.0, retries=5):
+        host, _, port = address.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port))
+        self.timeout = timeout
+        self.retries = retries
+        self.lock = threading.Lock()
+        self.sock = None
+        self.file = None
+
+    def _connect(self):
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.file = self.sock.makefile("rwb")
+
+    def close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = self.file = None
+
+    def request(self, message):
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        with self.lock:
+            for attempt in range(self.retries):
+                try:
+                    if self.sock is None:
+                        self._connect()
+                    self.file.write(data)
+                    self.file.flush()
+                    line = self.file.readline()
+                    if not line:
+                        raise ConnectionError("coordinator closed the connection")
+                    return json.loads(line)
+                except OSError:
+                    self.close()
+                    if attempt == self.retries - 1:
+                        raise
+                    time.sleep(min(2**attempt, 30))
+
+
+def work(address, processes=None, batch=False, worker=None, model="herds.nlogo"):
+    """Pull leases from the coordinator at `address` until the sweep is done; the number of runs done.
+
+    Keeps about twice `processes` jobs in flight so the pool never idles
+    while a lease travels, and renews the leases from a heartbeat thread.
+    The jobs of a lease that the coordinator reports lost are cancelled and
+    their records dropped. With `batch` the jobs of a lease run together in
+    a BatchModel. The jobs run with the run options of their lease.
+    """
+    processes = processes or os.cpu_count()
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    client = Client(address)
+    experiments = {}
+    active = {}  # lease -> {"jobs": list, "futures": set, "records": list}
+    futures = {}  # future -> lease
+    lost = queue.SimpleQueue()  # leases reported lost by the heartbeat thread
+    stop = threading.Event()
+    ttl = [None]  # of the leases, known from the first one
+
+    def heartbeat():
+        while not stop.wait(ttl[0] / 3 if ttl[0] else 0.5):
+            leases = list(active)
+            if leases:
+                try:
+                    reply = client.request({"op": "heartbeat", "leases": leases})
+                except OSError:
+                    continue
+                for lease_id in reply.get("lost", []):
+                    lost.put(lease_id)
+
+    def drop_lost():
+        while not lost.empty():
+            lease = active.pop(lost.get(), None)
+            if lease is not None:
+                # a running job cannot be cancelled, its result is ignored
+                for future in lease["futures"]:
+                    future.cancel()
+                    del futures[future]
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    runs = 0
+    finished = waiting = False
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            while True:
+                drop_lost()
+                in_flight = sum(len(lease["jobs"]) for lease in active.values())
+                delay = None
+                while not finished and in_flight < 2 * processes:
+                    try:
+                        reply = client.request({"op": "lease", "worker": worker, "jobs": 2 * processes - in_flight})
+                    except ConnectionRefusedError:
+                        # told to wait with nothing to run, and the coordinator is gone: it finished meanwhile
+                        if waiting and not futures:
+                            return runs
+                        raise
+                    waiting = "wait" in reply
+                    if reply.get("done"):
+                        finished = True
+                    elif "wait" in reply:
+                        delay = reply["wait"]
+                        break
+                    else:
+                        name = reply["experiment"]
+                        if name not in experiments:
+                            experiments[name] = read_experiments(model)[name]
+                        experiment = experiments[name]
+                        ttl[0] = reply.get("ttl", ttl[0])
+                        options = run_options(reply.get("options", {}))
+                        jobs = [_job(name, message) for message in reply["jobs"]]
+                        if batch:
+                            submitted = {pool.submit(run_cell, experiment, jobs, **options)}
+                        else:
+                            submitted = {pool.submit(run_job, experiment, job, **options) for job in jobs}
+                        active[reply["lease"]] = {"jobs": jobs, "futures": submitted, "records": []}
+                        for future in submitted:
+                            futures[future] = reply["lease"]
+                        in_flight += len(jobs)
+                if not futures:
+                    if finished:
+                        return runs
+                    time.sleep(delay or 1.0)
+                    continue
+                # wake up for the leases lost meanwhile as well
+                timeout = delay if delay is not None else (ttl[0] or 60.0) / 3
+                completed, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+                drop_lost()
+                for future in completed:
+                    if future not in futures:
+                        continue
+                    lease_id = futures.pop(future)
+                    lease = active[lease_id]
+                    result = future.result()
+                    lease["records"] += result if batch else [result]
+                    lease["futures"].discard(future)
+                    if not lease["futures"]:
+                        del active[lease_id]
+                        client.request({"op": "result", "lease": lease_id, "records": lease["records"]})
+                        runs += len(lease["records"])
+    finally:
+        stop.set()
+        client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    s = commands.add_parser("serve", help="lease the missing jobs of an experiment and collect the records")
+    s.add_argument("experiment", help="name of the experiment in the model file")
+    s.add_argument("--model", default="herds.nlogo", help="NetLogo model file with the experiments")
+    s.add_argument("--ledger", help="ledger of finished runs, default <experiment>.jsonl")
+    s.add_argument("--seed", type=int, default=0, help="seed of the first repetition")
+    s.add_argument("--host", default="127.0.0.1", help="0.0.0.0 to accept workers of other hosts")
+    s.add_argument("--port", type=int, default=5555)
+    s.add_argument("--lease", type=float, default=120.0, help="seconds before a lease without heartbeat is reissued")
+    s.add_argument("--batch-size", type=int, default=10, help="jobs per batch, all of one parameter cell")
+    s.add_argument("--profile", action="store_true", help="time the phases of every run, see herdsim.profiling")
+    s.add_argument("--stall", action="store_true", help="end stalled runs early, see herdsim.monitor")
+    s.add_argument("--stall-validate", action="store_true", help="only tag stalled runs, run them to the end")
+    s.add_argument("--stall-robot-stuck", action="store_true",
+                   help="with --stall, also require the robot to be stuck (RobotStuck, not a default rule)")
+    s.add_argument("--streams", action="store_true",
+                   help="counter-based random streams (herdsim.streams), default ledger <experiment>-streams.jsonl")
+    w = commands.add_parser("work", help="run leased jobs until the coordinator is done")
+    w.add_argument("address", help="host:port of the coordinator")
+    w.add_argument("--model", default="herds.nlogo", help="NetLogo model file with the experiments")
+    w.add_argument("--processes", type=int, help="worker processes, default all cores")
+    w.add_argument("--batch", action="store_true", help="run the jobs of a lease together (herdsim.batch)")
+    args = parser.parse_args(argv)
+
+    if args.command == "work":
+        runs = work(args.address, args.processes, args.batch, model=args.model)
+        print(f"{runs} runs done", file=sys.stderr)
+        return 0
+
+    experiment = read_experiments(args.model)[args.experiment]
+    # runs with streams differ from runs with the same seed without, they do not share a ledger
+    ledger = Ledger(args.ledger or f"{experiment.name}{'-streams' if args.streams else ''}.jsonl")
+    options = {"profile": args.profile, "streams": args.streams}
+    if args.stall or args.stall_validate:
+        options["stall"] = {"validate": args.stall_validate, "robot_stuck": args.stall_robot_stuck}
+    coordinator = Coordinator(experiment, ledger, args.seed, args.lease, args.batch_size, options=options)
+    server = serve(coordinator, args.host, args.port)
+    host, port = server.server_address
+    print(f"{experiment.name}: {coordinator.total} runs to do, serving on {host}:{port}", file=sys.stderr)
+    try:
+        while not coordinator.finished.wait(2.0):
+            print(
+                f"\r{experiment.name}: {coordinator.written}/{coordinator.total} runs, "
+                f"{len(coordinator.leases)} leases out, {coordinator.reissued} reissued",
+                end="", file=sys.stderr, flush=True,
+            )
+        # keep answering until every waiting worker has asked again and heard that the sweep is done
+        time.sleep(coordinator.wait_seconds + 2.0)
+    finally:
+        server.shutdown()
+    print(
+        f"\r{experiment.name}: {coordinator.written}/{coordinator.total} runs, "
+        f"{coordinator.duplicates} duplicates dropped", file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
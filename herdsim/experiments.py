@@ -0,0 +1,126 @@
+import itertools
+import math
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from decimal import Decimal
+
+# The BehaviorSpace experiments saved in herds.nlogo, expanded into jobs.
+# A job is one run: a cell of the value sets (the varied variables) and a
+# repetition, which also fixes its random seed.
+
+
+@dataclass(frozen=True)
+class Job:
+    experiment: str
+    run_number: int
+    values: tuple  # ((variable, value), ...) of the varied variables
+    repetition: int
+    seed: int
+
+    @property
+    def cell(self):
+        return dict(self.values)
+
+
+@dataclass(frozen=True)
+class Experiment:
+    name: str
+    repetitions: int
+    run_metrics_every_step: bool
+    setup: str
+    go: str
+    time_limit: int
+    exit_condition: str
+    run_metrics_condition: str
+    metrics: tuple
+    value_sets: tuple  # ((variable, (value, ...)), ...)
+
+    def cells(self):
+        """Every combination of the value sets, in BehaviorSpace order."""
+        names = [name for name, _ in self.value_sets]
+        return [tuple(zip(names, combo)) for combo in itertools.product(*(v for _, v in self.value_sets))]
+
+    def jobs(self, base_seed=0):
+        """One job per cell and repetition; repetition r of every cell runs with seed base_seed + r."""
+        return [
+            Job(self.name, self.run_number(index, rep), cell, rep, base_seed + rep)
+            for index, cell in enumerate(self.cells())
+            for rep in range(self.repetitions)
+        ]
+
+    def run_number(self, index, repetition):
+        """Run number of a repetition of the index-th cell.
+
+        The `repetitions` of the experiment are numbered cell by cell, as in
+        BehaviorSpace. Further repetitions (herdsim.adaptive) come after all
+        of those, repetition by repetition, so their numbers do not depend on
+        how many there will be.
+        """
+        if repetition < self.repetitions:
+            return index * self.repetitions + repetition + 1
+        cells = math.prod(len(values) for _, values in self.value_sets)
+        return cells * self.repetitions + (repetition - self.repetitions) * cells + index + 1
+
+
+def literal(text):
+    """Python value of a NetLogo literal of a value set: true, 2.5, "3 Long-range neighbor"."""
+    text = text.strip()
+    if text in ("true", "false"):
+        return text == "true"
+    if text.startswith('"') and text.endswith('"'):
+        return text[1:-1]
+    number = Decimal(text)
+    return int(number) if number == number.to_integral_value() else float(number)
+
+
+def stepped_values(first, step, last):
+    # exact decimal steps, so that 1, 1.1, ..., 2 really ends at 2
+    first, step, last = Decimal(first), Decimal(step), Decimal(last)
+    values = []
+    value = first
+    while (step > 0 and value <= last) or (step < 0 and value >= last):
+        values.append(int(value) if value == value.to_integral_value() else float(value))
+        value += step
+        if step == 0:
+            break
+    return tuple(values)
+
+
+def parse_experiments(xml):
+    """Parse an <experiments> block into {name: Experiment}."""
+    root = ET.fromstring(xml)
+    experiments = {}
+    for node in root.iter("experiment"):
+        value_sets = []
+        for child in node:
+            if child.tag == "steppedValueSet":
+                values = stepped_values(child.get("first"), child.get("step"), child.get("last"))
+                value_sets.append((child.get("variable"), values))
+            elif child.tag == "enumeratedValueSet":
+                values = tuple(literal(v.get("value")) for v in child.iter("value"))
+                value_sets.append((child.get("variable"), values))
+        limit = node.find("timeLimit")
+        experiment = Experiment(
+            name=node.get("name"),
+            repetitions=int(node.get("repetitions", "1")),
+            run_metrics_every_step=node.get("runMetricsEveryStep", "true") == "true",
+            setup=node.findtext("setup", "").strip(),
+            go=node.findtext("go", "").strip(),
+            time_limit=int(limit.get("steps")) if limit is not None else 0,
+            exit_condition=node.findtext("exitCondition", "").strip(),
+            run_metrics_condition=node.findtext("runMetricsCondition", "").strip(),
+            metrics=tuple(m.text.strip() for m in node.iter("metric")),
+            value_sets=tuple(value_sets),
+        )
+        experiments[experiment.name] = experiment
+    return experiments
+
+
+def read_experiments(path="herds.nlogo"):
+    """The experiments of a NetLogo model file."""
+    with open(path, encoding="utf-8") as f:
+        sections = f.read().split("@#$#@#$#@")
+    for section in sections:
+        if section.strip().startswith("<experiments>"):
+            return parse_experiments(section.strip())
+    return {}
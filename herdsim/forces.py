@@ -0,0 +1,92 @@
+import numpy as np
+
+# Batched versions of the link and movement procedures of herds.nlogo.
+# Every link of a tick is one row of an edge list: `src` is the herdanimal (end1)
+# and the other end is given by its coordinates, so no link objects are created.
+
+
+def real_heading(heading):
+    # convert heading in Netlogo's geometry (0 north, clockwise) to normal geometry in [-180, 180)
+    return (-heading + 90 + 180) % 360 - 180
+
+
+def calc_dxdy(x1, y1, x2, y2):
+    """Return d-x, d-y and link-length of the links end1 -> end2."""
+    d_x = x2 - x1
+    d_y = y2 - y1
+    return d_x, d_y, np.hypot(d_x, d_y)
+
+
+def factor_calc(link_length, g):
+    # smooth the transition between the 3 zones, repulsion, alignment, and attraction
+    with np.errstate(over="ignore"):
+        return np.where(
+            link_length < g.d0,
+            1 / (1 + np.exp(-g.k1 * (link_length - g.x1))) - 1,
+            1 / (1 + np.exp(-g.k0 * (link_length - g.x0))),
+        )
+
+
+def calc_force(d_x, d_y, link_length, vector_factor, both_herd, heading_sum, p, g):
+    """Return force-x and force-y of every link.
+
+    `both_herd` marks links between two herdanimals, `heading_sum` is the sum of the
+    real-herdanimal-heading of both ends (ignored for links to robots).
+    """
+    angle = np.radians(heading_sum)
+    alignment_x = (np.cos(angle) / 2) * p.alignment_weight * (1 - vector_factor)
+    alignment_y = (np.sin(angle) / 2) * p.alignment_weight * (1 - vector_factor)
+    attraction_x = d_x * p.attraction_weight * vector_factor
+    attraction_y = d_y * p.attraction_weight * vector_factor
+    repulsion_x = d_x * vector_factor * p.repulsion_weight
+    repulsion_y = d_y * vector_factor * p.repulsion_weight
+    attract = both_herd & (link_length >= g.d0)
+    force_x = np.where(attract, alignment_x + attraction_x, np.where(both_herd, repulsion_x, -repulsion_x))
+    force_y = np.where(attract, alignment_y + attraction_y, np.where(both_herd, repulsion_y, -repulsion_y))
+    return force_x, force_y
+
+
+def link_forces(x1, y1, x2, y2, both_herd, heading_sum, p, g):
+    # link-attribute-calculations: calc-dxdy, factor-calc, calc-force
+    d_x, d_y, link_length = calc_dxdy(x1, y1, x2, y2)
+    vector_factor = factor_calc(link_length, g)
+    return calc_force(d_x, d_y, link_length, vector_factor, both_herd, heading_sum, p, g)
+
+
+def edge_forces(src, dst, x, y, heading, bot_x, bot_y, n, p, g):
+    """Return force-x and force-y of the links of an edge list.
+
+    `dst` is the flockmate of every link or negative for a link to the robot
+    of its herdanimal, robot src // n with n herdanimals per replicate.
+    """
+    to_robot = dst < 0
+    safe = np.where(to_robot, 0, dst)
+    x2 = np.where(to_robot, bot_x[src // n], x[safe])
+    y2 = np.where(to_robot, bot_y[src // n], y[safe])
+    real = real_heading(heading)
+    return link_forces(x[src], y[src], x2, y2, ~to_robot, real[src] + real[safe], p, g)
+
+
+def update_heading(src, force_x, force_y, heading, speed, g):
+    """Sum the forces of my-out-links and turn towards them.
+
+    Returns the new heading and speed of every herdanimal, animals without any force
+    keep their heading and speed. The random heading noise is added by the caller.
+    """
+    n = heading.shape[0]
+    t_force_x = np.bincount(src, weights=force_x, minlength=n)
+    t_force_y = np.bincount(src, weights=force_y, minlength=n)
+    t_force = np.sqrt(t_force_x * t_force_x + t_force_y * t_force_y)
+    pushed = (t_force_x != 0) | (t_force_y != 0)
+    # `atan x y` in NetLogo is the heading of the vector, convert it to normal geometry
+    arctan_normal = -(np.degrees(np.arctan2(t_force_x, t_force_y)) % 360) + 90
+    t_force_direction = (arctan_normal + 180) % 360 - 180
+    # rotating duration (limited)
+    turn = real_heading(heading) - t_force_direction
+    dt_w = np.minimum(np.abs(turn) / g.w_s_max, g.dt)
+    turn = np.where(turn < 0, -1.0, 1.0) * g.w_s_max * dt_w
+    new_heading = np.where(pushed, (heading + turn) % 360, heading)
+    # scale speed
+    speed_factor = np.minimum(t_force / 100, 1)
+    new_speed = np.where(pushed, g.base_speed_herd * speed_factor, speed)
+    return new_heading, new_speed
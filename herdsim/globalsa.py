@@ -0,0 +1,300 @@
+"""Global sensitivity analysis of the "SA all" parameters of SA_Scheme.txt, through a surrogate.
+
+The full factorial of the nine parameters has millions of cells. Instead a
+scrambled Sobol design of a few hundred cells is run (each with a few
+repetitions, resumable like herdsim.sweep), a Gaussian process is fitted to
+the success rate and the mean time to finish of the cells, and the first-order
+and total Sobol indices are estimated from the surrogate with the Saltelli
+scheme. Needs scipy.
+
+The design respects the rules of SA_Scheme.txt (min-distance-to-herd <
+robot-repulsion, happyzone-max + happyzone-min < vision): a constrained
+parameter is picked among its allowed values given the others, so the unit
+cube coordinates stay independent and the indices are those of the
+coordinates.
+
+    python -m herdsim.globalsa --points 512 --repetitions 4 --output SA-all-sobol.csv
+"""
+import argparse
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+from scipy.optimize import minimize
+from scipy.stats import qmc
+
+from .aggregate import MAX_TICKS, Aggregator
+from .experiments import Experiment, stepped_values
+from .params import Params
+
+OUTPUTS = ("success_rate", "ticks_mean")
+
+
+@dataclass(frozen=True)
+class Factor:
+    name: str  # NetLogo variable
+    values: tuple  # the levels, numbers ascending, or booleans / choices
+
+
+# "SA all" of SA_Scheme.txt, NetLogo [first step last] ranges
+SA_ALL = (
+    Factor("global-vision", (True, False)),
+    Factor("furthest-allowed", stepped_values(10, 5, 100)),
+    Factor("min-distance-to-herd", stepped_values(3, 1, 9)),
+    Factor("model-neighbor", ("1 Metric neighbor", "2 Topological neighbor", "3 Long-range neighbor")),
+    Factor("population", stepped_values(10, 10, 100)),
+    Factor("bot-speed-ratio", stepped_values(1, 1, 10)),
+    Factor("happyzone-min", stepped_values(1, 1, 5)),
+    Factor("happyzone-max", stepped_values(1, 2, 15)),
+    Factor("vision", stepped_values(20, 2, 40)),
+)
+
+
+def _numeric(factor):
+    return not isinstance(factor.values[0], (bool, str))
+
+
+def _value_of(name, factors, idx, params):
+    # values of a variable per row, from the design or else from the parameters
+    for col, factor in enumerate(factors):
+        if factor.name == name:
+            return np.asarray(factor.values, dtype=float)[idx[:, col]]
+    return np.full(len(idx), float(params.to_netlogo()[name]))
+
+
+def _within(u, values, low=-np.inf, high=np.inf):
+    # index of the u-quantile of the values strictly between low and high
+    first = np.searchsorted(values, low, side="right")
+    count = np.searchsorted(values, high, side="left") - first
+    if np.any(count <= 0):
+        raise ValueError(f"no level of {values} lies between the bounds of the rules")
+    return first + np.minimum((u * count).astype(int), count - 1)
+
+
+def levels(u, factors=SA_ALL, params=None):
+    """Level index of every factor for points `u` of the unit cube, (n, len(factors))."""
+    params = params or Params()
+    u = np.atleast_2d(u)
+    idx = np.column_stack([
+        np.minimum((u[:, col] * len(f.values)).astype(int), len(f.values) - 1) for col, f in enumerate(factors)
+    ])
+    names = [f.name for f in factors]
+    # the rules of SA_Scheme.txt, applied in this order
+    if "min-distance-to-herd" in names:
+        col = names.index("min-distance-to-herd")
+        high = _value_of("robot-repulsion", factors, idx, params)
+        idx[:, col] = _within(u[:, col], np.asarray(factors[col].values, dtype=float), high=high)
+    if "vision" in names:
+        col = names.index("vision")
+        low = _value_of("happyzone-min", factors, idx, params) + _value_of("happyzone-max", factors, idx, params)
+        idx[:, col] = _within(u[:, col], np.asarray(factors[col].values, dtype=float), low=low)
+    return idx
+
+
+def cells_of(idx, factors=SA_ALL):
+    return [tuple((f.name, f.values[i]) for f, i in zip(factors, row)) for row in idx]
+
+
+def levels_of(cells, factors=SA_ALL):
+    """Level indices of cells given as dicts of NetLogo variables."""
+    return np.array([[f.values.index(cell[f.name]) for f in factors] for cell in cells])
+
+
+def features(idx, factors=SA_ALL):
+    """Surrogate inputs: numbers scaled to [0, 1], booleans 0/1, choices one-hot."""
+    columns = []
+    for col, f in enumerate(factors):
+        if _numeric(f):
+            values = np.asarray(f.values, dtype=float)
+            columns.append((values[idx[:, col]] - values[0]) / (values[-1] - values[0]))
+        elif isinstance(f.values[0], bool):
+            columns.append(np.asarray(f.values, dtype=float)[idx[:, col]])
+        else:
+            columns.extend((idx[:, col] == k).astype(float) for k in range(len(f.values)))
+    return np.column_stack(columns)
+
+
+@dataclass(frozen=True)
+class Design(Experiment):
+    """An experiment over given cells instead of the product of value sets."""
+
+    points: tuple = ()
+
+    def cells(self):
+        return list(self.points)
+
+
+def design(points, repetitions=4, factors=SA_ALL, seed=0, params=None):
+    """A scrambled Sobol design of (up to) `points` distinct cells, as an experiment of herdsim.sweep."""
+    u = qmc.Sobol(len(factors), scramble=True, seed=seed).random(points)
+    cells = list(dict.fromkeys(cells_of(levels(u, factors, params), factors)))
+    condition = f"not any? herdanimals or ticks = {MAX_TICKS}"
+    return Design(
+        name="SA all",
+        repetitions=repetitions,
+        run_metrics_every_step=False,
+        setup="setup",
+        go="go",
+        time_limit=MAX_TICKS,
+        exit_condition=condition,
+        run_metrics_condition=condition,
+        metrics=("ticks", "[distance-traveled] of robots"),
+        value_sets=tuple((f.name, f.values) for f in factors),
+        points=tuple(cells),
+    )
+
+
+class GaussianProcess:
+    """Gaussian process regression with a squared exponential kernel, one length scale per input.
+
+    The length scales, signal and noise variance maximise the marginal
+    likelihood of at most `max_fit` of the points; the prediction uses all.
+    """
+
+    def __init__(self, max_fit=800, seed=0):
+        self.max_fit = max_fit
+        self.seed = seed
+
+    @staticmethod
+    def _kernel(a, b, scales, signal):
+        d2 = (((a[:, None, :] - b[None, :, :]) / scales) ** 2).sum(axis=-1)
+        return signal * np.exp(-0.5 * d2)
+
+    def _nll(self, theta, x, y):
+        scales, signal, noise = np.exp(theta[:-2]), np.exp(theta[-2]), np.exp(theta[-1])
+        sq = ((x[:, None, :] - x[None, :, :]) / scales) ** 2
+        k_se = signal * np.exp(-0.5 * sq.sum(axis=-1))
+        k = k_se + noise * np.eye(len(x))
+        try:
+            factor = cho_factor(k, lower=True)
+        except np.linalg.LinAlgError:
+            return np.inf, np.zeros_like(theta)
+        alpha = cho_solve(factor, y)
+        nll = 0.5 * y @ alpha + np.log(np.diag(factor[0])).sum() + 0.5 * len(x) * np.log(2 * np.pi)
+        inner = np.outer(alpha, alpha) - cho_solve(factor, np.eye(len(x)))
+        grad = np.empty_like(theta)
+        grad[:-2] = -0.5 * np.einsum("ij,ijd->d", inner * k_se, sq)
+        grad[-2] = -0.5 * (inner * k_se).sum()
+        grad[-1] = -0.5 * noise * np.trace(inner)
+        return nll, grad
+
+    def fit(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean, self.y_std = y.mean(), y.std() or 1.0
+        z = (y - self.y_mean) / self.y_std
+        rows = np.random.default_rng(self.seed).permutation(len(x))[: self.max_fit]
+        theta = np.r_[np.full(x.shape[1], np.log(0.5)), 0.0, np.log(0.1)]
+        bounds = [(np.log(1e-2), np.log(1e2))] * x.shape[1] + [(np.log(1e-2), np.log(1e2)), (np.log(1e-6), np.log(10))]
+        result = minimize(self._nll, theta, args=(x[rows], z[rows]), jac=True, method="L-BFGS-B", bounds=bounds)
+        self.scales, self.signal, self.noise = np.exp(result.x[:-2]), np.exp(result.x[-2]), np.exp(result.x[-1])
+        self.x = x
+        k = self._kernel(x, x, self.scales, self.signal) + self.noise * np.eye(len(x))
+        self.alpha = cho_solve(cho_factor(k, lower=True), z)
+        return self
+
+    def predict(self, x, chunk=256):
+        x = np.asarray(x, dtype=float)
+        out = np.empty(len(x))
+        for start in range(0, len(x), chunk):
+            k = self._kernel(x[start:start + chunk], self.x, self.scales, self.signal)
+            out[start:start + chunk] = k @ self.alpha
+        return out * self.y_std + self.y_mean
+
+
+def holdout_r2(x, y, fraction=0.2, seed=0, **options):
+    """Coefficient of determination of a surrogate fitted without a random `fraction` of the points."""
+    rows = np.random.default_rng(seed).permutation(len(x))
+    test, train = rows[: int(len(x) * fraction)], rows[int(len(x) * fraction):]
+    predicted = GaussianProcess(**options).fit(x[train], y[train]).predict(x[test])
+    return 1 - ((y[test] - predicted) ** 2).sum() / ((y[test] - y[test].mean()) ** 2).sum()
+
+
+def sobol_indices(f, factors=SA_ALL, samples=4096, seed=1, resamples=200, params=None):
+    """First-order (Saltelli 2010) and total (Jansen) Sobol indices of `f`, a function of level indices.
+
+    Costs samples * (len(factors) + 2) evaluations of f. The confidence
+    columns are half widths of bootstrap 95% intervals.
+    """
+    d = len(factors)
+    ab = qmc.Sobol(2 * d, scramble=True, seed=seed).random(samples)
+    a, b = ab[:, :d], ab[:, d:]
+    f_a, f_b = f(levels(a, factors, params)), f(levels(b, factors, params))
+    f_ab = np.empty((d, samples))
+    for i in range(d):
+        mixed = a.copy()
+        mixed[:, i] = b[:, i]
+        f_ab[i] = f(levels(mixed, factors, params))
+
+    def estimate(rows):
+        variance = np.var(np.r_[f_a[rows], f_b[rows]])
+        first = (f_b[rows] * (f_ab[:, rows] - f_a[rows])).mean(axis=1) / variance
+        total = 0.5 * ((f_a[rows] - f_ab[:, rows]) ** 2).mean(axis=1) / variance
+        return first, total
+
+    first, total = estimate(np.arange(samples))
+    rng = np.random.default_rng(seed)
+    boot = [estimate(rng.integers(0, samples, samples)) for _ in range(resamples)]
+    return pd.DataFrame({
+        "factor": [factor.name for factor in factors],
+        "S1": first,
+        "S1_conf": 1.96 * np.std([s for s, _ in boot], axis=0),
+        "ST": total,
+        "ST_conf": 1.96 * np.std([t for _, t in boot], axis=0),
+    })
+
+
+def analyse(records, factors=SA_ALL, samples=4096, max_fit=800, params=None):
+    """Fit a surrogate per output to the cells of the records, return (indices, holdout R^2 per output)."""
+    aggregator = Aggregator()
+    for record in records:
+        aggregator.add(record)
+    cells = pd.DataFrame(aggregator.rows())
+    x = features(levels_of(cells.to_dict("records"), factors), factors)
+    tables, scores = [], {}
+    for output in OUTPUTS:
+        y = cells[output].to_numpy(dtype=float)
+        scores[output] = holdout_r2(x, y, max_fit=max_fit)
+        surrogate = GaussianProcess(max_fit=max_fit).fit(x, y)
+        table = sobol_indices(lambda idx: surrogate.predict(features(idx, factors)), factors, samples, params=params)
+        tables.append(table.assign(output=output))
+    return pd.concat(tables, ignore_index=True), scores
+
+
+def main(argv=None):
+    from .sweep import Ledger, run_sweep
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=512, help="cells of the Sobol design (a power of 2)")
+    parser.add_argument("--repetitions", type=int, default=4, help="runs per cell")
+    parser.add_argument("--ledger", default="SA-all.jsonl", help="ledger of finished runs")
+    parser.add_argument("--output", help="write the indices as csv")
+    parser.add_argument("--processes", type=int, help="worker processes, default all cores")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first repetition and of the design")
+    parser.add_argument("--batch", action="store_true", help="run the repetitions of a cell together (herdsim.batch)")
+    parser.add_argument("--samples", type=int, default=4096, help="Saltelli samples on the surrogate")
+    parser.add_argument("--max-fit", type=int, default=800, help="points used to fit the surrogate hyperparameters")
+    args = parser.parse_args(argv)
+    experiment = design(args.points, args.repetitions, seed=args.seed)
+
+    def progress(n, total):
+        print(f"\r{experiment.name}: {n}/{total} runs", end="", file=sys.stderr, flush=True)
+
+    records = run_sweep(experiment, Ledger(args.ledger), args.processes, args.seed, progress=progress,
+                        batch=args.batch)
+    print(file=sys.stderr)
+    indices, scores = analyse(records, samples=args.samples, max_fit=args.max_fit)
+    print(f"{len(experiment.cells())} cells, {len(records)} runs")
+    for output, score in scores.items():
+        print(f"surrogate of {output}: holdout R^2 {score:.3f}")
+    with pd.option_context("display.float_format", "{:.3f}".format, "display.width", 120):
+        print(indices.pivot(index="factor", columns="output", values=["S1", "ST"]).loc[[f.name for f in SA_ALL]])
+    if args.output:
+        indices.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import math
+
+import numpy as np
+
+from .forces import edge_forces, update_heading
+
+# Fused kernels of link-attribute-calculations and update-heading. They go from
+# the edge list of a tick straight to the new heading and speed of every
+# herdanimal, without per-link force arrays: the links of an animal are
+# visited in order, their forces summed on the fly, and the turn is applied.
+#
+# "numpy" is the batched NumPy path of herdsim.forces, "numba" the compiled
+# kernel (numba is optional). Both take the same arguments; the robot of the
+# link of animal i is robot i // n, n animals per replicate.
+
+try:
+    import numba
+except ImportError:  # pragma: no cover - numba is optional
+    numba = None
+
+
+def fused_numpy(src, dst, x, y, heading, speed, bot_x, bot_y, n, p, g):
+    force_x, force_y = edge_forces(src, dst, x, y, heading, bot_x, bot_y, n, p, g)
+    return update_heading(src, force_x, force_y, heading, speed, g)
+
+
+if numba is not None:
+
+    @numba.njit(cache=True)
+    def _link_ranges(src, size):
+        # first link and number of links of every animal, and whether the links
+        # of every animal are contiguous (as Model and BatchModel build them)
+        start = np.full(size, -1, dtype=np.int64)
+        count = np.zeros(size, dtype=np.int64)
+        contiguous = True
+        for j in range(src.size):
+            s = src[j]
+            if start[s] < 0:
+                start[s] = j
+            elif start[s] + count[s] != j:
+                contiguous = False
+            count[s] += 1
+        return start, count, contiguous
+
+    @numba.njit(parallel=True, cache=True)
+    def _fused(start, count, dst, x, y, heading, speed, bot_x, bot_y, n, weights, zones, turning):
+        alignment_weight, attraction_weight, repulsion_weight = weights
+        d0, k0, k1, x0, x1 = zones
+        w_s_max, dt, base_speed_herd = turning
+        new_heading = heading.copy()
+        new_speed = speed.copy()
+        for i in numba.prange(x.size):
+            if count[i] == 0:
+                continue
+            real_i = (-heading[i] + 90 + 180) % 360 - 180
+            t_force_x = 0.0
+            t_force_y = 0.0
+            for j in range(start[i], start[i] + count[i]):
+                other = dst[j]
+                both_herd = other >= 0
+                if both_herd:
+                    x2, y2 = x[other], y[other]
+                else:
+                    x2, y2 = bot_x[i // n], bot_y[i // n]
+                # calc-dxdy
+                d_x = x2 - x[i]
+                d_y = y2 - y[i]
+                link_length = math.hypot(d_x, d_y)
+                # factor-calc
+                if link_length < d0:
+                    factor = 1 / (1 + math.exp(-k1 * (link_length - x1))) - 1
+                else:
+                    factor = 1 / (1 + math.exp(-k0 * (link_length - x0)))
+                # calc-force
+                if both_herd and link_length >= d0:
+                    real_j = (-heading[other] + 90 + 180) % 360 - 180
+                    angle = (real_i + real_j) * (math.pi / 180)
+                    t_force_x += (math.cos(angle) / 2) * alignment_weight * (1 - factor) + d_x * attraction_weight * factor
+                    t_force_y += (math.sin(angle) / 2) * alignment_weight * (1 - factor) + d_y * attraction_weight * factor
+                elif both_herd:
+                    t_force_x += d_x * factor * repulsion_weight
+                    t_force_y += d_y * factor * repulsion_weight
+                else:
+                    t_force_x += -(d_x * factor * repulsion_weight)
+                    t_force_y += -(d_y * factor * repulsion_weight)
+            if t_force_x == 0 and t_force_y == 0:
+                continue
+            # update-heading
+            t_force = math.sqrt(t_force_x * t_force_x + t_force_y * t_force_y)
+            arctan_normal = -((math.atan2(t_force_x, t_force_y) * (180 / math.pi)) % 360) + 90
+            t_force_direction = (arctan_normal + 180) % 360 - 180
+            turn = real_i - t_force_direction
+            dt_w = min(abs(turn) / w_s_max, dt)
+            turn = (-1.0 if turn < 0 else 1.0) * w_s_max * dt_w
+            new_heading[i] = (heading[i] + turn) % 360
+            new_speed[i] = base_speed_herd * min(t_force / 100, 1.0)
+        return new_heading, new_speed
+
+    def fused_numba(src, dst, x, y, heading, speed, bot_x, bot_y, n, p, g):
+        start, count, contiguous = _link_ranges(src, x.size)
+        if not contiguous:
+            # group the links by animal, keeping their order
+            order = np.argsort(src, kind="stable")
+            src, dst = src[order], dst[order]
+            start, count, _ = _link_ranges(src, x.size)
+        return _fused(
+            start, count, dst, x, y, heading, speed,
+            np.asarray(bot_x, dtype=float), np.asarray(bot_y, dtype=float), n,
+            (float(p.alignment_weight), float(p.attraction_weight), float(p.repulsion_weight)),
+            (float(g.d0), float(g.k0), float(g.k1), float(g.x0), float(g.x1)),
+            (float(g.w_s_max), float(g.dt), float(g.base_speed_herd)),
+        )
+
+else:
+    fused_numba = None
+
+
+KERNELS = {"numpy": fused_numpy, "numba": fused_numba}
+
+
+def kernel(kind):
+    """The fused kernel `kind` ("numpy" or "numba")."""
+    if kind not in KERNELS:
+        raise ValueError(f"unknown kernel {kind!r}, expected one of {sorted(KERNELS)}")
+    if KERNELS[kind] is None:
+        raise ImportError(f"the {kind} kernel needs {kind}, use kernels='numpy' instead")
+    return KERNELS[kind]
@@ -0,0 +1,357 @@
+import numpy as np
+
+from .forces import edge_forces, update_heading
+from .kernels import kernel
+from .neighbors import VerletList, build_index
+from .params import Globals, Params
+from .streams import Streams
+from .visibility import list_visibles
+
+# Headless port of herds.nlogo. All herdanimal state lives in flat NumPy arrays
+# indexed by `who` of the animal, dead animals are masked out with `alive`.
+# Links are not agents here, every tick builds an edge list (link_src, link_dst)
+# where link_dst is the index of the flockmate, or ROBOT for a link to the robot.
+#
+# The math of the phases is shared with herdsim.batch: the functions below take
+# animal arrays of shape (..., N) and robot arrays of the leading shape, one
+# robot for Model and one per replicate for BatchModel.
+
+ROBOT = -1
+
+
+def towardsxy(x, y, to_x, to_y):
+    # heading in Netlogo's geometry from (x, y) to (to_x, to_y)
+    return np.degrees(np.arctan2(to_x - x, to_y - y)) % 360
+
+
+def netlogo_random(rng, number, size):
+    # `random number`: integers >= 0 and strictly less than number
+    high = int(np.ceil(number))
+    if high <= 0:
+        return np.zeros(size)
+    return rng.integers(0, high, size).astype(float)
+
+
+def _table_links(rows, table):
+    # links from every row to the mates of its row in a table padded with -1
+    src = np.repeat(rows, table.shape[1])
+    dst = table.reshape(-1)
+    keep = dst >= 0
+    return src[keep], dst[keep]
+
+
+def _pick(values, index):
+    # values[..., index] with one index per robot
+    return np.take_along_axis(values, np.asarray(index)[..., None], -1)[..., 0]
+
+
+def place_herd(rng, p, n):
+    """The xcor, ycor and heading of n new herdanimals, drawn in this order."""
+    xcor = rng.integers(0, p.max_pxcor, n).astype(float)
+    ycor = rng.integers(0, p.max_pycor, n).astype(float)
+    return xcor, ycor, rng.random(n) * 360
+
+
+def robot_course(p, g, xcor, ycor, seen, dLCM, dTarget, furthest, lcm_x, lcm_y, bot_x, bot_y):
+    """The botspeed of the robot and the point it heads for (botmove).
+
+    `seen` marks the visible herdanimals; robots that see none get values
+    the caller does not use.
+    """
+    bot_x, bot_y = np.asarray(bot_x), np.asarray(bot_y)
+    closest = np.where(seen, np.hypot(xcor - bot_x[..., None], ycor - bot_y[..., None]), np.inf).min(axis=-1)
+    botspeed = np.where(closest < p.min_distance_to_herd, 0.01, 1.0)
+    fv = np.maximum(furthest, 0)
+    d_fv = _pick(dLCM, fv)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # collect the furthest animal back to the local centre of mass
+        x_comp = _pick(xcor, fv) - lcm_x
+        y_comp = _pick(ycor, fv) - lcm_y
+        ratio = (d_fv + p.min_distance_to_herd) / d_fv
+        collect_x, collect_y = lcm_x + x_comp * ratio, lcm_y + y_comp * ratio
+        # drive the herd from behind its animal furthest from the target
+        to_target = np.where(seen, np.hypot(xcor - g.target_x, ycor - g.target_y), -np.inf)
+        ff = np.argmax(to_target, axis=-1)
+        x_comp = _pick(xcor, ff) - g.target_x
+        y_comp = _pick(ycor, ff) - g.target_y
+        dist = _pick(dTarget, ff)
+        ratio = np.where(dist != 0, (dist + p.min_distance_to_herd) / dist, 1.0)
+        drive_x, drive_y = g.target_x + x_comp * ratio, g.target_y + y_comp * ratio
+    collect = d_fv > p.furthest_allowed
+    return botspeed, np.where(collect, collect_x, drive_x), np.where(collect, collect_y, drive_y)
+
+
+def forward(p, x, y, heading, step):
+    """Where `fd step` takes the robot; the world does not wrap, a turtle that would leave it stays put."""
+    h = np.radians(heading)
+    new_x = x + step * np.sin(h)
+    new_y = y + step * np.cos(h)
+    inside = (p.min_pxcor - 0.5 <= new_x) & (new_x < p.max_pxcor + 0.5)
+    inside &= (p.min_pycor - 0.5 <= new_y) & (new_y < p.max_pycor + 0.5)
+    return np.where(inside, new_x, x), np.where(inside, new_y, y)
+
+
+def robotmates(p, xcor, ycor, alive, bot_x, bot_y):
+    """The live herdanimals within robot-repulsion of their robot."""
+    bot_x, bot_y = np.asarray(bot_x), np.asarray(bot_y)
+    return alive & (np.hypot(xcor - bot_x[..., None], ycor - bot_y[..., None]) <= p.robot_repulsion)
+
+
+def flock_index(neighbors, verlet, p, g, x, y, members, groups=None):
+    """The neighbor index of the live herdanimals `members` for the model-neighbor."""
+    nearest = p.model_neighbor[0] != "1"
+    if verlet is not None:
+        return verlet.index(x[members], y[members], members, p.vision, groups=groups, k=g.knn if nearest else None)
+    return build_index(neighbors, x[members], y[members], members, p.vision, nearest=nearest, groups=groups)
+
+
+def flockmate_links(p, g, index, x, y, rows, long_range):
+    """The links from `rows` to their flockmates, in canonical order.
+
+    `long_range(table)` draws the random long-range flockmate of every row
+    besides its knn flockmates in `table` (model-neighbor 3).
+    """
+    mode = p.model_neighbor[0]
+    if mode == "1":
+        qi, dst, _ = index.within(x[rows], y[rows], rows, p.vision)
+        src = rows[qi]
+    elif mode in "23":
+        table = index.nearest(x[rows], y[rows], rows, g.knn, p.vision)
+        if mode == "3":
+            table = np.column_stack([table, long_range(table)])
+        src, dst = _table_links(rows, table)
+    else:
+        src = dst = np.zeros(0, dtype=np.intp)
+    # canonical order of the links, the sums of the forces then do not depend on the index
+    order = np.argsort(src * x.size + dst, kind="stable")
+    return src[order], dst[order]
+
+
+def relink(flock_src, flock_dst, rows, src, dst, bots):
+    """The flockmates and the links of a tick: flock_src, flock_dst, link_src, link_dst.
+
+    Animals linked to the robot (`bots`) keep the flockmates of their last update.
+    """
+    keep = ~np.isin(flock_src, rows)
+    flock_src = np.concatenate([flock_src[keep], src])
+    flock_dst = np.concatenate([flock_dst[keep], dst])
+    link_src = np.concatenate([bots, src])
+    link_dst = np.concatenate([np.full(bots.size, ROBOT, dtype=np.intp), dst])
+    return flock_src, flock_dst, link_src, link_dst
+
+
+def heading_noise(rng, p, size):
+    # to add randomness of movement
+    return -p.randomness / 2 + netlogo_random(rng, p.randomness, size)
+
+
+def herd_steps(p, g, xcor, ycor, heading, speed, alive, flock_src, flock_dst):
+    """The new xcor and ycor of the herdanimals (movement after the turn).
+
+    Animals without a live flockmate walk at base-speed-herd; the fences keep
+    every animal fence-range inside the world.
+    """
+    flat = alive.reshape(-1)
+    has_flockmates = np.bincount(flock_src, weights=flat[flock_dst], minlength=flat.size).reshape(alive.shape) > 0
+    step = np.where(has_flockmates, speed, g.base_speed_herd)
+    h = np.radians(heading)
+    x = np.clip(xcor + step * np.sin(h), p.min_pxcor + g.fence_range, p.max_pxcor - g.fence_range)
+    y = np.clip(ycor + step * np.cos(h), p.min_pycor + g.fence_range, p.max_pycor - g.fence_range)
+    return np.where(alive, x, xcor), np.where(alive, y, ycor)
+
+
+class Model:
+    def __init__(
+        self, params=None, seed=None, neighbors="grid", visibility="sweep", kernels="numpy", profiler=None,
+        streams=False,
+    ):
+        """Create the model and run `setup`.
+
+        `seed` overrides the seed-option chooser, like BehaviorSpace runs with a
+        `random-seed` per repetition. `neighbors` is the neighbor index used for
+        the flockmates (see herdsim.neighbors, "verlet" keeps a Verlet list of
+        candidates over ticks), `visibility` the method of the
+        local vision of the robot (see herdsim.visibility) and `kernels` "numba"
+        fuses the link forces with update-heading (see herdsim.kernels). A
+        `profiler` (herdsim.profiling) times the phases of `go`. With
+        `streams` every draw comes from a counter-based stream keyed by seed,
+        purpose, tick and animal (see herdsim.streams) instead of one
+        sequential generator.
+        """
+        self.params = params if params is not None else Params()
+        self.seed = seed
+        self.neighbors = neighbors
+        self.visibility = visibility
+        self.kernels = kernels
+        self.fused = kernel(kernels) if kernels != "numpy" else None
+        self.profiler = profiler
+        self.streams = streams
+        self.setup()
+
+    def setup(self):
+        p = self.params
+        seed = self.seed
+        if seed is None and p.seed_option[0] == "2":
+            seed = 73
+        if self.streams:
+            self.rng = Streams(seed if seed is not None else np.random.SeedSequence().entropy, p.population)
+        else:
+            self.rng = np.random.default_rng(seed)
+        self.g = g = Globals.from_params(p)
+        self.verlet = VerletList() if self.neighbors == "verlet" else None
+        self.ticks = 0
+        n = p.population
+        rng = self.random("setup")
+        # herdanimals
+        self.xcor, self.ycor, self.heading = place_herd(rng, p, n)
+        self.speed = np.zeros(n)
+        self.dLCM = np.zeros(n)
+        self.dTarget = np.zeros(n)
+        self.alive = np.ones(n, dtype=bool)
+        self.flock_src = np.zeros(0, dtype=np.intp)
+        self.flock_dst = np.zeros(0, dtype=np.intp)
+        self.link_src = np.zeros(0, dtype=np.intp)
+        self.link_dst = np.zeros(0, dtype=np.intp)
+        # robot
+        self.bot_x = -p.max_pxcor / 2
+        self.bot_y = p.max_pycor / 2
+        self.bot_heading = 0.0
+        self.botspeed = 0.0
+        self.distance_traveled = 0.0
+        self.LCMx = 0.0
+        self.LCMy = 0.0
+        self.visibles = np.zeros(n, dtype=bool)
+        self.furthest_visible = ROBOT
+        # farmer
+        self.farmer_x = g.target_x
+        self.farmer_y = g.target_y
+
+    def random(self, purpose):
+        """The generator for the draws of `purpose` this tick, see herdsim.streams."""
+        return self.rng.draws(purpose, self.ticks) if self.streams else self.rng
+
+    @property
+    def count_herdanimals(self):
+        return int(self.alive.sum())
+
+    def done(self, max_ticks=10000):
+        # exitCondition of the experiments: not any? herdanimals or ticks = 10000
+        return not self.alive.any() or self.ticks >= max_ticks
+
+    def run(self, max_ticks=10000):
+        """Run `go` until the exit condition and report the BehaviorSpace metrics."""
+        while not self.done(max_ticks):
+            self.go()
+        return {"ticks": self.ticks, "distance-traveled": self.distance_traveled}
+
+    def go(self):
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.go(self)
+        else:
+            for _, step in self.phases():
+                step()
+        self.ticks += 1
+
+    def phases(self):
+        """The procedures of one tick of `go` in order, (name, method)."""
+        phases = [
+            ("list-visibles", self.list_visibles),
+            ("linking", self.linking),
+            ("dTarget", self.distance_to_target),
+            # update-real-heading is part of the link forces
+            ("link-attribute-calculations", self.link_attribute_calculations),
+            ("movement", self.movement),
+        ]
+        if self.params.auto_shepherd:
+            phases += [("botmove", self.botmove), ("die-on-target", self.die_on_target)]
+        return phases
+
+    def distance_to_target(self):
+        self.dTarget = np.hypot(self.xcor - self.g.target_x, self.ycor - self.g.target_y)
+
+    # robot procedures
+
+    def list_visibles(self):
+        # get visible herdanimals in the obstructed vision of the robot
+        visibles, lcm, dLCM, furthest = list_visibles(
+            self.bot_x, self.bot_y, self.xcor, self.ycor, self.alive,
+            self.g.entity_width, self.params.global_vision, self.visibility,
+        )
+        self.visibles = visibles
+        self.furthest_visible = furthest
+        if lcm is not None:
+            self.LCMx, self.LCMy = lcm
+            self.dLCM[visibles] = dLCM
+
+    def botmove(self):
+        p, g = self.params, self.g
+        seen = self.visibles & self.alive
+        if not seen.any():
+            return
+        botspeed, to_x, to_y = robot_course(
+            p, g, self.xcor, self.ycor, seen, self.dLCM, self.dTarget, self.furthest_visible,
+            self.LCMx, self.LCMy, self.bot_x, self.bot_y,
+        )
+        self.botspeed = float(botspeed)
+        to_x, to_y = float(to_x), float(to_y)
+        if (to_x, to_y) != (self.bot_x, self.bot_y):
+            self.bot_heading = float(towardsxy(self.bot_x, self.bot_y, to_x, to_y))
+        step = g.max_speed_bot * self.botspeed
+        self.fd_robot(step)
+        self.distance_traveled += step
+
+    def fd_robot(self, step):
+        x, y = forward(self.params, self.bot_x, self.bot_y, self.bot_heading, step)
+        self.bot_x, self.bot_y = float(x), float(y)
+
+    def die_on_target(self):
+        near = np.hypot(self.xcor - self.farmer_x, self.ycor - self.farmer_y) <= self.params.farmer_vision
+        self.alive &= ~near
+
+    # herdanimal procedures
+
+    def linking(self):
+        p = self.params
+        # get robotmates, they override the interaction with flockmates
+        mates = robotmates(p, self.xcor, self.ycor, self.alive, self.bot_x, self.bot_y)
+        index = None
+        if p.model_neighbor[0] in "123":
+            self.index = index = flock_index(
+                self.neighbors, self.verlet, p, self.g, self.xcor, self.ycor, np.flatnonzero(self.alive)
+            )
+            rows = np.flatnonzero(self.alive & ~mates)
+        else:
+            rows = np.zeros(0, dtype=np.intp)
+        src, dst = flockmate_links(
+            p, self.g, index, self.xcor, self.ycor, rows,
+            lambda table: index.random_other(rows, table, self.random("one-of")),
+        )
+        self.flock_src, self.flock_dst, self.link_src, self.link_dst = relink(
+            self.flock_src, self.flock_dst, rows, src, dst, np.flatnonzero(mates)
+        )
+
+    def link_attribute_calculations(self):
+        if self.fused is not None:
+            # computed together with update-heading in movement
+            return
+        self.force_x, self.force_y = edge_forces(
+            self.link_src, self.link_dst, self.xcor, self.ycor, self.heading,
+            np.array([self.bot_x]), np.array([self.bot_y]), self.alive.size, self.params, self.g,
+        )
+
+    def movement(self):
+        p, g = self.params, self.g
+        alive = self.alive
+        if self.fused is not None:
+            heading, speed = self.fused(
+                self.link_src, self.link_dst, self.xcor, self.ycor, self.heading, self.speed,
+                np.array([self.bot_x]), np.array([self.bot_y]), alive.size, p, g,
+            )
+        else:
+            heading, speed = update_heading(self.link_src, self.force_x, self.force_y, self.heading, self.speed, g)
+        noise = heading_noise(self.random("randomness"), p, heading.size)
+        self.heading = np.where(alive, (heading + noise) % 360, self.heading)
+        self.speed = np.where(alive, speed, self.speed)
+        self.xcor, self.ycor = herd_steps(
+            p, g, self.xcor, self.ycor, self.heading, self.speed, alive, self.flock_src, self.flock_dst
+        )
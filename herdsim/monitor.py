@@ -0,0 +1,196 @@
+"""Stall detection: end runs that will not bring the herd home, long before the time limit.
+
+A failed run goes on until `ticks = 10000`, which is most of the compute of
+the cells where the robot rarely succeeds. A Monitor samples a few progress
+signals of a run every `every` ticks and declares it stalled when its rules
+agree:
+
+    NoDelivery    no herdanimal reached the farmer for `window` ticks
+    NoApproach    the local centre of mass of the robot did not get `progress`
+                  patches closer to the target in `window` ticks
+    RobotStuck    the robot stayed within `displacement` patches for `window`
+                  ticks (circling, or overlapping the herd)
+
+The defaults are cautious: at low bot speeds a robot can push the herd
+nowhere for 4000 ticks and still bring it home before 10000, and the herd
+is delivered in one go at the end, so no verdict comes before tick 5000 and
+both NoDelivery and NoApproach must agree over 3000 ticks. RobotStuck is
+opt-in, not among the default rules: a slow robot that waits behind its herd
+stands still as well. `--stall-robot-stuck` adds it, and then it must agree
+too.
+
+A rule is any object with a `stalled(history)` method, so new signals are
+one class. herdsim.sweep ends stalled runs with `--stall` and tags them in
+the ledger; they count as failures that ran to the time limit. With
+`--stall-validate` runs go on to the end and are only tagged, and this
+module reports how often the verdict was wrong:
+
+    python -m herdsim.sweep bot-speed --stall-validate --ledger bot-speed-validate.jsonl
+    python -m herdsim.monitor bot-speed-validate.jsonl
+"""
+import argparse
+import math
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from .aggregate import MAX_TICKS, outcome
+
+
+class History:
+    """Progress signals of a run, one sample every `every` ticks."""
+
+    def __init__(self, every):
+        self.every = every
+        self.ticks = []
+        self.herd = []
+        self.lcm_distance = []
+        self.bot_x = []
+        self.bot_y = []
+
+    def add(self, model):
+        self.ticks.append(int(model.ticks))
+        self.herd.append(int(model.alive.sum()))
+        self.lcm_distance.append(float(np.hypot(model.LCMx - model.g.target_x, model.LCMy - model.g.target_y)))
+        self.bot_x.append(float(model.bot_x))
+        self.bot_y.append(float(model.bot_y))
+
+    def since(self, window):
+        """Index of the first sample of the last `window` ticks, None if the run is younger."""
+        start = len(self.ticks) - 1 - window // self.every
+        return start if start >= 0 else None
+
+
+@dataclass(frozen=True)
+class NoDelivery:
+    window: int = 3000
+
+    def stalled(self, history):
+        start = history.since(self.window)
+        return start is not None and history.herd[-1] == history.herd[start]
+
+
+@dataclass(frozen=True)
+class NoApproach:
+    window: int = 3000
+    progress: float = 5.0
+
+    def stalled(self, history):
+        start = history.since(self.window)
+        if start is None:
+            return False
+        return min(history.lcm_distance[start:]) > history.lcm_distance[start] - self.progress
+
+
+@dataclass(frozen=True)
+class RobotStuck:
+    window: int = 1000
+    displacement: float = 3.0
+
+    def stalled(self, history):
+        start = history.since(self.window)
+        if start is None:
+            return False
+        dx = np.subtract(history.bot_x[start:], history.bot_x[start])
+        dy = np.subtract(history.bot_y[start:], history.bot_y[start])
+        return np.hypot(dx, dy).max() < self.displacement
+
+
+@dataclass(frozen=True)
+class Monitor:
+    """Rules for stalled runs, shared by all runs of a sweep; `watch` one run."""
+
+    rules: tuple = (NoDelivery(), NoApproach())
+    require: str = "all"  # "all" rules must agree, or "any" of them
+    every: int = 50
+    after: int = 5000  # no verdict before this tick
+    validate: bool = False  # only tag stalled runs, let them run to the end
+
+    def watch(self):
+        return Watch(self)
+
+
+class Watch:
+    """The state of a Monitor in one run."""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.history = History(monitor.every)
+        self.stalled = None  # {"tick", "reason"} once declared
+
+    def update(self, model):
+        """Sample the model after a tick; the verdict dict the first time the run is stalled."""
+        m = self.monitor
+        if self.stalled is not None or model.ticks % m.every:
+            return None
+        self.history.add(model)
+        if model.ticks < m.after:
+            return None
+        agree = [type(rule).__name__ for rule in m.rules if rule.stalled(self.history)]
+        if agree and (m.require == "any" or len(agree) == len(m.rules)):
+            self.stalled = {"tick": int(model.ticks), "reason": "+".join(agree)}
+            if m.validate:
+                self.stalled["validated"] = True
+            return self.stalled
+        return None
+
+
+def ended_early(record):
+    """Whether a run was stopped by its monitor (not only tagged)."""
+    stalled = record.get("stalled")
+    return bool(stalled) and not stalled.get("validated")
+
+
+def validation(records, max_ticks=MAX_TICKS):
+    """How the verdicts of validated runs compare with their full outcome."""
+    runs = flagged = wrong = 0
+    saved = total = 0
+    for record in records:
+        ticks, _ = outcome(record)
+        runs += 1
+        total += ticks
+        stalled = record.get("stalled")
+        if not stalled:
+            continue
+        flagged += 1
+        if ticks < max_ticks:
+            # the robot brought the herd home after all
+            wrong += 1
+        else:
+            saved += ticks - stalled["tick"]
+    return {
+        "runs": runs,
+        "flagged": flagged,
+        "wrong": wrong,
+        "wrong_rate": wrong / flagged if flagged else math.nan,
+        "ticks": total,
+        "ticks_saved": saved,
+    }
+
+
+def main(argv=None):
+    from .sweep import Ledger
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("ledger", help="ledger of a sweep run with --stall-validate")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS, help="runs shorter than this are successes")
+    parser.add_argument("--by", nargs="*", default=[], help="one line per value of these variables")
+    args = parser.parse_args(argv)
+    records = [r for r in Ledger(args.ledger).load().values() if not ended_early(r)]
+    groups = {}
+    for record in records:
+        key = tuple(record["values"].get(name) for name in args.by)
+        groups.setdefault(key, []).append(record)
+    for key, group in sorted(groups.items(), key=lambda item: str(item[0])):
+        v = validation(group, args.max_ticks)
+        label = ", ".join(f"{name} = {value}" for name, value in zip(args.by, key)) or "all runs"
+        print(
+            f"{label}: {v['flagged']}/{v['runs']} runs stalled, {v['wrong']} of them succeeded later "
+            f"({v['wrong_rate']:.1%}), {v['ticks_saved']}/{v['ticks']} ticks would be saved"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,454 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .streams import Draws
+
+# Neighbor queries of find-flockmates-metric, find-flockmates-knn and
+# find-flockmates-lr. An index is built once per tick over the alive animals and
+# answers the queries of all animals in one batch.
+#
+# Queries are given as coordinates plus the id (`who`) of the querying animal,
+# which is never reported as its own neighbor. Like `in-radius`, a neighbor at
+# exactly `radius` is included.
+#
+# `groups` splits the points into worlds that do not see each other, such as
+# the replicates of a BatchModel. A query is answered within the group of its
+# id, so queries must be ids of indexed points when groups are given.
+#
+# A VerletList keeps the candidates of a larger radius over several ticks
+# instead of searching from scratch every tick.
+
+
+class NeighborIndex(ABC):
+    def __init__(self, x, y, ids, groups=None):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.ids = np.asarray(ids, dtype=np.intp)
+        # the ids in the order given, kept when an index reorders its points
+        self.members = self.ids
+        self.groups = None if groups is None else np.asarray(groups, dtype=np.intp)
+        if self.groups is not None and self.ids.size:
+            self._group_of = np.zeros(self.ids.max() + 1, dtype=np.intp)
+            self._group_of[self.ids] = self.groups
+
+    def query_groups(self, qid):
+        if self.groups is None or not self.ids.size:
+            return np.zeros(len(qid), dtype=np.intp)
+        return self._group_of[qid]
+
+    @abstractmethod
+    def within(self, qx, qy, qid, radius):
+        """All pairs at most radius apart, as (query index, neighbor id, distance)."""
+
+    def nearest(self, qx, qy, qid, k, radius):
+        """The at most k nearest neighbors in radius, as a (queries, k) table padded with -1."""
+        qi, pid, dist = self.within(qx, qy, qid, radius)
+        return _k_smallest(qi, pid, dist, len(qid), k)[0]
+
+    def random_other(self, qid, exclude, rng):
+        """For every query one random indexed id that is not itself nor in its `exclude` row.
+
+        Reports -1 where nobody is left, like `one-of` an empty agentset.
+        """
+        if self.groups is not None:
+            raise ValueError("random_other of a grouped index needs the members and random stream of a group")
+        return random_other(self.members, qid, exclude, rng)
+
+
+def random_other(members, qid, exclude, rng):
+    """One random member per query that is not the query itself nor in its `exclude` row."""
+    n = members.size
+    eligible = n - 1 - (exclude >= 0).sum(axis=1)
+    picked = np.full(len(qid), -1, dtype=np.intp)
+    pending = np.flatnonzero(eligible > 0)
+    while pending.size:
+        if isinstance(rng, Draws):
+            # one draw per pending query, from its own stream
+            pick = members[rng.integers(0, n, agents=qid[pending])]
+        else:
+            pick = members[rng.integers(0, n, pending.size)]
+        ok = (pick != qid[pending]) & ~(exclude[pending] == pick[:, None]).any(axis=1)
+        picked[pending[ok]] = pick[ok]
+        pending = pending[~ok]
+    return picked
+
+
+def _k_smallest(qi, pid, dist, n_queries, k):
+    # keep the k closest neighbors of every query sorted by distance, with their distances.
+    # Ties go to the lowest id so that every index reports the same neighbors.
+    table = np.full((n_queries, k), -1, dtype=np.intp)
+    dist_table = np.full((n_queries, k), np.inf)
+    if qi.size == 0 or k == 0:
+        return table, dist_table
+    order = np.argsort(pid, kind="stable")
+    order = order[np.argsort(qi[order], kind="stable")]
+    qi, pid, dist = qi[order], pid[order], dist[order]
+    counts = np.bincount(qi, minlength=n_queries)
+    col = np.arange(qi.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    width = counts.max()
+    if n_queries * width > 4 * qi.size + 4096:
+        # a few crowded queries, padding every query to the widest one would not pay off
+        order = np.argsort(dist, kind="stable")
+        order = order[np.argsort(qi[order], kind="stable")]
+        keep = col < k
+        table[qi[keep], col[keep]] = pid[order][keep]
+        dist_table[qi[keep], col[keep]] = dist[order][keep]
+        return table, dist_table
+    # pad the candidates of every query into a row and sort the rows
+    dist_rows = np.full((n_queries, width), np.inf)
+    pid_rows = np.full((n_queries, width), -1, dtype=np.intp)
+    dist_rows[qi, col] = dist
+    pid_rows[qi, col] = pid
+    order = np.argsort(dist_rows, axis=1, kind="stable")[:, :k]
+    m = order.shape[1]
+    table[:, :m] = np.take_along_axis(pid_rows, order, axis=1)
+    dist_table[:, :m] = np.take_along_axis(dist_rows, order, axis=1)
+    return table, dist_table
+
+
+class BruteForce(NeighborIndex):
+    """All pairwise distances, the O(N^2) reference of the NetLogo primitives."""
+
+    def within(self, qx, qy, qid, radius):
+        dist = np.hypot(qx[:, None] - self.x[None, :], qy[:, None] - self.y[None, :])
+        dist[qid[:, None] == self.ids[None, :]] = np.inf
+        if self.groups is not None:
+            dist[self.query_groups(qid)[:, None] != self.groups[None, :]] = np.inf
+        qi, j = np.nonzero(dist <= radius)
+        return qi, self.ids[j], dist[qi, j]
+
+
+class CellGrid(NeighborIndex):
+    """Uniform grid of square cells (a cell list), by default cells of size `vision`."""
+
+    def __init__(self, x, y, ids, cell_size, groups=None):
+        super().__init__(x, y, ids, groups)
+        self.cell_size = float(cell_size)
+        if self.x.size:
+            self.x0, self.y0 = self.x.min(), self.y.min()
+            self.ncx = int((self.x.max() - self.x0) // self.cell_size) + 1
+            self.ncy = int((self.y.max() - self.y0) // self.cell_size) + 1
+        else:
+            self.x0 = self.y0 = 0.0
+            self.ncx = self.ncy = 1
+        # every group has its own block of cells
+        self.ngroups = int(self.groups.max()) + 1 if self.groups is not None and self.groups.size else 1
+        group = self.groups if self.groups is not None else 0
+        cx, cy = self._cell(self.x, self.y)
+        cell = (group * self.ncx + cx) * self.ncy + cy
+        order = np.argsort(cell, kind="stable")
+        self.x, self.y, self.ids = self.x[order], self.y[order], self.ids[order]
+        cells = np.arange(self.ngroups * self.ncx * self.ncy)
+        self.start = np.searchsorted(cell[order], cells)
+        self.stop = np.searchsorted(cell[order], cells, side="right")
+
+    def _cell(self, x, y):
+        cx = np.floor((x - self.x0) / self.cell_size).astype(np.intp)
+        cy = np.floor((y - self.y0) / self.cell_size).astype(np.intp)
+        return cx, cy
+
+    def _gather(self, qcx, qcy, qg, offsets):
+        # (query index, position in the sorted points) of every point in the offset cells
+        q = np.repeat(np.arange(qcx.size), len(offsets))
+        ox = np.tile(offsets[:, 0], qcx.size)
+        oy = np.tile(offsets[:, 1], qcx.size)
+        nx, ny = qcx[q] + ox, qcy[q] + oy
+        valid = (nx >= 0) & (nx < self.ncx) & (ny >= 0) & (ny < self.ncy)
+        q, cell = q[valid], (qg[q[valid]] * self.ncx + nx[valid]) * self.ncy + ny[valid]
+        start, counts = self.start[cell], self.stop[cell] - self.start[cell]
+        total = counts.sum()
+        offset_in_cell = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(q, counts), np.repeat(start, counts) + offset_in_cell
+
+    def _pairs(self, qx, qy, qid, qi, pos, radius):
+        dist = np.hypot(qx[qi] - self.x[pos], qy[qi] - self.y[pos])
+        keep = (dist <= radius) & (self.ids[pos] != qid[qi])
+        return qi[keep], self.ids[pos[keep]], dist[keep]
+
+    def within(self, qx, qy, qid, radius):
+        qcx, qcy = self._cell(qx, qy)
+        r = int(np.ceil(radius / self.cell_size))
+        offsets = _square(r)
+        qi, pos = self._gather(qcx, qcy, self.query_groups(qid), offsets)
+        return self._pairs(qx, qy, qid, qi, pos, radius)
+
+    def nearest(self, qx, qy, qid, k, radius):
+        # search ring after ring of cells, a query is finished once it has k
+        # neighbors closer than the distance already covered by its rings
+        qcx, qcy = self._cell(qx, qy)
+        qg = self.query_groups(qid)
+        r_max = int(np.ceil(radius / self.cell_size))
+        table = np.full((len(qid), k), -1, dtype=np.intp)
+        dist_table = np.full((len(qid), k), np.inf)
+        local = np.zeros(len(qid), dtype=np.intp)
+        pending = np.arange(len(qid))
+        for r in range(r_max + 1):
+            if pending.size == 0 or k == 0:
+                break
+            qi, pos = self._gather(qcx[pending], qcy[pending], qg[pending], _ring(r))
+            qi, pid, dist = self._pairs(qx, qy, qid, pending[qi], pos, radius)
+            # merge the new candidates with the best ones so far of the pending queries
+            local[pending] = np.arange(pending.size)
+            best = table[pending] >= 0
+            qi = np.concatenate([np.nonzero(best)[0], local[qi]])
+            pid = np.concatenate([table[pending][best], pid])
+            dist = np.concatenate([dist_table[pending][best], dist])
+            table[pending], dist_table[pending] = _k_smallest(qi, pid, dist, pending.size, k)
+            # distance to the nearest cell outside the searched block, minus some rounding slack
+            rel_x = (qx[pending] - self.x0) / self.cell_size - qcx[pending]
+            rel_y = (qy[pending] - self.y0) / self.cell_size - qcy[pending]
+            covered = (r + np.minimum.reduce([rel_x, 1 - rel_x, rel_y, 1 - rel_y]) - 1e-9) * self.cell_size
+            pending = pending[~(dist_table[pending, k - 1] < covered)]
+        return table
+
+
+def _square(r):
+    span = np.arange(-r, r + 1)
+    return np.stack(np.meshgrid(span, span, indexing="ij"), axis=-1).reshape(-1, 2)
+
+
+def _ring(r):
+    offsets = _square(r)
+    return offsets[np.abs(offsets).max(axis=1) == r]
+
+
+class KDTree(NeighborIndex):
+    """scipy's cKDTree, better than the grid when cells are crowded (small vision, large herds)."""
+
+    def __init__(self, x, y, ids, groups=None):
+        super().__init__(x, y, ids, groups)
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError as e:
+            raise ImportError("the kdtree neighbor index needs scipy, use the grid index instead") from e
+        if self.groups is not None:
+            # one tree per group
+            self.parts = {
+                g: KDTree(self.x[self.groups == g], self.y[self.groups == g], self.ids[self.groups == g])
+                for g in np.unique(self.groups)
+            }
+        else:
+            self.tree = cKDTree(np.column_stack([self.x, self.y]))
+
+    def _per_group(self, method, qx, qy, qid, *args):
+        # answer the queries of every group by the tree of the group, in query order
+        qg = self.query_groups(qid)
+        results = []
+        for g in np.unique(qg):
+            q = np.flatnonzero(qg == g)
+            results.append((q, getattr(self.parts[g], method)(qx[q], qy[q], qid[q], *args)))
+        return results
+
+    def within(self, qx, qy, qid, radius):
+        from scipy.spatial import cKDTree
+
+        if self.groups is not None:
+            parts = [(q[qi], pid, dist) for q, (qi, pid, dist) in self._per_group("within", qx, qy, qid, radius)]
+            if not parts:
+                return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+            return tuple(np.concatenate(a) for a in zip(*parts))
+
+        if not qx.size or not self.x.size:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+        queries = cKDTree(np.column_stack([qx, qy]))
+        pairs = queries.sparse_distance_matrix(self.tree, radius, output_type="ndarray")
+        qi, j, dist = pairs["i"].astype(np.intp), pairs["j"].astype(np.intp), pairs["v"]
+        keep = (dist <= radius) & (self.ids[j] != qid[qi])
+        return qi[keep], self.ids[j[keep]], dist[keep]
+
+    def nearest(self, qx, qy, qid, k, radius):
+        table = np.full((len(qid), k), -1, dtype=np.intp)
+        if self.groups is not None:
+            for q, part in self._per_group("nearest", qx, qy, qid, k, radius):
+                table[q] = part
+            return table
+        n = self.x.size
+        if not len(qid) or not n or not k:
+            return table
+        # a few more than k + 1 so that ties at the k-th distance are seen
+        kk = min(2 * k + 1, n)
+        dist, j = self.tree.query(np.column_stack([qx, qy]), k=kk, distance_upper_bound=np.nextafter(radius, np.inf))
+        dist, j = dist.reshape(len(qid), kk), j.reshape(len(qid), kk)
+        valid = (j < n) & (dist <= radius)
+        ids = np.where(valid, self.ids[np.minimum(j, n - 1)], -1)
+        ids[ids == qid[:, None]] = -1
+        qi, col = np.nonzero(ids >= 0)
+        return _k_smallest(qi, ids[qi, col], dist[qi, col], len(qid), k)[0]
+
+
+class VerletList:
+    """Candidate neighbors kept over ticks (a Verlet list).
+
+    `index` gives the index of a tick. For radius queries the candidates of
+    a point are all points within radius + skin, for the `k` nearest its
+    `spare` * k nearest within radius + skin. The candidates are searched
+    again once some point moved more than skin / 2 since they were built, or
+    when points appeared, so every pair within radius is still among them.
+    The k nearest candidates are the k nearest as long as no other point can
+    have come closer, which is checked for every query; the candidates of
+    queries that fail it are searched again with a fresh index.
+    The answers are those of a fresh index. Ids must keep meaning the same
+    animal, `reset` when they are renumbered.
+    """
+
+    def __init__(self, skin=1.0, kind="grid", spare=4):
+        self.skin = float(skin)
+        self.kind = kind
+        self.spare = spare
+        self.reset()
+
+    def reset(self):
+        self.base_radius = None  # the radius of the queries the list was built for
+        self.radius = None
+        self.k = None
+        self.builds = 0
+
+    def _stale(self, x, y, ids, radius, k):
+        if self.radius is None or radius > self.base_radius or k != self.k or not ids.size:
+            return True
+        if ids.max() >= self.built_x.size:
+            return True
+        moved = np.hypot(x - self.built_x[ids], y - self.built_y[ids])
+        # NaN for points that were not built, which is stale as well
+        if not (moved < self.skin / 2 - 1e-9).all():
+            return True
+        self.moved[ids] = moved
+        self.max_moved = moved.max()
+        return False
+
+    def _build(self, x, y, ids, radius, groups, k):
+        self.base_radius = radius
+        self.radius = radius + self.skin
+        self.k = k
+        size = ids.max() + 1 if ids.size else 0
+        self.built_x = np.full(size, np.nan)
+        self.built_y = np.full(size, np.nan)
+        self.built_x[ids], self.built_y[ids] = x, y
+        self.moved = np.zeros(size)
+        self.max_moved = 0.0
+        self.builds += 1
+        index = build_index(self.kind, x, y, ids, self.radius, nearest=k is not None, groups=groups)
+        if k is None:
+            qi, pid, _ = index.within(x, y, ids, self.radius)
+            owner = ids[qi]
+            order = np.argsort(owner, kind="stable")
+            self.candidates = pid[order]
+            self.count = np.bincount(owner, minlength=size)
+            self.start = np.cumsum(self.count) - self.count
+            return
+        table = index.nearest(x, y, ids, self.spare * k, self.radius)
+        self.table = np.full((size, table.shape[1]), -1, dtype=np.intp)
+        self.table[ids] = _by_id(table)
+        # every other point was at least `far` away, the farthest candidate or radius + skin
+        last = table[:, -1]
+        far = np.hypot(x - self.built_x[np.maximum(last, 0)], y - self.built_y[np.maximum(last, 0)])
+        self.far = np.full(size, np.nan)
+        self.far[ids] = np.where(last >= 0, far, self.radius)
+
+    def index(self, x, y, ids, radius, groups=None, k=None):
+        """The index of a tick, for radius queries or (with `k`) for the k nearest."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        ids = np.asarray(ids, dtype=np.intp)
+        if self._stale(x, y, ids, radius, k):
+            self._build(x, y, ids, radius, groups, k)
+        return VerletIndex(x, y, ids, self, groups)
+
+
+def _by_id(table):
+    # rows sorted by id, the -1 padding last
+    empty = np.iinfo(np.intp).max
+    rows = np.sort(np.where(table >= 0, table, empty), axis=1)
+    rows[rows == empty] = -1
+    return rows
+
+
+class VerletIndex(NeighborIndex):
+    """The index of a tick over the candidates of a VerletList."""
+
+    def __init__(self, x, y, ids, verlet, groups=None):
+        super().__init__(x, y, ids, groups)
+        self.verlet = verlet
+        size = verlet.built_x.size
+        self.px = np.full(size, np.nan)
+        self.py = np.full(size, np.nan)
+        self.px[self.ids], self.py[self.ids] = self.x, self.y
+
+    def _fresh(self, radius, nearest):
+        return build_index(self.verlet.kind, self.x, self.y, self.ids, radius, nearest=nearest, groups=self.groups)
+
+    def within(self, qx, qy, qid, radius):
+        v = self.verlet
+        if v.k is not None or radius > v.base_radius:
+            return self._fresh(radius, False).within(qx, qy, qid, radius)
+        counts = v.count[qid]
+        qi = np.repeat(np.arange(len(qid)), counts)
+        offset_in_row = np.arange(qi.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        pid = v.candidates[np.repeat(v.start[qid], counts) + offset_in_row]
+        dist = np.hypot(qx[qi] - self.px[pid], qy[qi] - self.py[pid])
+        # NaN, and so dropped, for candidates that are not indexed any more
+        keep = dist <= radius
+        return qi[keep], pid[keep], dist[keep]
+
+    def _candidates(self, qx, qy, qid, k, radius):
+        # the k nearest among the candidates, and the queries for which that may be wrong
+        v = self.verlet
+        # rows of candidates sorted by id, a stable sort by distance then breaks ties by id
+        candidates = v.table[qid]
+        pid = np.maximum(candidates, 0)
+        dist = np.hypot(qx[:, None] - self.px[pid], qy[:, None] - self.py[pid])
+        dist[~((candidates >= 0) & (dist <= radius))] = np.inf
+        order = np.argsort(dist, axis=1, kind="stable")[:, :k]
+        dist_table = np.take_along_axis(dist, order, axis=1)
+        table = np.where(dist_table < np.inf, np.take_along_axis(candidates, order, axis=1), -1)
+        if table.shape[1] < k:
+            table = np.pad(table, ((0, 0), (0, k - table.shape[1])), constant_values=-1)
+            dist_table = np.pad(dist_table, ((0, 0), (0, k - dist_table.shape[1])), constant_values=np.inf)
+        # a point that is not a candidate is at least far - moved - max_moved away now
+        reach = np.where(table[:, -1] >= 0, dist_table[:, -1], radius)
+        return table, ~(reach < v.far[qid] - v.moved[qid] - v.max_moved - 1e-9)
+
+    def nearest(self, qx, qy, qid, k, radius):
+        v = self.verlet
+        if v.k != k or radius > v.base_radius:
+            return self._fresh(radius, True).nearest(qx, qy, qid, k, radius)
+        table, failed = self._candidates(qx, qy, qid, k, radius)
+        if failed.any():
+            # search the candidates of these queries again, from where everybody is now
+            fresh = self._fresh(v.radius, True)
+            q = np.flatnonzero(failed)
+            rows = fresh.nearest(qx[q], qy[q], qid[q], v.table.shape[1], v.radius)
+            last = np.maximum(rows[:, -1], 0)
+            far = np.where(rows[:, -1] >= 0, np.hypot(qx[q] - self.px[last], qy[q] - self.py[last]), v.radius)
+            v.table[qid[q]] = _by_id(rows)
+            # the bound holds from the build of the list on, by the moves before and after now
+            v.far[qid[q]] = far - v.moved[qid[q]] - v.max_moved
+            table[q], failed = self._candidates(qx[q], qy[q], qid[q], k, radius)
+            if failed.any():
+                # ties at the distance of the farthest candidate
+                q = q[failed]
+                table[q] = fresh.nearest(qx[q], qy[q], qid[q], k, radius)
+        return table
+
+
+INDEXES = {"brute": BruteForce, "grid": CellGrid, "kdtree": KDTree}
+
+
+def build_index(kind, x, y, ids, vision, nearest=False, groups=None):
+    """Build the index of a tick.
+
+    The grid uses cells of size vision. For nearest neighbor queries (`nearest`)
+    smaller cells holding about one animal each are used, the rings of cells
+    around an animal are then searched only until its knn nearest are found.
+    """
+    if kind == "grid":
+        cell_size = vision
+        if nearest and len(x) > 1:
+            area = max(np.ptp(x), 1.0) * max(np.ptp(y), 1.0)
+            ngroups = len(np.unique(groups)) if groups is not None else 1
+            cell_size = min(vision, np.sqrt(area * ngroups / len(x)))
+        return CellGrid(x, y, ids, cell_size=max(cell_size, 1e-9), groups=groups)
+    if kind not in INDEXES:
+        raise ValueError(f"unknown neighbor index {kind!r}, expected one of {sorted(INDEXES)}")
+    return INDEXES[kind](x, y, ids, groups)
@@ -0,0 +1,119 @@
+from dataclasses import dataclass, fields, replace
+
+# Interface values of herds.nlogo, the defaults are the ones saved in the model file
+# (see also "Interesting SA with default value" in SA_Scheme.txt)
+
+
+@dataclass(frozen=True)
+class Params:
+    population: int = 50
+    vision: float = 25.0
+    model_neighbor: str = "3 Long-range neighbor"
+    happyzone_min: float = 2.0
+    happyzone_max: float = 13.0
+    repulsion_weight: float = 100.0
+    alignment_weight: float = 50.0
+    attraction_weight: float = 1.0
+    robot_repulsion: float = 10.0
+    randomness: float = 5.0
+    auto_shepherd: bool = True
+    farmer_vision: float = 5.0
+    herd_speed_ratio: float = 1.0
+    bot_speed_ratio: float = 5.0
+    global_vision: bool = False
+    seed_option: str = "2 fixed"
+    furthest_allowed: float = 25.0
+    min_distance_to_herd: float = 5.0
+    # world of the GRAPHICS-WINDOW, not wrapping in x nor y
+    min_pxcor: int = -40
+    max_pxcor: int = 40
+    min_pycor: int = -40
+    max_pycor: int = 40
+
+    @classmethod
+    def from_netlogo(cls, values):
+        """Build parameters from NetLogo variable names, e.g. {"bot-speed-ratio": 2}.
+
+        Values may be python values or NetLogo literals as found in BehaviorSpace
+        (`true`, `"3 Long-range neighbor"`, `2.5`).
+        """
+        return cls().with_netlogo(values)
+
+    def with_netlogo(self, values):
+        known = {f.name: f.type for f in fields(self)}
+        changes = {}
+        for name, value in values.items():
+            key = name.replace("-", "_").lower()
+            if key not in known:
+                raise KeyError(f"unknown model variable {name!r}")
+            changes[key] = _convert(value, known[key])
+        return replace(self, **changes)
+
+    def to_netlogo(self):
+        return {f.name.replace("_", "-"): getattr(self, f.name) for f in fields(self)}
+
+
+def _convert(value, kind):
+    if isinstance(value, str):
+        value = value.strip()
+        if kind in (bool, "bool"):
+            if value.lower() not in ("true", "false"):
+                raise ValueError(f"expected true/false, got {value!r}")
+            return value.lower() == "true"
+        if kind in (str, "str"):
+            return value.strip('"')
+        value = float(value)
+    if kind in (int, "int"):
+        return int(round(value))
+    if kind in (float, "float"):
+        return float(value)
+    return value
+
+
+@dataclass(frozen=True)
+class Globals:
+    # the globals of herds.nlogo, as computed in `setup`
+    base_speed: float
+    base_speed_herd: float
+    max_speed_bot: float
+    d0: float
+    d1: float
+    k0: float
+    k1: float
+    x0: float
+    x1: float
+    knn: int
+    entity_width: float
+    dt: float
+    w_s_max: float
+    target_x: float
+    target_y: float
+    fence_range: float
+
+    @classmethod
+    def from_params(cls, p):
+        base_speed = 0.1
+        base_speed_herd = base_speed * p.herd_speed_ratio
+        d0 = p.happyzone_min
+        d1 = p.happyzone_min + p.happyzone_max
+        x0 = d0 / 2
+        x1 = d1 * 2
+        return cls(
+            base_speed=base_speed,
+            base_speed_herd=base_speed_herd,
+            max_speed_bot=base_speed_herd * p.bot_speed_ratio,
+            d0=d0,
+            d1=d1,
+            # happyzone-min 0 makes NetLogo divide by zero, keep the sigmoid flat instead
+            k0=5 / x0 if x0 else 0.0,
+            k1=10 / x1 if x1 else 0.0,
+            x0=x0,
+            x1=x1,
+            knn=5,
+            entity_width=1.0,
+            dt=1.0,
+            w_s_max=360.0,
+            target_x=-p.max_pxcor / 2,
+            target_y=-p.max_pycor / 2,
+            fence_range=2.0,
+        )
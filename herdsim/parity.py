@@ -0,0 +1,114 @@
+"""Parity test mode: compare trajectory statistics of the engine with NetLogo.
+
+The input is a BehaviorSpace table export (csv) of an experiment with
+runMetricsEveryStep="true", such as "parity-trajectories" in herds.nlogo.
+Every metric column that is one of herdsim.reporters.REPORTERS is recomputed by the
+engine for the same parameters, and the mean over the repetitions is compared
+tick by tick.
+
+    python -m herdsim.parity parity-trajectories-table.csv
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from .model import Model
+from .params import Params
+from .reporters import REPORTERS
+
+# BehaviorSpace columns that are not model variables
+RUN_COLUMNS = ("[run number]", "[step]")
+
+
+def read_table(path):
+    """Read a BehaviorSpace table csv, skipping the 6 lines of run information."""
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))[6:]
+    header, rows = rows[0], rows[1:]
+    return [dict(zip(header, row)) for row in rows if row]
+
+
+def netlogo_trajectories(rows):
+    """Group a table into {run number: (parameters, {step: {reporter: value}})}."""
+    runs = {}
+    for row in rows:
+        params = {k: v for k, v in row.items() if k not in RUN_COLUMNS and k not in REPORTERS}
+        values = {k: float(v) for k, v in row.items() if k in REPORTERS and v not in ("", "N/A")}
+        _, steps = runs.setdefault(row["[run number]"], (params, {}))
+        steps[int(row["[step]"])] = values
+    return runs
+
+
+def engine_trajectories(params, repetitions, steps, seed=0):
+    """Run the engine `repetitions` times and record REPORTERS at the requested steps."""
+    steps = sorted(set(steps))
+    out = []
+    for rep in range(repetitions):
+        model = Model(params, seed=seed + rep)
+        record = {}
+        for step in steps:
+            while model.ticks < step and not model.done():
+                model.go()
+            if model.ticks < step:
+                break
+            record[step] = {name: float(f(model)) for name, f in REPORTERS.items()}
+        out.append(record)
+    return out
+
+
+def compare(netlogo, engine, reporters, tolerance=3.0):
+    """Compare the per-step means of two ensembles of trajectories.
+
+    A statistic fails when the means differ by more than `tolerance` standard
+    errors of the difference (plus a small absolute slack for exact statistics).
+    """
+    report = []
+    steps = sorted({s for run in netlogo for s in run} & {s for run in engine for s in run})
+    for name in reporters:
+        for step in steps:
+            a = np.array([run[step][name] for run in netlogo if step in run and name in run[step]])
+            b = np.array([run[step][name] for run in engine if step in run])
+            a, b = a[np.isfinite(a)], b[np.isfinite(b)]
+            if a.size < 2 or b.size < 2:
+                continue
+            se = np.sqrt(a.var(ddof=1) / a.size + b.var(ddof=1) / b.size)
+            diff = b.mean() - a.mean()
+            ok = abs(diff) <= tolerance * se + 1e-9 * max(1.0, abs(a.mean()))
+            report.append((name, step, a.mean(), b.mean(), se, ok))
+    return report
+
+
+def parity_check(path, repetitions=None, tolerance=3.0, seed=0):
+    runs = netlogo_trajectories(read_table(path))
+    by_params = {}
+    for params, steps in runs.values():
+        by_params.setdefault(tuple(sorted(params.items())), []).append(steps)
+    report = []
+    for key, netlogo in by_params.items():
+        params = Params.from_netlogo(dict(key))
+        steps = {s for run in netlogo for s in run}
+        reporters = sorted({name for run in netlogo for values in run.values() for name in values})
+        engine = engine_trajectories(params, repetitions or len(netlogo), steps, seed=seed)
+        report += [(dict(key),) + row for row in compare(netlogo, engine, reporters, tolerance)]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("table", help="BehaviorSpace table export with metrics every step")
+    parser.add_argument("--repetitions", type=int, help="engine runs per parameter set, default as in the table")
+    parser.add_argument("--tolerance", type=float, default=3.0, help="allowed difference in standard errors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    report = parity_check(args.table, args.repetitions, args.tolerance, args.seed)
+    failed = [row for row in report if not row[-1]]
+    for params, name, step, netlogo, engine, se, ok in failed:
+        print(f"{name} at step {step}: netlogo {netlogo:.4g}, engine {engine:.4g} (se {se:.3g})")
+    print(f"{len(report) - len(failed)}/{len(report)} statistics within {args.tolerance} standard errors")
+    return 1 if failed or not report else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Where the time of a tick goes: wall time and calls per phase of `go`, and counters.
+
+A Profiler given to Model or BatchModel (`profiler=Profiler()`) times every
+procedure of `go` and counts what drives its cost: links, links to the robot,
+visible and living herdanimals. It is switched at runtime with
+`profiler.enabled`; a model without one, or with a disabled one, only pays
+for a check per tick.
+
+The totals are written as folded stacks (`go;linking 1234`, microseconds),
+which flamegraph.pl, inferno and speedscope read, or as a summary dict. A
+sweep with `--profile` stores the summary of every run in
+<ledger>-profile.jsonl, next to its ledger.
+
+    python -m herdsim.profiling --population 200 --model-neighbor "2 Topological neighbor" --folded tick.folded
+    python -m herdsim.profiling --summary bot-speed-profile.jsonl
+"""
+import argparse
+import json
+import sys
+import time
+
+
+class Profiler:
+    """Wall time and calls per phase of `go` and counters per tick, while `enabled`."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.nanoseconds = {}  # phase -> total wall time
+        self.calls = {}
+        self.counters = {}
+
+    def go(self, model):
+        """Run the phases of one tick of `model`, timing every one."""
+        for name, step in model.phases():
+            start = time.perf_counter_ns()
+            step()
+            self.add(name, time.perf_counter_ns() - start)
+        self.ticks += 1
+        self.count("links", model.link_src.size)
+        self.count("robot links", (model.link_dst < 0).sum())
+        self.count("visibles", (model.visibles & model.alive).sum())
+        self.count("herdanimals", model.alive.sum())
+
+    def add(self, phase, nanoseconds, calls=1):
+        self.nanoseconds[phase] = self.nanoseconds.get(phase, 0) + nanoseconds
+        self.calls[phase] = self.calls.get(phase, 0) + calls
+
+    def count(self, counter, value):
+        self.counters[counter] = self.counters.get(counter, 0) + int(value)
+
+    def summary(self):
+        """Totals as a json-friendly dict: ticks, seconds and calls per phase, counters."""
+        return {
+            "ticks": self.ticks,
+            "seconds": sum(self.nanoseconds.values()) / 1e9,
+            "phases": {
+                name: {"calls": self.calls[name], "seconds": ns / 1e9} for name, ns in self.nanoseconds.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def folded(self, root="go"):
+        """Folded stacks, one `root;phase microseconds` line per phase."""
+        return "".join(f"{root};{name} {ns // 1000}\n" for name, ns in self.nanoseconds.items())
+
+    def write_folded(self, path, root="go"):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded(root))
+
+
+def table(summary):
+    """A summary as printable text: time per phase and counters per tick."""
+    ticks = max(summary["ticks"], 1)
+    total = summary["seconds"] or 1.0
+    lines = [f"{summary['ticks']} ticks, {summary['seconds'] * 1e3 / ticks:.3f} ms per tick"]
+    lines.append(f"{'phase':<30}{'calls':>9}{'ms/tick':>10}{'share':>8}")
+    for name, phase in summary["phases"].items():
+        share = phase["seconds"] / total
+        lines.append(f"{name:<30}{phase['calls']:>9}{phase['seconds'] * 1e3 / ticks:>10.3f}{share:>8.1%}")
+    counters = summary["counters"]
+    for name, value in counters.items():
+        lines.append(f"{name + ' per tick':<30}{value / ticks:>27.1f}")
+    if counters.get("herdanimals"):
+        flockmates = counters["links"] - counters["robot links"]
+        lines.append(f"{'flockmates per herdanimal':<30}{flockmates / counters['herdanimals']:>27.2f}")
+    return "\n".join(lines)
+
+
+def merge(summaries):
+    """The sum of several summaries, e.g. of the runs of a sweep."""
+    profiler = Profiler()
+    for summary in summaries:
+        profiler.ticks += summary["ticks"]
+        for name, phase in summary["phases"].items():
+            profiler.add(name, round(phase["seconds"] * 1e9), phase["calls"])
+        for name, value in summary["counters"].items():
+            profiler.count(name, value)
+    return profiler.summary()
+
+
+def read_profiles(path):
+    """The lines of a <ledger>-profile.jsonl file."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.endswith("\n")]
+
+
+def main(argv=None):
+    from .model import Model
+    from .params import Params
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--summary", help="summarise a <ledger>-profile.jsonl of a sweep instead of running")
+    parser.add_argument("--by", nargs="*", default=[], help="with --summary, one table per value of these variables")
+    parser.add_argument("--population", type=int, default=Params.population)
+    parser.add_argument("--model-neighbor", default=Params.model_neighbor)
+    parser.add_argument("--global-vision", action="store_true")
+    parser.add_argument("--neighbors", default="grid", help="neighbor index of the flockmates")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--folded", help="write folded stacks for a flame graph")
+    args = parser.parse_args(argv)
+    if args.summary:
+        groups = {}
+        for line in read_profiles(args.summary):
+            key = tuple(line["values"].get(name) for name in args.by)
+            groups.setdefault(key, []).append(line["profile"])
+        for key, summaries in sorted(groups.items(), key=lambda item: str(item[0])):
+            if args.by:
+                print(", ".join(f"{name} = {value}" for name, value in zip(args.by, key)))
+            print(f"{len(summaries)} runs, " + table(merge(summaries)), end="\n\n")
+        return 0
+    params = Params(population=args.population, model_neighbor=args.model_neighbor, global_vision=args.global_vision)
+    profiler = Profiler()
+    model = Model(params, seed=args.seed, neighbors=args.neighbors, profiler=profiler)
+    while not model.done(args.ticks):
+        model.go()
+    print(table(profiler.summary()))
+    if args.folded:
+        profiler.write_folded(args.folded)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
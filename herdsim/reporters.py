@@ -0,0 +1,65 @@
+import re
+
+import numpy as np
+
+# NetLogo reporters used as BehaviorSpace metrics and conditions, and their
+# engine equivalent. Only the reporters of the experiments in herds.nlogo are
+# known, anything else is refused rather than guessed.
+
+
+def _mean_of_herd(values):
+    return lambda m: getattr(m, values)[m.alive].mean() if m.alive.any() else np.nan
+
+
+REPORTERS = {
+    "ticks": lambda m: m.ticks,
+    "[distance-traveled] of robots": lambda m: m.distance_traveled,
+    "count herdanimals": lambda m: m.count_herdanimals,
+    "mean [xcor] of herdanimals": _mean_of_herd("xcor"),
+    "mean [ycor] of herdanimals": _mean_of_herd("ycor"),
+    "mean [speed] of herdanimals": _mean_of_herd("speed"),
+    "mean [dTarget] of herdanimals": _mean_of_herd("dTarget"),
+    "[xcor] of robot 0": lambda m: m.bot_x,
+    "[ycor] of robot 0": lambda m: m.bot_y,
+    "[distance-traveled] of robot 0": lambda m: m.distance_traveled,
+}
+
+_CONDITIONS = {
+    "not any? herdanimals": lambda m: not m.alive.any(),
+    "any? herdanimals": lambda m: m.alive.any(),
+}
+
+_TICKS = re.compile(r"^ticks\s*(=|>=|>)\s*(\d+)$")
+_COMPARE = {"=": lambda a, b: a == b, ">=": lambda a, b: a >= b, ">": lambda a, b: a > b}
+
+
+def reporter(expression):
+    """The engine function of a NetLogo reporter, called with the model."""
+    expression = " ".join(expression.split())
+    if expression not in REPORTERS:
+        raise ValueError(f"unsupported reporter {expression!r}, known are {sorted(REPORTERS)}")
+    return REPORTERS[expression]
+
+
+def condition(expression):
+    """The engine function of a NetLogo condition such as an exitCondition.
+
+    Conditions are `or`/`and` combinations of `[not] any? herdanimals` and
+    comparisons of `ticks` with a number. An empty condition is never true.
+    """
+    expression = " ".join(expression.split())
+    if not expression:
+        return lambda m: False
+    if " or " in expression:
+        parts = [condition(part) for part in expression.split(" or ")]
+        return lambda m: any(part(m) for part in parts)
+    if " and " in expression:
+        parts = [condition(part) for part in expression.split(" and ")]
+        return lambda m: all(part(m) for part in parts)
+    if expression in _CONDITIONS:
+        return _CONDITIONS[expression]
+    match = _TICKS.match(expression)
+    if match:
+        compare, number = _COMPARE[match.group(1)], int(match.group(2))
+        return lambda m: compare(m.ticks, number)
+    raise ValueError(f"unsupported condition {expression!r}")
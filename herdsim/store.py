@@ -0,0 +1,297 @@
+"""Columnar results store: BehaviorSpace exports converted once to Parquet.
+
+Tables and spreadsheets exported by BehaviorSpace (.csv or .xlsx) and sweep
+ledgers of herdsim.sweep (.jsonl) are ingested into a dataset directory with
+one partition per experiment:
+
+    <dataset>/experiment=<name>/part-<sha256>.parquet
+    <dataset>/manifest.json
+
+Inside a part the rows are sorted by the parameter columns and every
+parameter cell is a row group of its own, so the min/max statistics of a
+row group name its cell and `load(..., filters=[("population", "=", 50)])`
+reads only the row groups of the matching cells. The manifest keeps the
+content hash of every source, an unchanged source is never parsed again. Columns are named as in the SA_results scripts, without
+BehaviorSpace's brackets ("run number", "step", "distance-traveled of robots").
+
+    python -m herdsim.store ingest SA_results/*.xlsx --dataset SA_results/dataset
+    python -m herdsim.store list --dataset SA_results/dataset
+"""
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import sys
+
+RUN_COLUMNS = ("run number", "step")
+MANIFEST = "manifest.json"
+
+
+def column_name(name):
+    # "[run number]" -> "run number", "[distance-traveled] of robots" -> "distance-traveled of robots"
+    return " ".join(str(name).replace("[", "").replace("]", "").split())
+
+
+def _value(value):
+    # cells of csv files are strings, cells of xlsx files already typed
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        if text in ("true", "false"):
+            return text == "true"
+        if text.startswith('"') and text.endswith('"'):
+            return text[1:-1]
+        if text.startswith("[") and text.endswith("]"):
+            # a list of one number, like [distance-traveled] of robots
+            inner = text[1:-1].split()
+            text = inner[0] if len(inner) == 1 else text
+        try:
+            number = float(text)
+        except ValueError:
+            return text
+        return int(number) if number.is_integer() and "." not in text else number
+    return value
+
+
+def _rows(path):
+    if path.endswith(".xlsx"):
+        import pandas as pd
+
+        return pd.read_excel(path, header=None, dtype=object).values.tolist()
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def _cell(rows, r, c):
+    return rows[r][c] if r < len(rows) and c < len(rows[r]) else None
+
+
+def read_behaviorspace(path):
+    """Read an export into (experiment, parameters, metrics, list of row dicts)."""
+    if path.endswith(".jsonl"):
+        return _read_ledger(path)
+    rows = _rows(path)
+    version = str(_cell(rows, 0, 1) or "")
+    experiment = str(_cell(rows, 2, 0))
+    if version.startswith("Spreadsheet"):
+        return _read_spreadsheet(experiment, rows)
+    header = [column_name(h) for h in rows[6] if h is not None and h == h and h != ""]
+    step = header.index("step")
+    parameters, metrics = header[1:step], header[step + 1:]
+    records = [
+        {name: _value(v) for name, v in zip(header, row)}
+        for row in rows[7:]
+        if row and _value(row[0]) is not None
+    ]
+    return experiment, parameters, metrics, records
+
+
+def _read_spreadsheet(experiment, rows):
+    # one column per run and metric, the variables above "[reporter]"
+    labels = [str(_cell(rows, r, 0) or "") for r in range(len(rows))]
+    start = labels.index("[run number]")
+    reporter_row = labels.index("[reporter]")
+    runs = [_value(v) for v in rows[start][1:]]
+    runs = [r for r in runs if r is not None]
+    parameters = [column_name(labels[r]) for r in range(start + 1, reporter_row)]
+    metrics = []
+    for name in rows[reporter_row][1:]:
+        if _value(name) is None:
+            break
+        if column_name(name) in metrics:
+            break
+        metrics.append(column_name(name))
+    final = rows[labels.index("[final]")]
+    steps = rows[labels.index("[steps]")]
+    records = []
+    for i, run in enumerate(runs[:: len(metrics)]):
+        col = 1 + i * len(metrics)
+        record = {"run number": run}
+        for offset, name in enumerate(parameters):
+            record[name] = _value(rows[start + 1 + offset][col])
+        record["step"] = _value(steps[col])
+        for j, name in enumerate(metrics):
+            record[name] = _value(final[col + j])
+        records.append(record)
+    return experiment, parameters, metrics, records
+
+
+def _read_ledger(path):
+    from .sweep import Ledger
+
+    records, parameters, metrics, experiment = [], [], [], None
+    for record in sorted(Ledger(path).load().values(), key=lambda r: r["run"]):
+        experiment = record["experiment"]
+        parameters = parameters or list(record["values"])
+        for row in record["rows"]:
+            metrics = metrics or [column_name(k) for k in row if k != "[step]"]
+            out = {"run number": record["run"], **record["values"], "seed": record["seed"]}
+            # runs ended by a stall monitor (herdsim.monitor) report the tick they were stopped at
+            out["stalled"] = bool(record.get("stalled")) and not record["stalled"].get("validated")
+            out.update({column_name(k): v for k, v in row.items()})
+            records.append(out)
+    return experiment, parameters, metrics, records
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_manifest(dataset):
+    path = os.path.join(dataset, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(dataset, manifest):
+    path = os.path.join(dataset, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def ingest(paths, dataset):
+    """Convert the sources that changed since the last ingest, report {path: status}."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(dataset, exist_ok=True)
+    manifest = _load_manifest(dataset)
+    status = {}
+    for path in paths:
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = manifest.get(key)
+        if entry and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            status[path] = "unchanged"
+            continue
+        digest = file_digest(path)
+        if entry and entry["sha256"] == digest:
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            status[path] = "unchanged"
+            continue
+        experiment, parameters, metrics, records = read_behaviorspace(path)
+        records.sort(key=lambda r: tuple(_sort_key(r.get(p)) for p in parameters + ["run number", "step"]))
+        table = pa.Table.from_pylist(records)
+        table = table.append_column("source", pa.array([os.path.basename(path)] * table.num_rows).dictionary_encode())
+        table = table.replace_schema_metadata({
+            "experiment": experiment,
+            "parameters": json.dumps(parameters),
+            "metrics": json.dumps(metrics),
+            "sha256": digest,
+        })
+        part = os.path.join(f"experiment={experiment}", f"part-{digest[:16]}.parquet")
+        os.makedirs(os.path.join(dataset, os.path.dirname(part)), exist_ok=True)
+        with pq.ParquetWriter(os.path.join(dataset, part), table.schema) as writer:
+            for start, stop in _cell_slices(records, parameters):
+                writer.write_table(table.slice(start, stop - start))
+        if entry and entry["file"] != part and os.path.exists(os.path.join(dataset, entry["file"])):
+            os.remove(os.path.join(dataset, entry["file"]))
+        manifest[key] = {
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "file": part,
+            "experiment": experiment,
+            "parameters": parameters,
+            "metrics": metrics,
+            "rows": table.num_rows,
+        }
+        status[path] = "ingested"
+    _save_manifest(dataset, manifest)
+    return status
+
+
+def _cell_slices(records, parameters):
+    # (start, stop) of the runs of every parameter cell, the records sorted by the parameters
+    start = 0
+    for i in range(1, len(records) + 1):
+        if i == len(records) or any(records[i].get(p) != records[start].get(p) for p in parameters):
+            yield start, i
+            start = i
+
+
+def _sort_key(value):
+    # None first, then by type, so that mixed columns still sort
+    return (value is not None, str(type(value)), value if value is not None else 0)
+
+
+def experiments(dataset):
+    """{experiment: [manifest entries]} of a dataset."""
+    out = {}
+    for entry in _load_manifest(dataset).values():
+        out.setdefault(entry["experiment"], []).append(entry)
+    return out
+
+
+def load_table(dataset, experiment=None, columns=None, filters=None):
+    """Memory-mapped Arrow table of one experiment (or all), reading only `columns`.
+
+    `filters` are pyarrow filters on the columns, e.g. [("population", "=", 50)];
+    row groups (parameter cells) whose statistics rule them out are skipped,
+    and so are parts without the filtered columns.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tables = []
+    for name, entries in sorted(experiments(dataset).items()):
+        if experiment is not None and name != experiment:
+            continue
+        for entry in entries:
+            path = os.path.join(dataset, entry["file"])
+            wanted = None
+            if columns is not None or filters is not None:
+                schema = pq.read_schema(path)
+                if filters is not None and not _filtered_columns(filters) <= set(schema.names):
+                    continue
+                if columns is not None:
+                    wanted = [c for c in columns if c in schema.names]
+            table = pq.read_table(path, columns=wanted, filters=filters, memory_map=True)
+            if experiment is None and (columns is None or "experiment" in columns):
+                table = table.append_column("experiment", pa.array([name] * table.num_rows).dictionary_encode())
+            tables.append(table)
+    if not tables:
+        columns_of = f" with the columns of the filters {filters}" if filters is not None else ""
+        raise KeyError(f"no experiment {experiment!r}{columns_of} in {dataset}")
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def _filtered_columns(filters):
+    # filters are a list of (column, op, value), or a list of such lists (or-ed)
+    terms = [t for group in filters for t in group] if filters and isinstance(filters[0], list) else filters
+    return {column for column, _, _ in terms}
+
+
+def load(dataset, experiment=None, columns=None, filters=None):
+    """Like load_table, as a pandas DataFrame."""
+    return load_table(dataset, experiment, columns, filters).to_pandas()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["ingest", "list"])
+    parser.add_argument("sources", nargs="*", help="BehaviorSpace exports (.csv, .xlsx) or sweep ledgers (.jsonl)")
+    parser.add_argument("--dataset", default="dataset", help="dataset directory")
+    args = parser.parse_args(argv)
+    if args.command == "ingest":
+        for path, status in ingest(args.sources, args.dataset).items():
+            print(f"{status:>10}  {path}")
+    else:
+        for name, entries in sorted(experiments(args.dataset).items()):
+            rows = sum(e["rows"] for e in entries)
+            print(f"{name}: {rows} rows from {len(entries)} source(s), parameters {entries[0]['parameters']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Counter-based random streams: every draw is a function of (seed, purpose, tick, agent).
+
+With one sequential generator per run, a draw depends on how many draws
+came before it, so two parameter cells with the same seed share the first
+positions and then go their own way at the first `one-of` that needs a
+second try. Here a draw is the Philox4x64-10 block of the counter
+(agent, tick, call, 0) under the key (seed, purpose), so herdanimal 7 gets
+the same `Randomness` jitter at tick 300 in every cell, every batch and
+every process. Differences between cells are then driven by the parameters
+and not by the noise (common random numbers), and paired comparisons need
+fewer repetitions:
+
+    Model(params, seed=3, streams=True)
+    python -m herdsim.sweep "global vs local" --streams
+    python -m herdsim.benchmarks.crn --parameter global-vision --values false true --seeds 30
+
+The purposes are `setup` (setxy random and the initial heading), `one-of`
+(the random mate of find-flockmates-lr) and `randomness` (heading jitter).
+The philox function gives the same numbers as numpy.random.Philox for the
+same counter and key.
+"""
+import numpy as np
+
+PURPOSES = {"setup": 0, "one-of": 1, "randomness": 2}
+_M = np.array([[0xD2E7470EE14C6C93], [0xCA5A826395121157]], dtype=np.uint64)
+_W = np.array([0x9E3779B97F4A7C15, 0xBB67AE8584CAA73B], dtype=np.uint64)
+_LOW = np.uint64(0xFFFFFFFF)
+_32 = np.uint64(32)
+_M_LO, _M_HI = _M & _LOW, _M >> _32
+
+
+def philox(counter, key, rounds=10):
+    """Philox4x64 of a counter (4 uint64 arrays, broadcast) under a key (2 uint64), the 4 output words."""
+    c0, c1, c2, c3 = (np.asarray(c, dtype=np.uint64) for c in np.broadcast_arrays(*counter))
+    # words 0 and 2 are multiplied, 1 and 3 xored in: both pairs go through a round together
+    x, y = np.stack([c0, c2]).reshape(2, -1), np.stack([c1, c3]).reshape(2, -1)
+    keys = np.array(key, dtype=np.uint64)[:, None] + _W[:, None] * np.arange(rounds, dtype=np.uint64)
+    for r in range(rounds):
+        # 128 bit products of the multipliers and x, from 32 bit halves
+        x_lo, x_hi = x & _LOW, x >> _32
+        cross_1, cross_2 = _M_LO * x_hi, _M_HI * x_lo
+        mid = ((_M_LO * x_lo) >> _32) + (cross_1 & _LOW) + (cross_2 & _LOW)
+        hi = _M_HI * x_hi + (cross_1 >> _32) + (cross_2 >> _32) + (mid >> _32)
+        x, y = hi[::-1] ^ y ^ keys[:, r, None], (_M * x)[::-1]
+    shape = c0.shape
+    return x[0].reshape(shape), y[0].reshape(shape), x[1].reshape(shape), y[1].reshape(shape)
+
+
+class Streams:
+    """The random streams of one run, for a population of `population` herdanimals."""
+
+    def __init__(self, seed, population):
+        self.seed = int(seed)
+        self.population = population
+
+    @property
+    def state(self):
+        # what herdsim.checkpoint saves in place of a generator state
+        return {"bit_generator": "Streams", "seed": self.seed, "population": self.population}
+
+    def draws(self, purpose, tick):
+        """The draws of one purpose at one tick, with the calls of a numpy Generator."""
+        return Draws(self, PURPOSES[purpose], tick)
+
+
+class Draws:
+    """Generator-like draws of one purpose and tick, one per agent.
+
+    Without `agents` a call draws for every herdanimal (`size` must be the
+    population), with `agents` for those ids only; ids of a BatchModel are
+    taken modulo the population. Every call uses the next counter, so the
+    retries of `one-of` do not change the draws of anyone else.
+    """
+
+    def __init__(self, streams, purpose, tick):
+        self.streams = streams
+        self.purpose = purpose
+        self.tick = tick
+        self.calls = 0
+
+    def bits(self, agents=None, size=None):
+        n = self.streams.population
+        if agents is None:
+            if size is not None and size != n:
+                raise ValueError(f"draws for {size} agents without their ids, the population is {n}")
+            agents = np.arange(n)
+        who = np.asarray(agents) % n
+        out = philox((who, self.tick, self.calls, 0), (self.streams.seed % 2**64, self.purpose))[0]
+        self.calls += 1
+        return out
+
+    def random(self, size=None, agents=None):
+        """Floats in [0, 1)."""
+        return (self.bits(agents, size) >> np.uint64(11)) * 2.0**-53
+
+    def integers(self, low, high, size=None, agents=None):
+        """Integers in [low, high), high - low below 2**32."""
+        span = np.uint64(high - low)
+        return low + (((self.bits(agents, size) >> _32) * span) >> _32).astype(np.int64)
@@ -0,0 +1,411 @@
+"""Run a BehaviorSpace experiment of herds.nlogo on all cores, resumable.
+
+Every finished run is appended to a ledger (json lines). Running the same
+command again after a crash only runs the (parameter cell, seed) pairs that are
+not in the ledger yet.
+
+    python -m herdsim.sweep bot-speed --ledger bot-speed.jsonl --table bot-speed-table.csv
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+
+import numpy as np
+
+from .adaptive import Stopping, run_adaptive, summary
+from .aggregate import MAX_TICKS, TICKS, Aggregator, follow
+from .batch import BatchModel
+from .checkpoint import Checkpoints
+from .experiments import read_experiments
+from .model import Model
+from .monitor import Monitor, RobotStuck
+from .params import Params
+from .profiling import Profiler
+from .reporters import condition, reporter
+from .trajectory import Recording
+
+
+def run_job(experiment, job, params=None, profile=False, recording=None, checkpoints=None, monitor=None, **options):
+    """Run one job, reporting the ledger record with the metrics of the run.
+
+    `options` are passed on to Model (neighbor index, visibility method).
+    With `profile` the record has the Profiler summary of the run, which
+    Ledger.append stores in the profile file of the ledger. With a
+    `recording` (herdsim.trajectory) the trajectory of the run is recorded.
+    With `checkpoints` (herdsim.checkpoint) the run is saved every so many
+    ticks and continues from the last checkpoint of the same job (cell,
+    seed, parameters and options); the trajectory of a resumed run starts at
+    the checkpoint. A `monitor` (herdsim.monitor) ends the run once it is
+    stalled, tagging the record.
+    """
+    params = (params or Params()).with_netlogo(job.cell)
+    metrics = [(name, reporter(name)) for name in experiment.metrics]
+    stop = condition(experiment.exit_condition)
+    profiler = Profiler() if profile else None
+    owner = _owner([job], params, options) if checkpoints else None
+    resumed = checkpoints.load(job.run_number, profiler, owner) if checkpoints else None
+    if resumed:
+        model, rows = resumed
+    else:
+        model = Model(params, seed=job.seed, profiler=profiler, **options)
+    writer = recording.writer(job.run_number, params.population, _trajectory_meta(job, model)) if recording else None
+
+    def measure():
+        return {"[step]": model.ticks, **{name: _plain(f(model)) for name, f in metrics}}
+
+    if not resumed:
+        rows = [measure()] if experiment.run_metrics_every_step else []
+    if writer:
+        writer.record(model)
+    watch = monitor.watch() if monitor else None
+    while not stop(model) and not (experiment.time_limit and model.ticks >= experiment.time_limit):
+        model.go()
+        if experiment.run_metrics_every_step:
+            rows.append(measure())
+        if writer:
+            writer.record(model)
+        if checkpoints and checkpoints.due(model.ticks):
+            checkpoints.save(job.run_number, model, rows, owner)
+        if watch and watch.update(model) and not monitor.validate:
+            break
+    if not experiment.run_metrics_every_step:
+        rows.append(measure())
+    if writer:
+        writer.record(model, force=True)
+        writer.close()
+    record = {
+        "experiment": job.experiment,
+        "run": job.run_number,
+        "values": job.cell,
+        "repetition": job.repetition,
+        "seed": job.seed,
+        "rows": rows,
+    }
+    if watch and watch.stalled:
+        record["stalled"] = {**watch.stalled, "horizon": experiment.time_limit or MAX_TICKS}
+    if profiler is not None:
+        record["profile"] = profiler.summary()
+    if checkpoints:
+        checkpoints.discard(job.run_number, owner)
+    return record
+
+
+def run_cell(experiment, jobs, params=None, profile=False, recording=None, checkpoints=None, monitor=None,
+             **options):
+    """Run jobs of one parameter cell together in a BatchModel, reporting their records in order.
+
+    The records are the same as those of run_job for every job. With
+    `profile` the batch is profiled as a whole, its summary goes with the
+    first record. A `recording` records the trajectory of every job, and
+    `checkpoints` save the batch as a whole, under the first run number.
+    A `monitor` watches every replicate on its own.
+    """
+    params = (params or Params()).with_netlogo(jobs[0].cell)
+    metrics = [(name, reporter(name)) for name in experiment.metrics]
+    stop = condition(experiment.exit_condition)
+    profiler = Profiler() if profile else None
+    owner = _owner(jobs, params, options) if checkpoints else None
+    resumed = checkpoints.load(jobs[0].run_number, profiler, owner) if checkpoints else None
+    if resumed:
+        batch, rows = resumed
+    else:
+        batch = BatchModel(params, seeds=[job.seed for job in jobs], profiler=profiler, **options)
+        rows = [[] for _ in jobs]
+    writers = [None] * len(jobs)
+    if recording:
+        for i in batch.replicates:
+            job = jobs[i]
+            writers[i] = recording.writer(job.run_number, params.population, _trajectory_meta(job, batch))
+
+    watches = [monitor.watch() if monitor else None for _ in jobs]
+
+    def measure(row):
+        model = batch.replicate(row)
+        rows[batch.replicates[row]].append(
+            {"[step]": model.ticks, **{name: _plain(f(model)) for name, f in metrics}}
+        )
+
+    while batch.size:
+        if experiment.run_metrics_every_step:
+            for row in range(batch.size):
+                measure(row)
+        done = [
+            stop(batch.replicate(row)) or bool(experiment.time_limit and batch.ticks >= experiment.time_limit)
+            or _ended(watches[batch.replicates[row]])
+            for row in range(batch.size)
+        ]
+        if not experiment.run_metrics_every_step:
+            for row in np.flatnonzero(done):
+                measure(row)
+        if recording:
+            for row in range(batch.size):
+                writer = writers[batch.replicates[row]]
+                writer.record(batch.replicate(row), force=done[row])
+                if done[row]:
+                    writer.close()
+        batch.retire(done)
+        if batch.size:
+            batch.go()
+            if checkpoints and checkpoints.due(batch.ticks):
+                checkpoints.save(jobs[0].run_number, batch, rows, owner)
+            if monitor:
+                for row in range(batch.size):
+                    watches[batch.replicates[row]].update(batch.replicate(row))
+    records = [
+        {
+            "experiment": job.experiment,
+            "run": job.run_number,
+            "values": job.cell,
+            "repetition": job.repetition,
+            "seed": job.seed,
+            "rows": rows[i],
+        }
+        for i, job in enumerate(jobs)
+    ]
+    for record, watch in zip(records, watches):
+        if watch and watch.stalled:
+            record["stalled"] = {**watch.stalled, "horizon": experiment.time_limit or MAX_TICKS}
+    if profiler is not None:
+        records[0]["profile"] = {**profiler.summary(), "replicates": len(jobs)}
+    if checkpoints:
+        checkpoints.discard(jobs[0].run_number, owner)
+    return records
+
+
+def _owner(jobs, params, options):
+    # what a checkpoint must match to be resumed by these jobs
+    return {
+        "experiment": jobs[0].experiment,
+        "values": jobs[0].cell,
+        "seeds": [job.seed for job in jobs],
+        "params": asdict(params),
+        "options": options,
+    }
+
+
+def _ended(watch):
+    return bool(watch and watch.stalled and not watch.monitor.validate)
+
+
+def _trajectory_meta(job, model):
+    meta = {"experiment": job.experiment, "run": job.run_number, "values": job.cell, "seed": job.seed}
+    if model.ticks:
+        meta["resumed_at"] = model.ticks
+    return meta
+
+
+def _plain(value):
+    # numpy scalars are not json serializable
+    return value.item() if hasattr(value, "item") else value
+
+
+def job_key(values, seed):
+    return json.dumps(values, sort_keys=True), seed
+
+
+class Ledger:
+    """Append-only json lines file of finished runs.
+
+    Profiles of the runs (herdsim.profiling) go to <ledger>-profile.jsonl.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def profile_path(self):
+        return os.path.splitext(self.path)[0] + "-profile.jsonl"
+
+    def load(self):
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                # the last line of a crashed sweep is cut short, drop it
+                f.truncate(data.rfind(b"\n") + 1)
+                data = data[: data.rfind(b"\n") + 1]
+        for line in data.decode("utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[job_key(record["values"], record["seed"])] = record
+        return records
+
+    def append(self, record):
+        if "profile" in record:
+            record = dict(record)
+            profile = record.pop("profile")
+            line = {key: record[key] for key in ("experiment", "run", "values", "seed")}
+            with open(self.profile_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({**line, "profile": profile}) + "\n")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def run_sweep(experiment, ledger, processes=None, base_seed=0, params=None, progress=None, on_record=None,
+              batch=False, **options):
+    """Run the jobs of an experiment that are missing in the ledger.
+
+    With `batch` the missing repetitions of a cell run together in one
+    BatchModel (see run_cell) instead of one process task per run.
+    `on_record` is called with every new record as soon as it is in the ledger.
+    Returns all records of the experiment, sorted by run number.
+    """
+    done = ledger.load()
+    jobs = [job for job in experiment.jobs(base_seed) if job_key(job.cell, job.seed) not in done]
+    if jobs:
+        with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+            if batch:
+                cells = {}
+                for job in jobs:
+                    cells.setdefault(job.values, []).append(job)
+                futures = [pool.submit(run_cell, experiment, cell, params, **options) for cell in cells.values()]
+            else:
+                futures = [pool.submit(run_job, experiment, job, params, **options) for job in jobs]
+            n = 0
+            for future in as_completed(futures):
+                result = future.result()
+                for record in result if batch else [result]:
+                    n += 1
+                    ledger.append(record)
+                    done[job_key(record["values"], record["seed"])] = record
+                    if on_record:
+                        on_record(record)
+                    if progress:
+                        progress(n, len(jobs))
+    wanted = {job_key(job.cell, job.seed) for job in experiment.jobs(base_seed)}
+    return sorted((r for k, r in done.items() if k in wanted), key=lambda r: r["run"])
+
+
+def write_table(records, experiment, path, model_file="herds.nlogo", params=None):
+    """Write records in the BehaviorSpace table format (csv).
+
+    A run ended by its stall monitor is a failure: its last row reports the
+    time limit it would have run to as `ticks`, as in the ledger statistics.
+    """
+    p = params or Params()
+    variables = [name for name, _ in experiment.value_sets]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["BehaviorSpace results (herdsim)", "Table version 2.0"])
+        w.writerow([model_file])
+        w.writerow([experiment.name])
+        w.writerow([datetime.datetime.now().strftime("%m/%d/%Y %H:%M:%S:%f")[:-3]])
+        w.writerow(["min-pxcor", "max-pxcor", "min-pycor", "max-pycor"])
+        w.writerow([p.min_pxcor, p.max_pxcor, p.min_pycor, p.max_pycor])
+        w.writerow(["[run number]", *variables, "[step]", *experiment.metrics])
+        for record in records:
+            cell = [_netlogo(record["values"][name]) for name in variables]
+            rows = record["rows"]
+            stalled = record.get("stalled")
+            if stalled and not stalled.get("validated") and TICKS in experiment.metrics:
+                rows = [*rows[:-1], {**rows[-1], TICKS: stalled["horizon"]}]
+            for row in rows:
+                w.writerow([record["run"], *cell, row["[step]"], *(row[m] for m in experiment.metrics)])
+
+
+def _netlogo(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return f'"{value}"'
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("experiment", nargs="?", help="name of the experiment in the model file")
+    parser.add_argument("--model", default="herds.nlogo", help="NetLogo model file with the experiments")
+    parser.add_argument("--ledger", help="ledger of finished runs, default <experiment>.jsonl")
+    parser.add_argument("--table", help="also write the results as a BehaviorSpace table csv")
+    parser.add_argument("--processes", type=int, help="worker processes, default all cores")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first repetition")
+    parser.add_argument("--batch", action="store_true", help="run the repetitions of a cell together (herdsim.batch)")
+    parser.add_argument("--profile", action="store_true", help="time the phases of every run, see herdsim.profiling")
+    parser.add_argument("--trajectories", help="record the trajectory of every run in this directory")
+    parser.add_argument("--every", type=int, default=1, help="with --trajectories, record every n-th tick")
+    parser.add_argument("--quantize", action="store_true", help="with --trajectories, store positions as int16")
+    parser.add_argument("--checkpoints", help="save running runs in this directory, a restarted sweep resumes them")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="ticks between checkpoints")
+    parser.add_argument("--stall", action="store_true", help="end stalled runs early, see herdsim.monitor")
+    parser.add_argument("--stall-validate", action="store_true", help="only tag stalled runs, run them to the end")
+    parser.add_argument("--stall-robot-stuck", action="store_true",
+                        help="with --stall, also require the robot to be stuck (RobotStuck, not a default rule)")
+    parser.add_argument("--streams", action="store_true",
+                        help="counter-based random streams (herdsim.streams), default ledger <experiment>-streams.jsonl")
+    parser.add_argument("--live", help="keep a json snapshot of the statistics per cell up to date while running")
+    parser.add_argument("--list", action="store_true", help="list the experiments and their number of runs")
+    adaptive = parser.add_argument_group("adaptive replication (herdsim.adaptive)")
+    adaptive.add_argument("--adaptive", action="store_true", help="run repetitions of a cell until its intervals are narrow")
+    adaptive.add_argument("--min-repetitions", type=int, default=Stopping.min_repetitions)
+    adaptive.add_argument("--max-repetitions", type=int, help="default the repetitions of the experiment")
+    adaptive.add_argument("--success-width", type=float, default=Stopping.success_width,
+                          help="width of the 95%% interval of the success rate")
+    adaptive.add_argument("--ticks-width", type=float, default=Stopping.ticks_width,
+                          help="width of the 95%% interval of the mean ticks, relative to the mean")
+    args = parser.parse_args(argv)
+    if args.adaptive and args.batch:
+        parser.error("--batch does not work with --adaptive, which adds the repetitions of a cell one at a time")
+    experiments = read_experiments(args.model)
+    if args.list or not args.experiment:
+        for name, experiment in experiments.items():
+            print(f"{name}: {len(experiment.cells())} cells x {experiment.repetitions} repetitions")
+        return 0
+    experiment = experiments[args.experiment]
+    # runs with streams differ from runs with the same seed without, they do not share a ledger
+    ledger = Ledger(args.ledger or f"{experiment.name}{'-streams' if args.streams else ''}.jsonl")
+
+    def progress(n, total):
+        print(f"\r{experiment.name}: {n}/{total or '?'} runs", end="", file=sys.stderr, flush=True)
+
+    recording = Recording(args.trajectories, args.every, args.quantize) if args.trajectories else None
+    checkpoints = Checkpoints(args.checkpoints, args.checkpoint_every) if args.checkpoints else None
+    rules = Monitor.rules + ((RobotStuck(),) if args.stall_robot_stuck else ())
+    monitor = Monitor(rules, validate=args.stall_validate) if args.stall or args.stall_validate else None
+    on_record = None
+    if args.live:
+        aggregator = follow(ledger.path, Aggregator())
+        aggregator.write_snapshot(args.live)
+
+        def on_record(record):
+            aggregator.add(record)
+            aggregator.write_snapshot(args.live)
+
+    if args.adaptive:
+        stopping = Stopping(
+            args.min_repetitions,
+            args.max_repetitions or experiment.repetitions,
+            args.success_width,
+            args.ticks_width,
+        )
+        records, stats = run_adaptive(
+            experiment, ledger, stopping, args.processes, args.seed, progress=progress, on_record=on_record,
+            profile=args.profile, recording=recording, checkpoints=checkpoints, monitor=monitor,
+            streams=args.streams,
+        )
+        print(file=sys.stderr)
+        print(summary(experiment, stats, stopping), file=sys.stderr)
+    else:
+        records = run_sweep(
+            experiment, ledger, args.processes, args.seed, progress=progress, on_record=on_record, batch=args.batch,
+            profile=args.profile, recording=recording, checkpoints=checkpoints, monitor=monitor,
+            streams=args.streams,
+        )
+        print(file=sys.stderr)
+    if args.table:
+        write_table(records, experiment, args.table, model_file=os.path.basename(args.model))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
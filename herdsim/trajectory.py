@@ -0,0 +1,207 @@
+"""Per-tick trajectories of herdanimals and robot in memory-mapped binary columns.
+
+Every-step BehaviorSpace output is too large for spreadsheets, so a run is
+recorded into a directory of raw column files, one per variable, that grow
+in preallocated chunks of ticks and are memory-mapped for writing and
+reading:
+
+    run-12/meta.json        population, columns, dtypes, scales, recorded rows
+    run-12/tick.bin         (rows,) int32
+    run-12/xcor.bin         (rows, population) float32, or int16 when quantised
+    run-12/alive.bin        (rows, ceil(population / 8)) packed bits
+    run-12/bot_x.bin        (rows,) float32
+    ...
+
+Only every `every`-th tick is kept, plus the last one. With `quantize`
+positions and dLCM are stored as int16 in steps of 1/256 patch, heading and
+speed as uint16, which halves the files. Readers slice one run or a tick
+window without loading the rest.
+
+    python -m herdsim.sweep bot-speed --trajectories bot-speed-trajectories --every 10
+    herdsim.trajectory.Trajectory("bot-speed-trajectories/run-12").window(500, 600)
+"""
+import json
+import math
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+# column -> (quantised dtype, step), the float32 columns are not quantised
+ANIMAL_COLUMNS = {
+    "xcor": (np.int16, 1 / 256),
+    "ycor": (np.int16, 1 / 256),
+    "heading": (np.uint16, 360 / 65536),
+    "speed": (np.uint16, 1 / 4096),
+    "dLCM": (np.uint16, 1 / 256),
+}
+ROBOT_COLUMNS = ("bot_x", "bot_y", "bot_heading", "distance_traveled", "LCMx", "LCMy")
+MASK_COLUMNS = ("alive", "visibles")
+
+
+@dataclass(frozen=True)
+class Recording:
+    """Where and how herdsim.sweep records the trajectories of its runs."""
+
+    path: str
+    every: int = 1
+    quantize: bool = False
+    chunk: int = 1024
+
+    def writer(self, run, population, meta=None):
+        return TrajectoryWriter(
+            os.path.join(self.path, f"run-{run}"), population, self.every, self.quantize, self.chunk, meta
+        )
+
+
+class _Column:
+    # a raw file of fixed size rows, grown by `chunk` rows and memory-mapped
+    def __init__(self, path, dtype, shape, chunk):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.shape = shape
+        self.chunk = chunk
+        self.row_bytes = self.dtype.itemsize * math.prod(shape)
+        self.file = open(path, "w+b")
+        self.capacity = 0
+        self.array = None
+
+    def grow(self):
+        self.capacity += self.chunk
+        self.file.truncate(self.capacity * self.row_bytes)
+        self.array = np.memmap(self.file, dtype=self.dtype, mode="r+", shape=(self.capacity, *self.shape))
+
+    def close(self, rows):
+        if self.array is not None:
+            self.array.flush()
+            self.array = None
+        self.file.truncate(rows * self.row_bytes)
+        self.file.close()
+
+
+class TrajectoryWriter:
+    """Record the state of a model (Model, or a replicate of BatchModel) every `every` ticks."""
+
+    def __init__(self, path, population, every=1, quantize=False, chunk=1024, meta=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.population = population
+        self.every = every
+        self.quantize = quantize
+        self.rows = 0
+        self.last_tick = None
+        self.meta = {
+            "population": population,
+            "every": every,
+            "quantize": quantize,
+            "columns": {},
+            **(meta or {}),
+        }
+        self.columns = {}
+
+        def add(name, dtype, shape, scale=None):
+            self.columns[name] = _Column(os.path.join(path, f"{name}.bin"), dtype, shape, chunk)
+            self.meta["columns"][name] = {"dtype": np.dtype(dtype).str, "shape": list(shape), "scale": scale}
+
+        add("tick", np.int32, ())
+        for name, (dtype, step) in ANIMAL_COLUMNS.items():
+            add(name, dtype if quantize else np.float32, (population,), step if quantize else None)
+        for name in MASK_COLUMNS:
+            add(name, np.uint8, ((population + 7) // 8,))
+        for name in ROBOT_COLUMNS:
+            add(name, np.float32, ())
+
+    def record(self, model, force=False):
+        """Record the current tick if it is one of every `every` ticks (or `force`)."""
+        if not force and model.ticks % self.every:
+            return False
+        if model.ticks == self.last_tick:
+            return False
+        if self.rows == self.columns["tick"].capacity:
+            for column in self.columns.values():
+                column.grow()
+            self._write_meta()
+        row = self.rows
+        self.columns["tick"].array[row] = model.ticks
+        for name, (dtype, step) in ANIMAL_COLUMNS.items():
+            values = getattr(model, name)
+            if self.quantize:
+                info = np.iinfo(dtype)
+                values = np.clip(np.round(values / step), info.min, info.max)
+            self.columns[name].array[row] = values
+        for name in MASK_COLUMNS:
+            self.columns[name].array[row] = np.packbits(getattr(model, name))
+        for name in ROBOT_COLUMNS:
+            self.columns[name].array[row] = getattr(model, name)
+        self.rows += 1
+        self.last_tick = model.ticks
+        return True
+
+    def close(self):
+        for column in self.columns.values():
+            column.close(self.rows)
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, "meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump({**self.meta, "rows": self.rows}, f, indent=1)
+        os.replace(os.path.join(self.path, "meta.json.tmp"), os.path.join(self.path, "meta.json"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Trajectory:
+    """A recorded run, its columns memory-mapped read-only."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.population = self.meta["population"]
+        self.rows = self.meta["rows"]
+        self.ticks = self._raw("tick")
+
+    def _raw(self, name):
+        column = self.meta["columns"][name]
+        if not self.rows:
+            return np.zeros((0, *column["shape"]), dtype=column["dtype"])
+        return np.memmap(
+            os.path.join(self.path, f"{name}.bin"), dtype=column["dtype"], mode="r",
+            shape=(self.rows, *column["shape"]),
+        )
+
+    def rows_of(self, start=None, stop=None):
+        """Slice of the recorded rows with start <= tick < stop."""
+        first = 0 if start is None else int(np.searchsorted(self.ticks, start))
+        last = self.rows if stop is None else int(np.searchsorted(self.ticks, stop))
+        return slice(first, last)
+
+    def column(self, name, start=None, stop=None):
+        """A column over the ticks [start, stop), as floats (masks as booleans)."""
+        rows = self.rows_of(start, stop)
+        raw = self._raw(name)[rows]
+        if name in MASK_COLUMNS:
+            return np.unpackbits(raw, axis=-1, count=self.population).astype(bool)
+        scale = self.meta["columns"][name]["scale"]
+        return raw * scale if scale is not None else np.asarray(raw, dtype=float)
+
+    def window(self, start=None, stop=None):
+        """Every column over the ticks [start, stop), {name: array}."""
+        return {name: self.column(name, start, stop) for name in self.meta["columns"]}
+
+
+def runs(path):
+    """Run numbers recorded in a directory of a sweep, ascending."""
+    found = []
+    for name in os.listdir(path):
+        if name.startswith("run-") and os.path.exists(os.path.join(path, name, "meta.json")):
+            found.append(int(name[4:]))
+    return sorted(found)
+
+
+def open_run(path, run):
+    return Trajectory(os.path.join(path, f"run-{run}"))
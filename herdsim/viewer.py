@@ -0,0 +1,410 @@
+"""Watch a headless run live: an asyncio server streams decimated, delta encoded frames.
+
+The simulation never waits for a viewer. After a tick it hands the model to
+a Publisher, which does nothing without a client or between the `every`
+ticks, and otherwise builds a new quantised frame (the back buffer) and
+makes it the front frame with one reference assignment, no lock. A server
+thread runs an asyncio loop that sends the front frame to every client at
+most `fps` times per second. A frame is encoded against the last one sent
+to that client (positions in 1/16 patch as int8 steps, heading in 1/256
+turns), with a full key frame every `keyframe` frames and whenever a step
+does not fit. A client that does not keep up skips frames; nothing queues
+up behind it.
+
+    python -m herdsim.viewer run --population 500 --socket /tmp/herd.sock --port 8765
+    python -m herdsim.viewer watch /tmp/herd.sock
+
+Clients of the Unix socket get frames prefixed by their length as uint32.
+The TCP port speaks WebSocket (binary frames) and serves a canvas viewer at
+http://127.0.0.1:8765/. `python -m herdsim.benchmarks.viewer` measures the
+ticks per second with and without a client.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from .model import Model
+from .params import Params
+
+SCALE = 16  # positions in 1/SCALE patch
+HEADER = struct.Struct("<4sBIII3f")  # magic, kind, tick, frame, population, bot x, bot y, bot heading
+MAGIC = b"HERD"
+KEY, DELTA = 0, 1
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+@dataclass(frozen=True)
+class Frame:
+    tick: int
+    number: int
+    x: np.ndarray  # int16, 1/SCALE patch
+    y: np.ndarray
+    heading: np.ndarray  # uint8, 1/256 turn
+    alive: np.ndarray  # bool
+    bot: tuple  # (x, y, heading) in patches and degrees
+
+
+def snapshot(model, number):
+    """The frame of a model (Model, or a replicate of BatchModel) after a tick."""
+    return Frame(
+        tick=int(model.ticks),
+        number=number,
+        x=np.round(model.xcor * SCALE).astype(np.int16),
+        y=np.round(model.ycor * SCALE).astype(np.int16),
+        heading=(np.round(model.heading * (256 / 360)).astype(np.int64) % 256).astype(np.uint8),
+        alive=model.alive.copy(),
+        bot=(float(model.bot_x), float(model.bot_y), float(model.bot_heading)),
+    )
+
+
+def encode(frame, previous=None):
+    """Bytes of a frame, as steps from `previous` when they fit in int8."""
+    n = frame.x.size
+    kind = KEY
+    if previous is not None and previous.x.size == n:
+        dx = frame.x.astype(np.int32) - previous.x
+        dy = frame.y.astype(np.int32) - previous.y
+        if n == 0 or max(np.abs(dx).max(), np.abs(dy).max()) <= 127:
+            kind = DELTA
+    head = HEADER.pack(MAGIC, kind, frame.tick, frame.number, n, *frame.bot)
+    mask = np.packbits(frame.alive).tobytes()
+    if kind == DELTA:
+        dh = (frame.heading - previous.heading).astype(np.uint8)  # modulo a full turn
+        body = dx.astype(np.int8).tobytes() + dy.astype(np.int8).tobytes() + dh.tobytes()
+    else:
+        body = frame.x.tobytes() + frame.y.tobytes() + frame.heading.tobytes()
+    return head + mask + body
+
+
+def decode(data, previous=None):
+    """The Frame of encoded bytes; a delta frame needs the frame it was encoded against."""
+    magic, kind, tick, number, n, bot_x, bot_y, bot_heading = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a herdsim frame")
+    offset = HEADER.size
+    packed = (n + 7) // 8
+    alive = np.unpackbits(np.frombuffer(data, np.uint8, packed, offset), count=n).astype(bool)
+    offset += packed
+    if kind == DELTA:
+        if previous is None:
+            raise ValueError("a delta frame without the frame before it")
+        dx, dy = (np.frombuffer(data, np.int8, n, offset + i * n) for i in range(2))
+        x = (previous.x + dx).astype(np.int16)
+        y = (previous.y + dy).astype(np.int16)
+        heading = (previous.heading + np.frombuffer(data, np.uint8, n, offset + 2 * n)).astype(np.uint8)
+    else:
+        x, y = (np.frombuffer(data, np.int16, n, offset + i * 2 * n) for i in range(2))
+        heading = np.frombuffer(data, np.uint8, n, offset + 4 * n)
+    return Frame(tick, number, x, y, heading, alive, (bot_x, bot_y, bot_heading))
+
+
+class Publisher:
+    """The hand-over between the tick loop and the server: the latest frame, swapped in whole."""
+
+    def __init__(self, every=1):
+        self.every = every
+        self.front = None
+        self.clients = 0
+        self.published = 0
+
+    def publish(self, model, force=False):
+        """Call after every tick; builds a frame only when a client listens and the tick is due."""
+        if not self.clients or (model.ticks % self.every and not force):
+            return False
+        self.front = snapshot(model, self.published)
+        self.published += 1
+        return True
+
+
+class Server:
+    """An asyncio server of a Publisher in its own thread, on a Unix socket and/or a TCP port."""
+
+    def __init__(self, publisher, path=None, host="127.0.0.1", port=None, fps=30.0, keyframe=50,
+                 buffered=1 << 20):
+        if path is None and port is None:
+            raise ValueError("a Unix socket path or a TCP port is needed")
+        self.publisher = publisher
+        self.path = path
+        self.host = host
+        self.port = port
+        self.fps = fps
+        self.keyframe = keyframe
+        self.buffered = buffered  # bytes waiting for a client beyond which its frames are skipped
+        self.sent = 0
+        self.skipped = 0
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = None
+        self._clients = set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
+
+    async def _main(self):
+        self._stop = asyncio.Event()
+        servers = []
+        if self.path is not None:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            servers.append(await asyncio.start_unix_server(self._unix_client, self.path))
+        if self.port is not None:
+            server = await asyncio.start_server(self._tcp_client, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            servers.append(server)
+        self._ready.set()
+        await self._stop.wait()
+        for server in servers:
+            server.close()
+        # the streams end within a frame once stopped
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        for server in servers:
+            await server.wait_closed()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _stream(self, reader, writer, frame_bytes):
+        # send the front frame whenever it changed, at most fps times per second
+        publisher = self.publisher
+        publisher.clients += 1
+        task = asyncio.current_task()
+        self._clients.add(task)
+        closed = asyncio.Event()
+        watcher = asyncio.ensure_future(_until_eof(reader, closed))
+        last = None
+        sent = 0
+        try:
+            while not self._stop.is_set() and not closed.is_set():
+                frame = publisher.front
+                if frame is not None and (last is None or frame.number != last.number):
+                    if writer.transport.get_write_buffer_size() > self.buffered:
+                        self.skipped += 1
+                    else:
+                        writer.write(frame_bytes(encode(frame, last if sent % self.keyframe else None)))
+                        last = frame
+                        sent += 1
+                        self.sent += 1
+                        await writer.drain()
+                await asyncio.sleep(1 / self.fps)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            publisher.clients -= 1
+            self._clients.discard(task)
+            watcher.cancel()
+            writer.close()
+            await asyncio.gather(watcher, return_exceptions=True)
+
+    async def _unix_client(self, reader, writer):
+        await self._stream(reader, writer, lambda data: struct.pack("<I", len(data)) + data)
+
+    async def _tcp_client(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, OSError):
+            # gone before the end of the headers, or no http at all
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+        if headers.get("upgrade", "").lower() != "websocket":
+            await _reply(writer, "200 OK", "text/html; charset=utf-8", _PAGE.encode("utf-8"))
+            return
+        if "sec-websocket-key" not in headers:
+            await _reply(writer, "400 Bad Request", "text/plain", b"missing Sec-WebSocket-Key\n")
+            return
+        accept = base64.b64encode(hashlib.sha1(headers["sec-websocket-key"].encode("latin-1") + _WS_GUID).digest())
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        await self._stream(reader, writer, _ws_frame)
+
+
+async def _reply(writer, status, content_type, body):
+    # a plain http response, the connection closes after it
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode("ascii") + body
+    )
+    try:
+        await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    writer.close()
+
+
+async def _until_eof(reader, closed):
+    # what viewers send is not used, only the end of the connection
+    try:
+        while await reader.read(4096):
+            pass
+    except (ConnectionError, OSError):
+        pass
+    closed.set()
+
+
+def _ws_frame(data):
+    # a final binary WebSocket frame, unmasked as sent by servers
+    n = len(data)
+    if n < 126:
+        head = struct.pack("!BB", 0x82, n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", 0x82, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x82, 127, n)
+    return head + data
+
+
+def frames(path, timeout=10.0):
+    """Decoded frames from the Unix socket of a server, until it closes."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(path)
+    stream = sock.makefile("rb")
+    previous = None
+    try:
+        while True:
+            size = stream.read(4)
+            if len(size) < 4:
+                return
+            data = stream.read(struct.unpack("<I", size)[0])
+            previous = decode(data, previous)
+            yield previous, len(data)
+    finally:
+        stream.close()
+        sock.close()
+
+
+def run(model, publisher, ticks=None, max_ticks=10000):
+    """Run a model to its exit condition (or `ticks` ticks), publishing every tick."""
+    start = model.ticks
+    while not model.done(max_ticks) and (ticks is None or model.ticks - start < ticks):
+        model.go()
+        publisher.publish(model)
+    publisher.publish(model, force=True)
+
+
+_PAGE = """<!DOCTYPE html>
+<html><head><title>herdsim</title></head>
+<body style="margin:0;background:#6a4">
+<canvas id="c" width="648" height="648"></canvas><pre id="s" style="position:absolute;top:0;left:660px"></pre>
+<script>
+const H = 29, S = 16, W = 8, c = document.getElementById("c").getContext("2d");
+let x = null, y = null, h = null;
+const ws = new WebSocket("ws://" + location.host + "/");
+ws.binaryType = "arraybuffer";
+ws.onmessage = (e) => {
+  const v = new DataView(e.data), kind = v.getUint8(4), tick = v.getUint32(5, true), n = v.getUint32(13, true);
+  const bot = [v.getFloat32(17, true), v.getFloat32(21, true)];
+  const alive = new Uint8Array(e.data, H, (n + 7) >> 3);
+  let o = H + ((n + 7) >> 3);
+  if (kind === 0) {
+    x = new Int16Array(e.data.slice(o, o + 2 * n)); y = new Int16Array(e.data.slice(o + 2 * n, o + 4 * n));
+    h = new Uint8Array(e.data.slice(o + 4 * n, o + 5 * n));
+  } else {
+    const dx = new Int8Array(e.data, o, n), dy = new Int8Array(e.data, o + n, n), dh = new Uint8Array(e.data, o + 2 * n, n);
+    for (let i = 0; i < n; i++) { x[i] += dx[i]; y[i] += dy[i]; h[i] = (h[i] + dh[i]) & 255; }
+  }
+  c.fillStyle = "#6a4"; c.fillRect(0, 0, 648, 648);
+  c.fillStyle = "#fff";
+  for (let i = 0; i < n; i++) {
+    if (!(alive[i >> 3] & (128 >> (i & 7)))) continue;
+    c.fillRect((x[i] / S + 40.5) * W - 2, (40.5 - y[i] / S) * W - 2, 4, 4);
+  }
+  c.fillStyle = "#f33"; c.fillRect((bot[0] + 40.5) * W - 4, (40.5 - bot[1]) * W - 4, 8, 8);
+  document.getElementById("s").textContent = "tick " + tick;
+};
+</script></body></html>
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    r = commands.add_parser("run", help="run a headless model and serve its frames")
+    r.add_argument("--population", type=int, default=Params().population)
+    r.add_argument("--model-neighbor", default=Params().model_neighbor)
+    r.add_argument("--bot-speed-ratio", type=float, default=Params().bot_speed_ratio)
+    r.add_argument("--global-vision", action="store_true")
+    r.add_argument("--seed", type=int)
+    r.add_argument("--ticks", type=int, help="stop after this many ticks, default at the exit condition")
+    r.add_argument("--socket", help="Unix socket path")
+    r.add_argument("--port", type=int, help="TCP port of the WebSocket and the canvas viewer")
+    r.add_argument("--every", type=int, default=1, help="publish every n-th tick")
+    r.add_argument("--fps", type=float, default=30.0, help="frames per second sent to a client at most")
+    r.add_argument("--wait", action="store_true", help="start the run once a client is attached")
+    w = commands.add_parser("watch", help="print what a Unix socket client receives")
+    w.add_argument("socket")
+    w.add_argument("--delay", type=float, default=0.0, help="seconds between reads, a viewer that lags behind")
+    args = parser.parse_args(argv)
+
+    if args.command == "watch":
+        start, count, size = time.perf_counter(), 0, 0
+        for frame, n in frames(args.socket):
+            time.sleep(args.delay)
+            count += 1
+            size += n
+            alive = int(frame.alive.sum())
+            print(f"\rtick {frame.tick}: {alive} herdanimals, {count} frames, {size / count:.0f} bytes per frame",
+                  end="", flush=True)
+        seconds = time.perf_counter() - start
+        print(f"\n{count} frames in {seconds:.1f} s")
+        return 0
+
+    params = Params(
+        population=args.population, model_neighbor=args.model_neighbor, bot_speed_ratio=args.bot_speed_ratio,
+        global_vision=args.global_vision,
+    )
+    model = Model(params, seed=args.seed)
+    publisher = Publisher(args.every)
+    with Server(publisher, args.socket, port=args.port, fps=args.fps) as server:
+        if args.port is not None:
+            print(f"viewer at http://127.0.0.1:{server.port}/", file=sys.stderr)
+        while args.wait and not publisher.clients:
+            time.sleep(0.1)
+        start = time.perf_counter()
+        run(model, publisher, args.ticks)
+        seconds = time.perf_counter() - start
+        # let the clients get the last frame
+        time.sleep(2 / args.fps)
+    print(
+        f"{model.ticks} ticks in {seconds:.1f} s ({model.ticks / seconds:.0f}/s), "
+        f"{server.sent} frames sent, {server.skipped} skipped", file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
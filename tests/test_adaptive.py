@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+import pytest
+
+from herdsim.adaptive import Stopping
+from herdsim.aggregate import CellStats, Welford
+
+
+def welford(values):
+    w = Welford()
+    for value in values:
+        w.add(value)
+    return w
+
+
+def cell(ticks, max_ticks=10000):
+    stats = CellStats()
+    for t in ticks:
+        stats.add(t, 1.0, max_ticks)
+    return stats
+
+
+def test_welford_matches_the_batch_mean_and_variance():
+    values = np.random.default_rng(0).normal(3000, 800, 101)
+    w = welford(values)
+    assert w.count == 101
+    assert w.mean == pytest.approx(values.mean())
+    assert w.variance == pytest.approx(values.var(ddof=1))
+
+
+@pytest.mark.parametrize("split", [0, 1, 37, 100])
+def test_merged_welfords_match_the_batch(split):
+    values = np.random.default_rng(1).exponential(2000, 100)
+    merged = welford(values[:split]).merge(welford(values[split:]))
+    assert merged.count == 100
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.variance == pytest.approx(values.var(ddof=1))
+
+
+def test_welford_variance_needs_two_values():
+    assert math.isnan(welford([]).variance)
+    assert math.isnan(welford([5.0]).variance)
+    assert welford([5.0, 5.0]).variance == 0
+
+
+@pytest.mark.parametrize("n", [1, 10, 30])
+def test_wilson_interval_at_the_ends(n):
+    never, always = cell([10000] * n), cell([500] * n)
+    low, high = never.success_interval()
+    assert low == pytest.approx(0, abs=1e-12) and 0 < high < 1
+    low, high = always.success_interval()
+    assert 0 < low < 1 and high == pytest.approx(1, abs=1e-12)
+    # the same width at both ends
+    assert high - low == pytest.approx(never.success_interval()[1] - never.success_interval()[0])
+
+
+def test_wilson_interval_contains_the_rate():
+    stats = cell([500] * 7 + [10000] * 13)
+    low, high = stats.success_interval()
+    assert low < stats.success_rate == 0.35 < high
+    assert CellStats().success_interval() == (0.0, 1.0)
+
+
+def test_cells_that_never_succeed_stop_at_the_minimum():
+    stopping = Stopping(min_repetitions=10, max_repetitions=30)
+    assert not stopping.converged(cell([10000] * 9))
+    assert stopping.converged(cell([10000] * 10))
+
+
+def test_cells_that_always_succeed_stop_once_the_ticks_are_precise():
+    stopping = Stopping(min_repetitions=10, max_repetitions=30)
+    spread = [800, 2500, 1200, 4000, 900, 3100, 1500, 600, 2200, 5000]
+    assert cell(spread).success_rate == 1
+    assert not stopping.converged(cell(spread))
+    tight = [2000, 2100, 1900, 2050, 1950, 2000, 2020, 1980, 2010, 1990]
+    assert stopping.converged(cell(tight))
+
+
+def test_stopping_bounds():
+    stopping = Stopping(min_repetitions=10, max_repetitions=12)
+    assert not stopping.converged(None)
+    # half of the runs succeed: the success interval stays wide, only the maximum stops it
+    mixed = [1000, 10000] * 5
+    assert not stopping.converged(cell(mixed))
+    assert stopping.converged(cell(mixed + [1000, 10000]))
+
+
+def test_adaptive_sweep_stops_converged_cells(tmp_path):
+    from herdsim.adaptive import run_adaptive
+    from herdsim.experiments import parse_experiments
+    from herdsim.sweep import Ledger
+
+    experiment = parse_experiments("""<experiments>
+      <experiment name="tiny" repetitions="2" runMetricsEveryStep="false">
+        <timeLimit steps="20"/>
+        <exitCondition>not any? herdanimals or ticks = 20</exitCondition>
+        <metric>ticks</metric>
+        <metric>[distance-traveled] of robots</metric>
+        <enumeratedValueSet variable="population">
+          <value value="10"/>
+          <value value="12"/>
+        </enumeratedValueSet>
+      </experiment>
+    </experiments>""")["tiny"]
+    # with 3 runs a success rate of 1 has a Wilson interval about 0.56 wide
+    stopping = Stopping(min_repetitions=3, max_repetitions=6, success_width=0.6)
+    ledger = Ledger(str(tmp_path / "tiny.jsonl"))
+    records, aggregator = run_adaptive(experiment, ledger, stopping, processes=1)
+    # every run ends at the time limit, the ticks interval has no width
+    assert [stats.runs for stats in aggregator.cells.values()] == [3, 3]
+    assert sorted(r["run"] for r in records) == sorted(
+        experiment.run_number(index, rep) for index in range(2) for rep in range(3)
+    )
+    assert run_adaptive(experiment, ledger, stopping, processes=1)[1].runs == 6
@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from herdsim.aggregate import Aggregator, follow, read_snapshot
+from herdsim.analysis import oat_stats
+from herdsim.experiments import parse_experiments
+from herdsim.sweep import Ledger, run_sweep
+
+XML = """<experiments>
+  <experiment name="tiny" repetitions="3" runMetricsEveryStep="false">
+    <setup>setup</setup>
+    <go>go</go>
+    <timeLimit steps="30"/>
+    <exitCondition>not any? herdanimals or ticks = 30</exitCondition>
+    <metric>ticks</metric>
+    <metric>[distance-traveled] of robots</metric>
+    <enumeratedValueSet variable="bot-speed-ratio">
+      <value value="2"/>
+      <value value="6"/>
+    </enumeratedValueSet>
+    <enumeratedValueSet variable="population">
+      <value value="10"/>
+    </enumeratedValueSet>
+  </experiment>
+</experiments>"""
+
+STATS = ["runs", "successes", "distance_mean", "distance_std", "ticks_mean", "ticks_std", "success_rate"]
+
+
+def records(seed=0, runs=40):
+    # runs of two cells, some at the time limit, one ended by its stall monitor
+    rng = np.random.default_rng(seed)
+    out = []
+    for run in range(runs):
+        ticks = int(rng.integers(500, 9000)) if rng.random() < 0.7 else 10000
+        record = {
+            "experiment": "tiny", "run": run + 1, "values": {"bot-speed-ratio": [2, 6][run % 2]}, "seed": run // 2,
+            "rows": [{"[step]": ticks, "ticks": ticks, "[distance-traveled] of robots": float(rng.uniform(10, 90))}],
+        }
+        if run == 5:
+            record["stalled"] = {"tick": 5050, "reason": "no delivery", "horizon": 10000}
+        out.append(record)
+    return out
+
+
+def assert_same_rows(rows, expected):
+    assert len(rows) == len(expected)
+    for row, other in zip(rows, expected):
+        for name in STATS:
+            assert row[name] == pytest.approx(other[name], nan_ok=True), name
+
+
+def test_streaming_a_sweep_gives_the_statistics_of_its_ledger(tmp_path):
+    experiment = parse_experiments(XML)["tiny"]
+    ledger = Ledger(str(tmp_path / "tiny.jsonl"))
+    streamed = Aggregator()
+    snapshots = []
+
+    def on_record(record):
+        streamed.add(record)
+        streamed.write_snapshot(str(tmp_path / "live.json"))
+        snapshots.append(streamed.runs)
+
+    run_sweep(experiment, ledger, processes=1, on_record=on_record)
+    assert snapshots == [1, 2, 3, 4, 5, 6]
+    afterwards = follow(ledger.path, Aggregator())
+    assert_same_rows(streamed.rows(), afterwards.rows())
+    live = read_snapshot(str(tmp_path / "live.json"))
+    assert_same_rows(live.to_dict("records"), afterwards.rows())
+
+
+def test_aggregator_matches_oat_stats():
+    aggregator = Aggregator()
+    for record in records():
+        aggregator.add(record)
+    df = pd.DataFrame([
+        {
+            "bot-speed-ratio": r["values"]["bot-speed-ratio"],
+            "ticks": r["rows"][-1]["ticks"],
+            "distance-traveled of robots": r["rows"][-1]["[distance-traveled] of robots"],
+            "stalled": "stalled" in r,
+        }
+        for r in records()
+    ])
+    expected = oat_stats(df, "bot-speed-ratio").to_dict("records")
+    assert_same_rows(aggregator.rows(), expected)
+
+
+def test_follow_reads_only_complete_lines(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    first, second = (json.dumps(record) + "\n" for record in records(runs=2))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(first + second[:20])
+    aggregator = Aggregator()
+    seen = []
+
+    def stop():
+        # the second record is finished while the ledger is followed
+        seen.append(aggregator.runs)
+        if len(seen) == 1:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(second[20:])
+        return len(seen) == 2
+
+    follow(path, aggregator, poll=0.0, stop=stop)
+    assert seen == [1, 2]
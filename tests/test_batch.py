@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from herdsim.batch import BatchModel
+from herdsim.model import Model
+from herdsim.params import Params
+
+MODELS = ("1 Metric neighbor", "2 Topological neighbor", "3 Long-range neighbor")
+
+
+@pytest.mark.parametrize("model_neighbor", MODELS)
+def test_replicates_run_like_models(model_neighbor):
+    params = Params(population=20, model_neighbor=model_neighbor)
+    results = BatchModel(params, seeds=range(3)).run(max_ticks=300)
+    assert results == [Model(params, seed=seed).run(max_ticks=300) for seed in range(3)]
+
+
+@pytest.mark.parametrize("options", [{"streams": True}, {"global_vision": True}])
+def test_replicates_run_like_models_with_options(options):
+    streams = options.get("streams", False)
+    params = Params(population=20, global_vision=options.get("global_vision", False))
+    results = BatchModel(params, seeds=[3, 1, 4], streams=streams).run(max_ticks=300)
+    assert results == [Model(params, seed=seed, streams=streams).run(max_ticks=300) for seed in [3, 1, 4]]
+
+
+def test_replicate_state_matches_model_every_tick():
+    params = Params(population=25)
+    batch = BatchModel(params, seeds=range(4))
+    models = [Model(params, seed=seed) for seed in range(4)]
+    for _ in range(60):
+        batch.go()
+        for model in models:
+            model.go()
+        for row in range(batch.size):
+            replicate, model = batch.replicate(row), models[batch.replicates[row]]
+            assert np.array_equal(replicate.xcor, model.xcor)
+            assert np.array_equal(replicate.heading, model.heading)
+            assert replicate.bot_x == model.bot_x and replicate.distance_traveled == model.distance_traveled
+
+
+def test_retired_replicates_leave_the_others_unchanged():
+    params = Params(population=20)
+    batch = BatchModel(params, seeds=range(3))
+    model = Model(params, seed=2)
+    for _ in range(20):
+        batch.go()
+        model.go()
+    batch.retire(np.array([True, False, False]))
+    batch.retire(np.array([True, False]))
+    for _ in range(20):
+        batch.go()
+        model.go()
+    assert list(batch.replicates) == [2]
+    assert np.array_equal(batch.replicate(0).xcor, model.xcor)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from herdsim.batch import BatchModel
+from herdsim.checkpoint import Checkpoints, fork, load, save, state
+from herdsim.model import Model
+from herdsim.params import Params
+
+
+def advance(model, ticks):
+    for _ in range(ticks):
+        model.go()
+    return model
+
+
+def assert_same_state(a, b):
+    sa, sb = state(a), state(b)
+    assert sa["arrays"].keys() == sb["arrays"].keys()
+    for name in sa["arrays"]:
+        assert np.array_equal(sa["arrays"][name], sb["arrays"][name]), name
+    assert sa["values"] == sb["values"]
+
+
+@pytest.mark.parametrize("options", [{}, {"neighbors": "kdtree"}, {"neighbors": "verlet"}, {"streams": True}])
+def test_saved_model_continues_identically(tmp_path, options):
+    params = Params(population=30, model_neighbor="3 Long-range neighbor")
+    model = advance(Model(params, seed=2, **options), 50)
+    path = str(tmp_path / "model.npz")
+    save(model, path, extra={"rows": [1, 2]})
+    restored, extra = load(path)
+    assert extra == {"rows": [1, 2]}
+    assert_same_state(advance(model, 100), advance(restored, 100))
+
+
+@pytest.mark.parametrize("streams", [False, True])
+def test_saved_batch_continues_identically(tmp_path, streams):
+    batch = BatchModel(Params(population=20), seeds=range(3), streams=streams)
+    advance(batch, 40)
+    batch.retire(np.array([False, True, False]))
+    path = str(tmp_path / "batch.npz")
+    save(batch, path)
+    restored, _ = load(path)
+    assert_same_state(advance(batch, 80), advance(restored, 80))
+
+
+def test_fork_changes_the_robot_only():
+    model = advance(Model(Params(population=30), seed=1), 30)
+    fast = fork(model, bot_speed_ratio=8)
+    same = fork(model)
+    assert fast.params.bot_speed_ratio == 8 and model.params.bot_speed_ratio == 5
+    assert_same_state(advance(model, 30), advance(same, 30))
+    with pytest.raises(ValueError):
+        fork(model, population=10)
+
+
+def test_checkpoints_resume_only_their_owner(tmp_path):
+    checkpoints = Checkpoints(str(tmp_path), every=10)
+    owner = {"experiment": "population", "values": {"population": 10}, "seeds": [0]}
+    other = {"experiment": "population", "values": {"population": 50}, "seeds": [99]}
+    model = advance(Model(Params(population=50), seed=99), 10)
+    checkpoints.save(1, model, [], other)
+    checkpoints.save(1, model, [])
+    assert checkpoints.load(1, owner=owner) is None
+    checkpoints.save(1, advance(Model(Params(population=10), seed=0), 10), ["rows"], owner)
+    resumed, rows = checkpoints.load(1, owner=owner)
+    assert rows == ["rows"] and resumed.params.population == 10 and resumed.ticks == 10
+    checkpoints.discard(1, owner)
+    assert checkpoints.load(1, owner=owner) is None
+    assert checkpoints.load(1, owner=other) is not None
@@ -0,0 +1,140 @@
+import math
+import threading
+import time
+
+import pytest
+
+from herdsim.cluster import Client, Coordinator, run_options, serve, work
+from herdsim.experiments import parse_experiments
+from herdsim.monitor import RobotStuck
+from herdsim.sweep import Ledger, run_job, run_sweep
+
+XML = """<experiments>
+  <experiment name="tiny" repetitions="2" runMetricsEveryStep="false">
+    <setup>setup</setup>
+    <go>go</go>
+    <timeLimit steps="{steps}"/>
+    <exitCondition>not any? herdanimals or ticks = {steps}</exitCondition>
+    <metric>ticks</metric>
+    <metric>[distance-traveled] of robots</metric>
+    <enumeratedValueSet variable="population">
+      <value value="10"/>
+      <value value="12"/>
+    </enumeratedValueSet>
+  </experiment>
+</experiments>"""
+
+
+def model_file(tmp_path, steps):
+    # a model file with only the experiments section, which is all a worker reads
+    path = tmp_path / f"tiny-{steps}.nlogo"
+    path.write_text("@#$#@#$#@\n" + XML.format(steps=steps), encoding="utf-8")
+    return str(path)
+
+
+def experiment(steps=20):
+    return parse_experiments(XML.format(steps=steps))["tiny"]
+
+
+@pytest.fixture
+def served(tmp_path):
+    servers = []
+
+    def start(coordinator):
+        server = serve(coordinator)
+        servers.append(server)
+        host, port = server.server_address
+        return f"{host}:{port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_expired_leases_are_reissued_and_duplicates_dropped(tmp_path, served):
+    tiny = experiment()
+    coordinator = Coordinator(tiny, Ledger(str(tmp_path / "tiny.jsonl")), lease=0.2, batch_size=2)
+    first, second = Client(served(coordinator)), Client(served(coordinator))
+    lease = first.request({"op": "lease", "worker": "first", "jobs": 2})
+    assert len(lease["jobs"]) == 2 and lease["ttl"] == 0.2
+    time.sleep(0.3)
+    # the silent first worker lost its lease, the second gets the same jobs
+    again = second.request({"op": "lease", "worker": "second", "jobs": 2})
+    assert again["jobs"] == lease["jobs"] and coordinator.reissued == 1
+    assert first.request({"op": "heartbeat", "leases": [lease["lease"]]}) == {"lost": [lease["lease"]]}
+    leased = {message["run"] for message in lease["jobs"]}
+    records = [run_job(tiny, job) for job in tiny.jobs() if job.run_number in leased]
+    assert second.request({"op": "result", "lease": again["lease"], "records": records}) == {
+        "written": 2, "duplicates": 0
+    }
+    # the first worker finishes the lost lease all the same
+    assert first.request({"op": "result", "lease": lease["lease"], "records": records}) == {
+        "written": 0, "duplicates": 2
+    }
+    assert len(Ledger(str(tmp_path / "tiny.jsonl")).load()) == 2
+    first.close()
+    second.close()
+
+
+def test_malformed_messages_get_an_error(tmp_path, served):
+    coordinator = Coordinator(experiment(), Ledger(str(tmp_path / "tiny.jsonl")))
+    client = Client(served(coordinator))
+    for message in ([], 1, "lease", None, {"op": "result", "lease": "x", "records": 5}, {"op": "nothing"}):
+        assert "error" in client.request(message)
+    # the connection still works
+    assert len(client.request({"op": "lease", "worker": "w", "jobs": 1})["jobs"]) == 2
+    client.close()
+
+
+def test_workers_run_with_the_options_of_the_lease(tmp_path, served):
+    tiny = experiment()
+    coordinator = Coordinator(
+        tiny, Ledger(str(tmp_path / "tiny.jsonl")), lease=5.0, batch_size=2, options={"streams": True}
+    )
+    assert work(served(coordinator), processes=1, model=model_file(tmp_path, 20)) == 4
+    assert coordinator.finished.is_set() and coordinator.written == 4 and coordinator.duplicates == 0
+    expected = run_sweep(tiny, Ledger(str(tmp_path / "local.jsonl")), processes=1, streams=True)
+    assert coordinator.records() == expected
+
+
+class Forgetful(Coordinator):
+    """Reissues every lease at the first heartbeat, as if its worker had been silent for too long."""
+
+    forgotten = ()
+    results = ()
+
+    def heartbeat(self, leases):
+        if not self.forgotten:
+            with self.lock:
+                self.forgotten = list(self.leases)
+                self._expire(math.inf)
+        return super().heartbeat(leases)
+
+    def result(self, lease_id, records):
+        self.results = [*self.results, lease_id]
+        return super().result(lease_id, records)
+
+
+def test_workers_drop_lost_leases(tmp_path, served):
+    # runs long enough for a heartbeat to come before the first lease is done
+    tiny = experiment(steps=400)
+    coordinator = Forgetful(tiny, Ledger(str(tmp_path / "tiny.jsonl")), lease=0.3, batch_size=2)
+    done = []
+    thread = threading.Thread(
+        target=lambda: done.append(work(served(coordinator), processes=1, model=model_file(tmp_path, 400)))
+    )
+    thread.start()
+    thread.join(120)
+    assert done and coordinator.finished.is_set()
+    assert coordinator.forgotten and coordinator.reissued >= 1
+    assert not set(coordinator.forgotten) & set(coordinator.results)
+    assert sorted(r["run"] for r in coordinator.records()) == [1, 2, 3, 4]
+    assert coordinator.duplicates == 0
+
+
+def test_run_options_of_a_lease():
+    assert run_options({"streams": True}) == {"streams": True}
+    monitor = run_options({"stall": {"validate": True, "robot_stuck": True}})["monitor"]
+    assert monitor.validate and isinstance(monitor.rules[-1], RobotStuck)
+    assert not any(isinstance(rule, RobotStuck) for rule in run_options({"stall": {}})["monitor"].rules)
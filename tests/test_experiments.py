@@ -0,0 +1,77 @@
+import os
+
+from herdsim.experiments import literal, parse_experiments, read_experiments, stepped_values
+
+XML = """<experiments>
+  <experiment name="small" repetitions="3" runMetricsEveryStep="false">
+    <setup>setup</setup>
+    <go>go</go>
+    <timeLimit steps="40"/>
+    <exitCondition>not any? herdanimals</exitCondition>
+    <metric>ticks</metric>
+    <metric>[distance-traveled] of robots</metric>
+    <steppedValueSet variable="bot-speed-ratio" first="1" step="0.5" last="2"/>
+    <enumeratedValueSet variable="global-vision">
+      <value value="false"/>
+      <value value="true"/>
+    </enumeratedValueSet>
+  </experiment>
+</experiments>"""
+
+
+def test_parse_experiments():
+    experiment = parse_experiments(XML)["small"]
+    assert experiment.repetitions == 3 and experiment.time_limit == 40
+    assert not experiment.run_metrics_every_step
+    assert experiment.metrics == ("ticks", "[distance-traveled] of robots")
+    assert experiment.value_sets == (("bot-speed-ratio", (1, 1.5, 2)), ("global-vision", (False, True)))
+
+
+def test_cells_in_behaviorspace_order():
+    cells = parse_experiments(XML)["small"].cells()
+    assert len(cells) == 6
+    assert cells[0] == (("bot-speed-ratio", 1), ("global-vision", False))
+    assert cells[1] == (("bot-speed-ratio", 1), ("global-vision", True))
+    assert cells[-1] == (("bot-speed-ratio", 2), ("global-vision", True))
+
+
+def test_jobs_are_numbered_cell_by_cell():
+    experiment = parse_experiments(XML)["small"]
+    jobs = experiment.jobs(base_seed=10)
+    assert [job.run_number for job in jobs] == list(range(1, 19))
+    assert [job.repetition for job in jobs[:4]] == [0, 1, 2, 0]
+    assert [job.seed for job in jobs[:4]] == [10, 11, 12, 10]
+    assert jobs[3].values == experiment.cells()[1]
+    assert jobs[3].cell == {"bot-speed-ratio": 1, "global-vision": True}
+
+
+def test_run_numbers_of_further_repetitions():
+    experiment = parse_experiments(XML)["small"]
+    fixed = {(job.values, job.repetition): job.run_number for job in experiment.jobs()}
+    numbers = {}
+    for index, cell in enumerate(experiment.cells()):
+        for rep in range(8):
+            numbers[index, rep] = experiment.run_number(index, rep)
+            if rep < experiment.repetitions:
+                assert numbers[index, rep] == fixed[cell, rep]
+    # the extra repetitions follow the fixed runs, without gaps or clashes
+    assert sorted(numbers.values()) == list(range(1, 6 * 8 + 1))
+    assert experiment.run_number(0, 3) == 19 and experiment.run_number(5, 3) == 24
+
+
+def test_stepped_values_are_exact():
+    assert stepped_values("1", "0.1", "2")[-1] == 2
+    assert len(stepped_values("1", "0.1", "2")) == 11
+    assert stepped_values("10", "-5", "0") == (10, 5, 0)
+
+
+def test_literals():
+    assert literal("true") is True
+    assert literal('"3 Long-range neighbor"') == "3 Long-range neighbor"
+    assert literal("2.5") == 2.5 and literal("4") == 4 and isinstance(literal("4.0"), int)
+
+
+def test_experiments_of_the_model_file():
+    experiments = read_experiments(os.path.join(os.path.dirname(__file__), os.pardir, "herds.nlogo"))
+    assert len(experiments["bot-speed"].cells()) == 10
+    assert experiments["bot-speed"].repetitions == 30
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from herdsim.globalsa import (  # noqa: E402
+    SA_ALL, Factor, GaussianProcess, _within, design, features, holdout_r2, levels, sobol_indices,
+)
+from herdsim.params import Params  # noqa: E402
+
+# an additive function of three factors of ten levels: the variance of every
+# term over its levels is weight^2 * var(0..9), so S1 = ST = weight^2 / sum
+FACTORS = (Factor("a", tuple(range(10))), Factor("b", tuple(range(10))), Factor("c", tuple(range(10))))
+WEIGHTS = np.array([1.0, 2.0, 0.0])
+EXPECTED = WEIGHTS ** 2 / (WEIGHTS ** 2).sum()
+
+
+def additive(idx):
+    return idx @ WEIGHTS
+
+
+def test_sobol_indices_of_an_additive_function():
+    indices = sobol_indices(additive, FACTORS, samples=4096, resamples=50)
+    assert indices["S1"].to_numpy() == pytest.approx(EXPECTED, abs=0.03)
+    assert indices["ST"].to_numpy() == pytest.approx(EXPECTED, abs=0.03)
+    assert (indices["S1_conf"] < 0.1).all() and (indices["ST_conf"] < 0.1).all()
+
+
+def test_surrogate_of_an_additive_function():
+    idx = levels(np.random.default_rng(0).random((150, 3)), FACTORS)
+    x, y = features(idx, FACTORS), additive(idx)
+    assert holdout_r2(x, y) > 0.99
+    surrogate = GaussianProcess().fit(x, y)
+    grid = np.array([[i, j, k] for i in range(10) for j in range(10) for k in range(0, 10, 3)])
+    assert surrogate.predict(features(grid, FACTORS)) == pytest.approx(additive(grid), abs=0.2)
+    indices = sobol_indices(lambda idx: surrogate.predict(features(idx, FACTORS)), FACTORS, samples=1024,
+                            resamples=20)
+    assert indices["S1"].to_numpy() == pytest.approx(EXPECTED, abs=0.05)
+    assert indices["ST"].to_numpy() == pytest.approx(EXPECTED, abs=0.05)
+
+
+def test_within_picks_among_the_allowed_levels():
+    values = np.arange(1.0, 11.0)
+    u = np.linspace(0, 1, 1001)
+    picked = values[_within(u, values, low=np.full(u.size, 3.0), high=np.full(u.size, 8.0))]
+    assert set(picked) == {4.0, 5.0, 6.0, 7.0}
+    # the quantiles spread evenly over them
+    assert np.bincount(picked.astype(int))[4:8].min() >= 250
+    with pytest.raises(ValueError):
+        _within(np.array([0.5]), values, low=np.array([10.0]))
+
+
+def test_every_design_point_keeps_the_rules():
+    params = Params()
+    names = [f.name for f in SA_ALL]
+    idx = levels(np.random.default_rng(1).random((5000, len(SA_ALL))), SA_ALL, params)
+    value = {name: np.asarray(f.values, dtype=object)[idx[:, col]] for col, (name, f) in enumerate(zip(names, SA_ALL))}
+    assert (value["min-distance-to-herd"] < params.robot_repulsion).all()
+    assert (value["happyzone-max"] + value["happyzone-min"] < value["vision"]).all()
+    # the unconstrained factors still take every level
+    for col, f in enumerate(SA_ALL):
+        if f.name not in ("min-distance-to-herd", "vision"):
+            assert set(idx[:, col]) == set(range(len(f.values)))
+    for cell in design(64).cells():
+        cell = dict(cell)
+        assert cell["min-distance-to-herd"] < params.robot_repulsion
+        assert cell["happyzone-max"] + cell["happyzone-min"] < cell["vision"]
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from herdsim.batch import BatchModel
+from herdsim.forces import update_heading
+from herdsim.kernels import fused_numpy, kernel
+from herdsim.model import Model
+from herdsim.params import Params
+
+pytest.importorskip("numba")
+
+MODES = ["1 Metric neighbor", "2 Knn neighbor", "3 Long-range neighbor"]
+
+
+def kernel_args(model, bot_x, bot_y, n):
+    return (
+        model.link_src, model.link_dst, model.xcor.reshape(-1), model.ycor.reshape(-1),
+        model.heading.reshape(-1), model.speed.reshape(-1), bot_x, bot_y, n, model.params, model.g,
+    )
+
+
+def assert_same_turns(numba_out, numpy_out):
+    heading, speed = numba_out
+    expected_heading, expected_speed = numpy_out
+    turn = (heading - expected_heading + 180) % 360 - 180
+    assert np.abs(turn).max() < 1e-9
+    # the speed of a pushed animal is its summed link force / 100, capped at 1
+    assert speed == pytest.approx(expected_speed, rel=1e-9, abs=1e-12)
+
+
+def each_movement(model, ticks):
+    # run the model (NumPy path) and stop before every movement phase
+    for _ in range(ticks):
+        for name, step in model.phases():
+            if name == "movement":
+                yield model
+            step()
+        model.ticks += 1
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_numba_kernel_matches_numpy_along_a_run(mode):
+    fused = kernel("numba")
+    model = Model(Params(population=60, model_neighbor=mode), seed=4)
+    for state in each_movement(model, 60):
+        args = kernel_args(state, np.array([state.bot_x]), np.array([state.bot_y]), state.alive.size)
+        assert_same_turns(fused(*args), fused_numpy(*args))
+        # the NumPy kernel is the link forces of the unfused phase and update-heading
+        forces = update_heading(state.link_src, state.force_x, state.force_y, state.heading, state.speed, state.g)
+        assert all(np.array_equal(a, b) for a, b in zip(fused_numpy(*args), forces))
+    assert model.link_src.size > 0
+
+
+def test_numba_kernel_groups_unordered_links():
+    fused = kernel("numba")
+    model = Model(Params(population=60), seed=5)
+    state = next(each_movement(model, 30))
+    order = np.random.default_rng(0).permutation(state.link_src.size)
+    args = list(kernel_args(state, np.array([state.bot_x]), np.array([state.bot_y]), state.alive.size))
+    args[0], args[1] = state.link_src[order], state.link_dst[order]
+    assert_same_turns(fused(*args), fused_numpy(*args))
+
+
+def test_numba_kernel_matches_numpy_in_a_batch():
+    fused = kernel("numba")
+    batch = BatchModel(Params(population=40), seeds=[1, 2, 3])
+    for state in each_movement(batch, 40):
+        args = kernel_args(state, state.bot_x, state.bot_y, state.params.population)
+        assert_same_turns(fused(*args), fused_numpy(*args))
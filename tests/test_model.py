@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from herdsim.model import Model
+from herdsim.params import Params
+
+
+def test_same_seed_same_run():
+    params = Params(population=20)
+    assert Model(params, seed=3).run(max_ticks=400) == Model(params, seed=3).run(max_ticks=400)
+
+
+def test_fixed_seed_option_seeds_73():
+    params = Params(population=20, seed_option="2 fixed")
+    assert np.array_equal(Model(params).xcor, Model(params, seed=73).xcor)
+
+
+def test_run_stops_at_the_exit_condition():
+    model = Model(Params(population=20), seed=1)
+    result = model.run(max_ticks=50)
+    assert model.done(50)
+    assert result["ticks"] == model.ticks <= 50
+    assert result["distance-traveled"] == model.distance_traveled > 0
+
+
+def test_animals_stay_on_the_world():
+    params = Params(population=30)
+    model = Model(params, seed=2)
+    for _ in range(200):
+        model.go()
+        x, y = model.xcor[model.alive], model.ycor[model.alive]
+        assert (x >= params.min_pxcor - 0.5).all() and (x <= params.max_pxcor + 0.5).all()
+        assert (y >= params.min_pycor - 0.5).all() and (y <= params.max_pycor + 0.5).all()
+
+
+def test_params_from_netlogo_names_and_literals():
+    params = Params.from_netlogo(
+        {"bot-speed-ratio": "2.5", "global-vision": "true", "model-neighbor": '"1 Metric neighbor"'}
+    )
+    assert params.bot_speed_ratio == 2.5 and params.global_vision is True
+    assert params.model_neighbor == "1 Metric neighbor"
+    assert Params.from_netlogo(params.to_netlogo()) == params
+    with pytest.raises(KeyError):
+        Params.from_netlogo({"no-such-slider": 1})
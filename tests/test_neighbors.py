@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from herdsim.model import Model
+from herdsim.neighbors import INDEXES, NeighborIndex, VerletList, build_index
+from herdsim.params import Params
+
+MODELS = ("1 Metric neighbor", "2 Topological neighbor", "3 Long-range neighbor")
+
+
+def points(n, seed, spread=40.0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-spread, spread, n), rng.uniform(-spread, spread, n)
+
+
+def pairs(index, x, y, ids, radius):
+    qi, pid, _ = index.within(x, y, ids, radius)
+    return sorted(zip(ids[qi].tolist(), pid.tolist()))
+
+
+@pytest.mark.parametrize("n", [1, 2, 60, 500])
+def test_indexes_agree_on_radius_queries(n):
+    x, y = points(n, n)
+    ids = np.arange(n)
+    expected = pairs(build_index("brute", x, y, ids, 10.0), x, y, ids, 10.0)
+    for kind in INDEXES:
+        assert pairs(build_index(kind, x, y, ids, 10.0), x, y, ids, 10.0) == expected
+
+
+@pytest.mark.parametrize("n", [1, 7, 60, 500])
+def test_indexes_agree_on_nearest(n):
+    x, y = points(n, n)
+    ids = np.arange(n)
+    expected = build_index("brute", x, y, ids, 10.0, nearest=True).nearest(x, y, ids, 5, 10.0)
+    for kind in INDEXES:
+        table = build_index(kind, x, y, ids, 10.0, nearest=True).nearest(x, y, ids, 5, 10.0)
+        assert np.array_equal(table, expected), kind
+
+
+def test_groups_do_not_see_each_other():
+    x, y = points(300, 1, spread=10.0)
+    ids = np.arange(300)
+    groups = ids % 3
+    for kind in INDEXES:
+        index = build_index(kind, x, y, ids, 5.0, groups=groups)
+        qi, pid, _ = index.within(x, y, ids, 5.0)
+        assert qi.size and np.array_equal(groups[ids[qi]], groups[pid]), kind
+        table = index.nearest(x, y, ids, 5, 5.0)
+        found = table >= 0
+        assert np.array_equal(groups[np.broadcast_to(ids[:, None], table.shape)][found], groups[table[found]]), kind
+
+
+@pytest.mark.parametrize("k", [None, 5])
+def test_verlet_list_answers_like_a_fresh_index(k):
+    rng = np.random.default_rng(2)
+    x, y = points(200, 3, spread=20.0)
+    ids = np.arange(200)
+    verlet = VerletList(skin=1.0)
+    for tick in range(30):
+        x = x + rng.normal(0, 0.2, x.size)
+        y = y + rng.normal(0, 0.2, y.size)
+        if tick % 10 == 9:
+            # animals that reach the target leave the index
+            keep = rng.random(ids.size) > 0.1
+            x, y, ids = x[keep], y[keep], ids[keep]
+        index = verlet.index(x, y, ids, 4.0, k=k)
+        fresh = build_index("brute", x, y, ids, 4.0, nearest=k is not None)
+        if k is None:
+            assert pairs(index, x, y, ids, 4.0) == pairs(fresh, x, y, ids, 4.0)
+        else:
+            assert np.array_equal(index.nearest(x, y, ids, k, 4.0), fresh.nearest(x, y, ids, k, 4.0))
+
+
+@pytest.mark.parametrize("vision", [0.2, 0.9, 3.1, 7.2, 15.4])
+@pytest.mark.parametrize("k", [None, 5])
+def test_verlet_list_is_not_rebuilt_for_its_own_radius(vision, k):
+    # radius + skin - skin is not always radius again in floating point
+    x, y = points(100, 4)
+    verlet = VerletList(skin=1.0)
+    for _ in range(5):
+        verlet.index(x, y, np.arange(100), vision, k=k)
+    assert verlet.builds == 1
+
+
+def test_verlet_list_of_a_model_is_rebuilt_by_moves_only():
+    model = Model(Params(vision=15.4, population=100), seed=0, neighbors="verlet")
+    for _ in range(50):
+        model.go()
+    assert model.verlet.builds < 20
+
+
+@pytest.mark.parametrize("model_neighbor", MODELS)
+def test_models_find_the_same_flockmates_with_every_index(model_neighbor):
+    params = Params(population=40, model_neighbor=model_neighbor)
+    models = {kind: Model(params, seed=4, neighbors=kind) for kind in [*INDEXES, "verlet"]}
+    for _ in range(80):
+        for model in models.values():
+            model.go()
+        reference = models["brute"]
+        for kind, model in models.items():
+            assert np.array_equal(model.flock_src, reference.flock_src), kind
+            assert np.array_equal(model.flock_dst, reference.flock_dst), kind
+            assert np.array_equal(model.xcor, reference.xcor), kind
+
+
+def test_an_index_without_within_cannot_be_created():
+    class Partial(NeighborIndex):
+        pass
+
+    with pytest.raises(TypeError):
+        Partial(np.zeros(1), np.zeros(1), np.arange(1))
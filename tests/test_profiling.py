@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+
+from herdsim.batch import BatchModel
+from herdsim.model import Model
+from herdsim.params import Params
+from herdsim.profiling import Profiler, merge
+
+
+def timed_ticks(model, ticks):
+    # wall time of the ticks as the caller sees it
+    start = time.perf_counter_ns()
+    for _ in range(ticks):
+        model.go()
+    return (time.perf_counter_ns() - start) / 1e9
+
+
+def test_phases_cover_the_tick():
+    profiler = Profiler()
+    model = Model(Params(population=200), seed=1, profiler=profiler)
+    total = timed_ticks(model, 30)
+    summary = profiler.summary()
+    assert summary["ticks"] == 30
+    assert list(summary["phases"]) == [name for name, _ in model.phases()]
+    assert all(phase["calls"] == 30 for phase in summary["phases"].values())
+    # the phases are all of a tick but the few counters per tick
+    assert np.isclose(summary["seconds"], sum(phase["seconds"] for phase in summary["phases"].values()))
+    assert 0.7 * total <= summary["seconds"] <= total
+    assert summary["counters"]["herdanimals"] == 30 * 200
+
+
+def test_profiling_does_not_change_the_run():
+    params = Params(population=40)
+    profiler = Profiler()
+    assert Model(params, seed=2, profiler=profiler).run(200) == Model(params, seed=2).run(200)
+    assert profiler.ticks == 200
+    disabled = Profiler(enabled=False)
+    Model(params, seed=2, profiler=disabled).run(50)
+    assert disabled.summary()["ticks"] == 0 and not disabled.nanoseconds
+
+
+def test_batch_phases_and_merged_summaries():
+    profiler = Profiler()
+    batch = BatchModel(Params(population=30), seeds=[0, 1], profiler=profiler)
+    timed_ticks(batch, 20)
+    summary = profiler.summary()
+    assert list(summary["phases"]) == [name for name, _ in batch.phases()]
+    merged = merge([summary, summary])
+    assert merged["ticks"] == 40
+    assert merged["counters"] == {name: 2 * value for name, value in summary["counters"].items()}
+    assert np.isclose(merged["seconds"], 2 * summary["seconds"])
+    lines = profiler.folded().splitlines()
+    assert [line.split()[0] for line in lines] == [f"go;{name}" for name in summary["phases"]]
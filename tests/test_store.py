@@ -0,0 +1,92 @@
+import math
+
+import pytest
+
+from herdsim import store
+from herdsim.analysis import oat_stats
+from herdsim.sweep import Ledger
+
+pytest.importorskip("pyarrow")
+
+
+def rows(ticks, distance):
+    return [{"[step]": ticks, "ticks": ticks, "[distance-traveled] of robots": distance}]
+
+
+def ledger_records():
+    return [
+        {"experiment": "tiny", "run": 1, "values": {"population": 10}, "repetition": 0, "seed": 0,
+         "rows": rows(800, 20.0)},
+        {"experiment": "tiny", "run": 2, "values": {"population": 10}, "repetition": 1, "seed": 1,
+         "rows": rows(5050, 60.0), "stalled": {"tick": 5050, "reason": "no delivery", "horizon": 10000}},
+        {"experiment": "tiny", "run": 3, "values": {"population": 15}, "repetition": 0, "seed": 0,
+         "rows": rows(1200, 30.0)},
+        {"experiment": "tiny", "run": 4, "values": {"population": 15}, "repetition": 1, "seed": 1,
+         "rows": rows(9000, 90.0), "stalled": {"tick": 5050, "reason": "no delivery", "horizon": 10000,
+                                               "validated": True}},
+    ]
+
+
+def test_ledger_round_trip(tmp_path):
+    ledger = Ledger(str(tmp_path / "tiny.jsonl"))
+    for record in ledger_records():
+        ledger.append(record)
+    dataset = str(tmp_path / "dataset")
+    assert store.ingest([ledger.path], dataset) == {ledger.path: "ingested"}
+    assert store.ingest([ledger.path], dataset) == {ledger.path: "unchanged"}
+    assert list(store.experiments(dataset)) == ["tiny"]
+    df = store.load(dataset, "tiny").sort_values("run number")
+    assert df["run number"].tolist() == [1, 2, 3, 4]
+    assert df["population"].tolist() == [10, 10, 15, 15]
+    assert df["seed"].tolist() == [0, 1, 0, 1]
+    assert df["ticks"].tolist() == [800, 5050, 1200, 9000]
+    assert df["distance-traveled of robots"].tolist() == [20.0, 60.0, 30.0, 90.0]
+    # a validated tag only marks the run, it ran to its end
+    assert df["stalled"].tolist() == [False, True, False, False]
+    assert set(df["source"]) == {"tiny.jsonl"}
+
+
+def test_stalled_runs_are_failures_in_the_analysis(tmp_path):
+    ledger = Ledger(str(tmp_path / "tiny.jsonl"))
+    for record in ledger_records():
+        ledger.append(record)
+    dataset = str(tmp_path / "dataset")
+    store.ingest([ledger.path], dataset)
+    stats = oat_stats(store.load(dataset, "tiny"), "population").set_index("population")
+    assert stats.loc[10, "successes"] == 1 and stats.loc[10, "ticks_mean"] == (800 + 10000) / 2
+    assert stats.loc[10, "distance_mean"] == 20.0
+    assert stats.loc[15, "successes"] == 2
+    assert math.isclose(stats.loc[15, "ticks_mean"], (1200 + 9000) / 2)
+
+
+def test_reingest_of_a_grown_ledger_replaces_its_part(tmp_path):
+    ledger = Ledger(str(tmp_path / "tiny.jsonl"))
+    records = ledger_records()
+    ledger.append(records[0])
+    dataset = str(tmp_path / "dataset")
+    store.ingest([ledger.path], dataset)
+    for record in records[1:]:
+        ledger.append(record)
+    assert store.ingest([ledger.path], dataset) == {ledger.path: "ingested"}
+    assert len(store.load(dataset, "tiny")) == 4
+    assert sum(entry["rows"] for entry in store.experiments(dataset)["tiny"]) == 4
+
+
+def test_every_parameter_cell_is_a_row_group(tmp_path):
+    import pyarrow.parquet as pq
+
+    ledger = Ledger(str(tmp_path / "tiny.jsonl"))
+    for record in ledger_records():
+        ledger.append(record)
+    dataset = str(tmp_path / "dataset")
+    store.ingest([ledger.path], dataset)
+    entry = store.experiments(dataset)["tiny"][0]
+    metadata = pq.ParquetFile(str(tmp_path / "dataset" / entry["file"])).metadata
+    assert metadata.num_row_groups == 2
+    for group, population in enumerate([10, 15]):
+        column = metadata.row_group(group).column(metadata.schema.names.index("population"))
+        assert column.statistics.min == column.statistics.max == population
+    df = store.load(dataset, "tiny", columns=["run number", "ticks"], filters=[("population", "=", 15)])
+    assert df["run number"].tolist() == [3, 4]
+    with pytest.raises(KeyError):
+        store.load(dataset, filters=[("bot-speed-ratio", "=", 2)])
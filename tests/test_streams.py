@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from herdsim.batch import BatchModel
+from herdsim.model import Model
+from herdsim.params import Params
+from herdsim.streams import Streams, philox
+
+MAX = 2**64 - 1
+KEYS = [(0, 0), (3, 5), (MAX, 1), (0x0123456789ABCDEF, 0xFEDCBA9876543210)]
+COUNTERS = [(0, 0, 0, 0), (7, 300, 2, 0), (MAX - 1, MAX, MAX, MAX), (123456789, 0, 1, 2**63)]
+
+
+def numpy_blocks(key, counter, blocks=1):
+    # numpy.random.Philox increments the counter, a 256 bit integer, before every block
+    value = sum(int(word) << (64 * i) for i, word in enumerate(counter)) - 1
+    start = np.array([(value >> (64 * i)) & MAX for i in range(4)], dtype=np.uint64)
+    return np.random.Philox(key=np.array(key, dtype=np.uint64), counter=start).random_raw(4 * blocks)
+
+
+@pytest.mark.parametrize("key", KEYS)
+@pytest.mark.parametrize("counter", COUNTERS)
+def test_philox_matches_numpy(key, counter):
+    assert [int(word) for word in philox(counter, key)] == numpy_blocks(key, counter).tolist()
+
+
+def test_philox_of_many_counters():
+    key = (11, 2)
+    who = np.arange(50, dtype=np.uint64)
+    words = np.stack(philox((who, 40, 3, 0), key), axis=-1)
+    for i in (0, 1, 17, 49):
+        assert words[i].tolist() == numpy_blocks(key, (i, 40, 3, 0)).tolist()
+    # consecutive first words, as numpy counts them
+    assert words[5:8].reshape(-1).tolist() == numpy_blocks(key, (5, 40, 3, 0), blocks=3).tolist()
+
+
+def test_draws_depend_on_seed_purpose_tick_and_agent_only():
+    streams = Streams(9, 30)
+    first = streams.draws("randomness", 12).random(30)
+    assert np.array_equal(first, Streams(9, 30).draws("randomness", 12).random(30))
+    assert np.array_equal(first[[4, 20]], streams.draws("randomness", 12).random(agents=[4, 20]))
+    # ids of a batch are taken modulo the population
+    assert np.array_equal(first[[4, 20]], streams.draws("randomness", 12).random(agents=[34, 80]))
+    for other in (Streams(10, 30).draws("randomness", 12), streams.draws("one-of", 12),
+                  streams.draws("randomness", 13)):
+        assert not np.array_equal(first, other.random(30))
+    draws = streams.draws("one-of", 12)
+    draws.random(30)
+    # the next call draws anew
+    assert not np.array_equal(draws.random(30), streams.draws("one-of", 12).random(30))
+    with pytest.raises(ValueError):
+        streams.draws("setup", 0).random(29)
+
+
+def test_same_streams_give_the_same_run():
+    params = Params(population=30)
+    result = Model(params, seed=4, streams=True).run(300)
+    assert Model(params, seed=4, streams=True).run(300) == result
+    assert BatchModel(params, seeds=[2, 4], streams=True).run(300)[1] == result
+    assert Model(params, seed=4).run(300) != result
+
+
+def test_cells_share_their_random_numbers():
+    # common random numbers: the herd starts alike whatever the robot does
+    slow = Model(Params(population=30, bot_speed_ratio=1), seed=4, streams=True)
+    fast = Model(Params(population=30, bot_speed_ratio=8), seed=4, streams=True)
+    assert np.array_equal(slow.xcor, fast.xcor) and np.array_equal(slow.heading, fast.heading)
+    # and herdanimal 7 is herdanimal 7 in a bigger herd too
+    bigger = Model(Params(population=40), seed=4, streams=True)
+    assert np.array_equal(bigger.xcor[:30], slow.xcor) and np.array_equal(bigger.heading[:30], slow.heading)
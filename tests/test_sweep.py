@@ -0,0 +1,88 @@
+import csv
+
+import pytest
+
+from herdsim.checkpoint import Checkpoints
+from herdsim.experiments import parse_experiments
+from herdsim.sweep import Ledger, run_cell, run_job, run_sweep, write_table
+
+XML = """<experiments>
+  <experiment name="tiny" repetitions="2" runMetricsEveryStep="false">
+    <setup>setup</setup>
+    <go>go</go>
+    <timeLimit steps="40"/>
+    <exitCondition>not any? herdanimals or ticks = 40</exitCondition>
+    <metric>ticks</metric>
+    <metric>[distance-traveled] of robots</metric>
+    <enumeratedValueSet variable="population">
+      <value value="10"/>
+      <value value="15"/>
+    </enumeratedValueSet>
+  </experiment>
+</experiments>"""
+
+
+@pytest.fixture
+def experiment():
+    return parse_experiments(XML)["tiny"]
+
+
+def test_sweep_resumes_from_its_ledger(tmp_path, experiment):
+    ledger = Ledger(str(tmp_path / "tiny.jsonl"))
+    first = []
+    records = run_sweep(experiment, ledger, processes=1, on_record=first.append)
+    assert len(first) == 4
+    assert [r["run"] for r in records] == [1, 2, 3, 4]
+    assert [r["seed"] for r in records] == [0, 1, 0, 1]
+    assert all(r["rows"][-1]["ticks"] == 40 for r in records)
+    again = []
+    assert run_sweep(experiment, ledger, processes=1, on_record=again.append) == records
+    assert again == []
+
+
+def test_batched_sweep_gives_the_same_records(tmp_path, experiment):
+    plain = run_sweep(experiment, Ledger(str(tmp_path / "plain.jsonl")), processes=1)
+    batched = run_sweep(experiment, Ledger(str(tmp_path / "batched.jsonl")), processes=1, batch=True)
+    assert batched == plain
+
+
+def test_ledger_drops_a_cut_off_last_line(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.jsonl"))
+    ledger.append({"experiment": "tiny", "run": 1, "values": {"population": 10}, "seed": 0, "rows": []})
+    with open(ledger.path, "a", encoding="utf-8") as f:
+        f.write('{"experiment": "tiny", "run": 2, "val')
+    assert list(ledger.load()) == [('{"population": 10}', 0)]
+    ledger.append({"experiment": "tiny", "run": 2, "values": {"population": 10}, "seed": 1, "rows": []})
+    assert len(ledger.load()) == 2
+
+
+def test_checkpointed_runs_match_plain_runs(tmp_path, experiment):
+    checkpoints = Checkpoints(str(tmp_path / "ckpt"), every=10)
+    jobs = experiment.jobs()
+    assert run_job(experiment, jobs[0], checkpoints=checkpoints) == run_job(experiment, jobs[0])
+    assert run_cell(experiment, jobs[2:], checkpoints=checkpoints) == run_cell(experiment, jobs[2:])
+    # finished runs discard their checkpoints
+    assert not list((tmp_path / "ckpt").iterdir())
+
+
+def test_table_reports_stalled_runs_as_failures(tmp_path, experiment):
+    records = [
+        {"run": 1, "values": {"population": 10}, "seed": 0,
+         "rows": [{"[step]": 5050, "ticks": 5050, "[distance-traveled] of robots": 30.0}],
+         "stalled": {"tick": 5050, "reason": "no delivery", "horizon": 10000}},
+        {"run": 2, "values": {"population": 10}, "seed": 1,
+         "rows": [{"[step]": 6000, "ticks": 6000, "[distance-traveled] of robots": 35.0}],
+         "stalled": {"tick": 5050, "reason": "no delivery", "horizon": 10000, "validated": True}},
+        {"run": 3, "values": {"population": 15}, "seed": 0,
+         "rows": [{"[step]": 900, "ticks": 900, "[distance-traveled] of robots": 20.0}]},
+    ]
+    path = tmp_path / "table.csv"
+    write_table(records, experiment, str(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[6] == ["[run number]", "population", "[step]", "ticks", "[distance-traveled] of robots"]
+    assert rows[7:] == [
+        ["1", "10", "5050", "10000", "30.0"],
+        ["2", "10", "6000", "6000", "35.0"],
+        ["3", "15", "900", "900", "20.0"],
+    ]
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from herdsim.model import Model
+from herdsim.params import Params
+from herdsim.trajectory import ANIMAL_COLUMNS, MASK_COLUMNS, ROBOT_COLUMNS, Recording, open_run, runs
+
+
+def record(path, quantize, ticks=40, every=3):
+    # a short run recorded in small chunks, and the states that were recorded
+    model = Model(Params(population=25), seed=6)
+    states = {}
+    with Recording(str(path), every=every, quantize=quantize, chunk=4).writer(7, 25) as writer:
+        while True:
+            last = model.done(ticks)
+            if writer.record(model, force=last):
+                states[model.ticks] = {
+                    name: np.array(getattr(model, name)) for name in (*ANIMAL_COLUMNS, *MASK_COLUMNS, *ROBOT_COLUMNS)
+                }
+            if last:
+                return states
+            model.go()
+
+
+def assert_columns(window, states, quantize):
+    assert list(window["tick"]) == list(states)
+
+    def expected(name):
+        return np.array([state[name] for state in states.values()])
+
+    for name, (_, step) in ANIMAL_COLUMNS.items():
+        if quantize:
+            # rounded to the step; a heading just below 360 is clipped to the top of uint16
+            tolerance = step / 2 + (360 - 65535 * step if name == "heading" else 0)
+            assert np.abs(window[name] - expected(name)).max() <= tolerance
+        else:
+            assert window[name] == pytest.approx(expected(name), rel=1e-6, abs=1e-4)
+    for name in MASK_COLUMNS:
+        assert np.array_equal(window[name], expected(name))
+    for name in ROBOT_COLUMNS:
+        assert window[name] == pytest.approx(expected(name), rel=1e-6, abs=1e-4)
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_recorded_run_reads_back(tmp_path, quantize):
+    states = record(tmp_path, quantize)
+    assert list(states) == [0, 3, 6, 9, 12, 15, 18, 21, 24, 27, 30, 33, 36, 39, 40]
+    assert runs(str(tmp_path)) == [7]
+    trajectory = open_run(str(tmp_path), 7)
+    assert trajectory.rows == len(states) and trajectory.population == 25
+    assert_columns(trajectory.window(), states, quantize)
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_windows_of_a_recorded_run(tmp_path, quantize):
+    states = record(tmp_path, quantize)
+    trajectory = open_run(str(tmp_path), 7)
+    for start, stop in [(0, 1), (5, 20), (12, 13), (30, None), (None, 10)]:
+        inside = {tick: state for tick, state in states.items()
+                  if (start is None or tick >= start) and (stop is None or tick < stop)}
+        assert_columns(trajectory.window(start, stop), inside, quantize)
+    assert trajectory.column("xcor", 5, 20).shape == (5, 25)
+    assert trajectory.column("alive", 5, 20).dtype == bool
+    # nothing was recorded after the end of the run
+    assert trajectory.column("xcor", 41, 50).shape == (0, 25)
+
+
+def test_quantized_files_are_smaller(tmp_path):
+    record(tmp_path / "float", quantize=False)
+    record(tmp_path / "int", quantize=True)
+    for name in ANIMAL_COLUMNS:
+        size = (tmp_path / "float" / "run-7" / f"{name}.bin").stat().st_size
+        assert (tmp_path / "int" / "run-7" / f"{name}.bin").stat().st_size * 2 == size
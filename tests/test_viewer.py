@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from herdsim.model import Model
+from herdsim.params import Params
+from herdsim.viewer import _PAGE, DELTA, HEADER, KEY, SCALE, Frame, decode, encode, snapshot
+
+
+def assert_same_frame(frame, expected):
+    assert (frame.tick, frame.number) == (expected.tick, expected.number)
+    for name in ("x", "y", "heading", "alive"):
+        assert np.array_equal(getattr(frame, name), getattr(expected, name)), name
+        assert getattr(frame, name).dtype == getattr(expected, name).dtype, name
+    # the robot goes as float32
+    assert frame.bot == pytest.approx(expected.bot, rel=1e-6)
+
+
+def test_key_frame_round_trip():
+    model = Model(Params(population=37), seed=1)
+    for _ in range(5):
+        model.go()
+    frame = snapshot(model, 4)
+    data = encode(frame)
+    assert data[4] == KEY
+    decoded = decode(data)
+    assert_same_frame(decoded, frame)
+    # within the quantisation of the positions
+    assert np.abs(decoded.x / SCALE - model.xcor).max() <= 0.5 / SCALE
+
+
+def test_delta_frames_round_trip():
+    model = Model(Params(population=37), seed=2)
+    sent = received = None
+    kinds = []
+    for number in range(40):
+        model.go()
+        frame = snapshot(model, number)
+        data = encode(frame, sent)
+        kinds.append(data[4])
+        received = decode(data, received)
+        assert_same_frame(received, frame)
+        sent = frame
+    assert kinds[0] == KEY and set(kinds[1:]) == {DELTA}
+    # deltas are one byte per coordinate instead of two
+    assert len(encode(frame, previous=snapshot(model, 39))) < len(encode(frame))
+
+
+def test_long_steps_and_new_populations_make_key_frames():
+    model = Model(Params(population=10), seed=3)
+    previous = snapshot(model, 0)
+    model.xcor[3] += 200 / SCALE
+    assert encode(snapshot(model, 1), previous)[4] == KEY
+    fewer = Model(Params(population=9), seed=3)
+    assert encode(snapshot(fewer, 1), previous)[4] == KEY
+
+
+def test_frames_of_large_populations():
+    n = 70000
+    rng = np.random.default_rng(0)
+    frame = Frame(
+        tick=12, number=3, x=rng.integers(-600, 600, n).astype(np.int16), y=rng.integers(-600, 600, n).astype(np.int16),
+        heading=rng.integers(0, 256, n).astype(np.uint8), alive=rng.random(n) < 0.9, bot=(-20.0, 20.0, 90.0),
+    )
+    assert_same_frame(decode(encode(frame)), frame)
+    moved = Frame(13, 4, frame.x + 1, frame.y - 1, frame.heading + 1, frame.alive, frame.bot)
+    data = encode(moved, frame)
+    assert data[4] == DELTA
+    assert_same_frame(decode(data, frame), moved)
+
+
+def test_decode_rejects_what_it_cannot_read():
+    frame = snapshot(Model(Params(population=10), seed=4), 1)
+    with pytest.raises(ValueError):
+        decode(b"NOPE" + encode(frame)[4:])
+    with pytest.raises(ValueError):
+        decode(encode(frame, frame))
+    # the page reads the header at the same offsets
+    assert f"const H = {HEADER.size}," in _PAGE
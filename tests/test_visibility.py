@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from herdsim.model import Model
+from herdsim.params import Params
+from herdsim.visibility import cone, sweep
+
+
+def herd(n, seed, spread):
+    rng = np.random.default_rng(seed)
+    # a tight herd, so that many animals hide others
+    return rng.normal(0, spread, n), rng.normal(0, spread, n)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_sweep_matches_cone(seed):
+    x, y = herd(150, seed, spread=3.0 + seed)
+    bot_x, bot_y = np.random.default_rng(seed).uniform(-20, 20, 2)
+    visible = cone(bot_x, bot_y, x, y, 1.0)
+    assert 0 < visible.sum() < x.size
+    assert np.array_equal(sweep(bot_x, bot_y, x, y, 1.0), visible)
+
+
+def test_sweep_matches_cone_on_the_grid():
+    # integer positions, as after setup: equal distances and bearings
+    rng = np.random.default_rng(0)
+    x = rng.integers(-5, 5, 100).astype(float)
+    y = rng.integers(-5, 5, 100).astype(float)
+    assert np.array_equal(sweep(-20.0, 20.0, x, y, 1.0), cone(-20.0, 20.0, x, y, 1.0))
+    assert np.array_equal(sweep(0.0, 0.0, x, y, 1.0), cone(0.0, 0.0, x, y, 1.0))
+
+
+def test_sweep_matches_cone_per_group():
+    x, y = herd(240, 7, spread=4.0)
+    groups = np.arange(240) % 4
+    bots = np.array([[-10.0, 10.0], [0.0, 0.0], [15.0, -3.0], [2.0, 30.0]])
+    bot_x, bot_y = bots[groups, 0], bots[groups, 1]
+    assert np.array_equal(sweep(bot_x, bot_y, x, y, 1.0, groups), cone(bot_x, bot_y, x, y, 1.0, groups))
+
+
+def test_sweep_handles_tiny_herds():
+    for n in (0, 1, 2):
+        x, y = herd(n, n, spread=1.0)
+        assert np.array_equal(sweep(5.0, 5.0, x, y, 1.0), cone(5.0, 5.0, x, y, 1.0))
+
+
+def test_models_with_sweep_and_cone_run_alike():
+    params = Params(population=40)
+    with_sweep = Model(params, seed=5, visibility="sweep")
+    with_cone = Model(params, seed=5, visibility="cone")
+    for _ in range(150):
+        with_sweep.go()
+        with_cone.go()
+        assert np.array_equal(with_sweep.visibles, with_cone.visibles)
+    assert with_sweep.bot_x == with_cone.bot_x and with_sweep.bot_y == with_cone.bot_y